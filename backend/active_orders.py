@@ -0,0 +1,161 @@
+"""
+Active-orders read model: every order that is not completed, kept in memory as pre-serialized JSON
+Loaded once from the DB and kept current by the write routes, so the live board
+(GET /api/orders for active statuses, active refreshes) is answered without SQL
+"""
+from bisect import bisect_left, insort
+import sys
+
+from cache_state import CacheState
+import fastjson
+from models import Order, ORDER_STATUSES
+from serializers import fetch_orders
+
+# Orders leave the cache when they complete
+BOARD_STATUSES = tuple(status for status in ORDER_STATUSES if status != 'completed')
+
+# Keys of a serialized order (write routes add others, e.g. unsafeItems, that GET /api/orders omits)
+ORDER_KEYS = ('id', 'table', 'status', 'waiter', 'timestamp', 'customerInfo', 'healthConditions', 'items')
+
+
+def _interned(value):
+    """value interned if it is a str (waiter is nullable)"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class CachedOrder:
+    """One active order: the fields it is looked up by and its JSON body"""
+
+    __slots__ = ('id', 'status', 'table', 'waiter', 'placed_at', 'body')
+
+    def __init__(self, order_dict, placed_at):
+        self.id = order_dict['id']
+        # A handful of distinct values shared by thousands of orders
+        self.status = _interned(order_dict['status'])
+        self.table = _interned(order_dict['table'])
+        self.waiter = _interned(order_dict['waiter'])
+        self.placed_at = placed_at
+        # The encoder's buffer can be twice the body; keep an exact-size copy
+        self.body = memoryview(fastjson.dumps_bytes({key: order_dict[key] for key in ORDER_KEYS})).tobytes()
+
+    @property
+    def key(self):
+        """(timestamp, id), the keyset pagination key"""
+        return self.placed_at, self.id
+
+    def to_dict(self):
+        return fastjson.loads(self.body)
+
+
+class ActiveOrders(CacheState):
+    """Active orders indexed by id, status and table, plus a (timestamp, id)-sorted key list
+
+    Write routes call order_created / status_changed / order_removed after
+    they commit.
+    """
+
+    def __init__(self, max_age=None):
+        super().__init__(max_age)
+        self._reset()
+
+    def _reset(self):
+        self._by_id = {}
+        self._by_status = {status: set() for status in BOARD_STATUSES}
+        self._by_table = {}
+        # Sorted ascending; pages are read from the end (newest first)
+        self._keys = []
+
+    def load(self, db):
+        """Rebuild the cache from the active orders in the DB"""
+        orders, keys = fetch_orders(db, Order.status.in_(BOARD_STATUSES))
+        with self._lock:
+            self._reset()
+            for order_dict, (placed_at, _) in zip(orders, keys):
+                self._add(CachedOrder(order_dict, placed_at))
+            self._mark_loaded()
+
+    def _add(self, record):
+        self._by_id[record.id] = record
+        self._by_status[record.status].add(record.id)
+        self._by_table.setdefault(record.table, set()).add(record.id)
+        insort(self._keys, record.key)
+
+    def _remove(self, order_id):
+        record = self._by_id.pop(order_id, None)
+        if record is None:
+            return
+        self._by_status[record.status].discard(order_id)
+        table_ids = self._by_table[record.table]
+        table_ids.discard(order_id)
+        if not table_ids:
+            del self._by_table[record.table]
+        position = bisect_left(self._keys, record.key)
+        if position < len(self._keys) and self._keys[position] == record.key:
+            del self._keys[position]
+
+    def order_created(self, order_dict, placed_at):
+        """Cache a newly committed order"""
+        with self._lock:
+            if self._loaded and order_dict['status'] in BOARD_STATUSES:
+                self._add(CachedOrder(order_dict, placed_at))
+
+    def status_changed(self, order_dict, placed_at):
+        """Re-serialize an order after a status change, or evict it once completed"""
+        with self._lock:
+            if not self._loaded:
+                return
+            self._remove(order_dict['id'])
+            if order_dict['status'] in BOARD_STATUSES:
+                self._add(CachedOrder(order_dict, placed_at))
+
+    def order_removed(self, order_id):
+        """Drop a deleted order"""
+        with self._lock:
+            if self._loaded:
+                self._remove(order_id)
+
+    def get(self, order_id):
+        """(order dict, placed-at) of an active order, or None"""
+        with self._lock:
+            record = self._by_id.get(order_id)
+            return (record.to_dict(), record.placed_at) if record is not None else None
+
+    def page(self, statuses, since=None, before=None, limit=None):
+        """JSON bodies of active orders in statuses, newest first, and their keys
+
+        since: oldest timestamp to include; before: a (timestamp, id) key that
+        every returned order comes before (a cursor).
+        """
+        statuses = set(statuses)
+        bodies, keys = [], []
+        with self._lock:
+            end = bisect_left(self._keys, before) if before is not None else len(self._keys)
+            for position in range(end - 1, -1, -1):
+                key = self._keys[position]
+                if since is not None and key[0] < since:
+                    break
+                record = self._by_id[key[1]]
+                if record.status in statuses:
+                    bodies.append(record.body)
+                    keys.append(key)
+                    if limit is not None and len(bodies) == limit:
+                        break
+        return bodies, keys
+
+    def table_orders(self, table):
+        """Order dicts of a table's active orders, oldest first"""
+        with self._lock:
+            records = [self._by_id[order_id] for order_id in self._by_table.get(table, ())]
+        return [record.to_dict() for record in sorted(records, key=lambda record: record.key)]
+
+    def counts(self):
+        """Number of cached orders per active status"""
+        with self._lock:
+            return {status: len(ids) for status, ids in self._by_status.items()}
+
+    def __len__(self):
+        return len(self._by_id)
+
+
+# Process-wide cache used by app.py
+cache = ActiveOrders()
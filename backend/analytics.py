@@ -0,0 +1,186 @@
+"""
+Order analytics: per-minute, per-hour and per-day rollups for the manager dashboard
+Rollup rows are upserted in the same transaction as each order write, so range
+queries read a few hundred pre-aggregated rows instead of scanning orders
+"""
+from datetime import timedelta
+from functools import lru_cache
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from health_index import NUTRIENTS
+from models import OrderRollup, ItemRollup, HEALTH_CONDITIONS
+from serializers import fetch_orders, orders_table
+
+order_rollups = OrderRollup.__table__
+item_rollups = ItemRollup.__table__
+
+GRANULARITIES = {
+    'minute': lambda ts: ts.replace(second=0, microsecond=0),
+    'hour': lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+    'day': lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+BUCKET_LENGTH = {'minute': timedelta(minutes=1), 'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+
+# healthConditions key -> order_rollups column
+HEALTH_COLUMNS = {'diabetes': 'diabetes', 'cholesterol': 'cholesterol',
+                  'bloodPressure': 'blood_pressure', 'sugarFree': 'sugar_free'}
+ORDER_MEASURES = ['orders', 'items', 'revenue', *NUTRIENTS, *HEALTH_COLUMNS.values()]
+
+# Orders read per query when backfilling rollups from existing data
+BACKFILL_CHUNK = 1000
+
+
+def pick_granularity(start, end, max_buckets):
+    """Finest granularity that covers start..end in at most max_buckets buckets"""
+    for granularity in ('minute', 'hour', 'day'):
+        if (end - start) / BUCKET_LENGTH[granularity] <= max_buckets:
+            return granularity
+    return 'day'
+
+
+def rollup_deltas(orders, placed_at, sign=1):
+    """Per-bucket deltas for order dicts placed at the given timestamps
+
+    Returns ({(granularity, bucket): {measure: delta}},
+             {(granularity, bucket, menu_item_id): {name, quantity, revenue}}).
+    sign=-1 gives the deltas that remove the orders again.
+    """
+    order_deltas, item_deltas = {}, {}
+    for order_dict, timestamp in zip(orders, placed_at):
+        items = order_dict['items']
+        totals = {measure: 0 for measure in ORDER_MEASURES}
+        totals['orders'] = 1
+        for item in items:
+            quantity = item['quantity'] or 0
+            totals['items'] += quantity
+            totals['revenue'] += (item['price'] or 0) * quantity
+            for nutrient in NUTRIENTS:
+                totals[nutrient] += (item[nutrient] or 0) * quantity
+        health_conditions = order_dict['healthConditions'] or {}
+        for condition in HEALTH_CONDITIONS:
+            if health_conditions.get(condition):
+                totals[HEALTH_COLUMNS[condition]] = 1
+
+        for granularity, truncate in GRANULARITIES.items():
+            bucket = truncate(timestamp)
+            deltas = order_deltas.setdefault((granularity, bucket), {measure: 0 for measure in ORDER_MEASURES})
+            for measure, value in totals.items():
+                deltas[measure] += sign * value
+            for item in items:
+                key = (granularity, bucket, item['menuItemId'])
+                entry = item_deltas.setdefault(key, {'name': item['name'], 'quantity': 0, 'revenue': 0})
+                quantity = item['quantity'] or 0
+                entry['quantity'] += sign * quantity
+                entry['revenue'] += sign * (item['price'] or 0) * quantity
+    return order_deltas, item_deltas
+
+
+def insert_for(db):
+    """The dialect's insert() (it has ON CONFLICT) for a session or connection"""
+    # Sessions and plain connections (migrations) both end up here
+    dialect = db.dialect if hasattr(db, 'dialect') else db.get_bind().dialect
+    return postgresql.insert if dialect.name == 'postgresql' else sqlite.insert
+
+
+def upsert(db, table, keys, measures, rows):
+    """INSERT ... ON CONFLICT DO UPDATE SET measure = measure + excluded.measure"""
+    db.execute(_upsert_statement(insert_for(db), table, tuple(keys), tuple(measures)), rows)
+
+
+@lru_cache(maxsize=None)
+def _upsert_statement(insert, table, keys, measures):
+    # Built once per table: constructing the SET clause costs more than running it
+    statement = insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={measure: table.c[measure] + statement.excluded[measure] for measure in measures}
+    )
+
+
+def apply_deltas(db, order_deltas, item_deltas):
+    """Add the deltas to the rollup tables (the caller commits)"""
+    if order_deltas:
+        upsert(db, order_rollups, ['granularity', 'bucket'], ORDER_MEASURES, [
+            {'granularity': granularity, 'bucket': bucket, **deltas}
+            for (granularity, bucket), deltas in order_deltas.items()
+        ])
+    if item_deltas:
+        upsert(db, item_rollups, ['granularity', 'bucket', 'menu_item_id'], ['quantity', 'revenue'], [
+            {'granularity': granularity, 'bucket': bucket, 'menu_item_id': menu_item_id, **entry}
+            for (granularity, bucket, menu_item_id), entry in item_deltas.items()
+        ])
+
+
+def record_orders(db, orders, placed_at, sign=1):
+    """Add (sign=1) or remove (sign=-1) orders from the rollups"""
+    apply_deltas(db, *rollup_deltas(orders, placed_at, sign))
+
+
+def backfill(connection):
+    """Rebuild the rollups from every stored order (used by the migration)"""
+    connection.execute(order_rollups.delete())
+    connection.execute(item_rollups.delete())
+    last_id = 0
+    while True:
+        orders, keys = fetch_orders(connection, orders_table.c.id > last_id,
+                                    order_by=(orders_table.c.id,), limit=BACKFILL_CHUNK)
+        if not orders:
+            break
+        record_orders(connection, orders, [timestamp for timestamp, _ in keys])
+        last_id = keys[-1][1]
+
+
+def query_range(db, start, end, granularity, top_items=10):
+    """Rollup series and totals for buckets starting in [start, end)"""
+    truncate = GRANULARITIES[granularity]
+    bucket_range = (order_rollups.c.granularity == granularity,
+                    order_rollups.c.bucket >= truncate(start), order_rollups.c.bucket < end)
+    rows = db.execute(
+        select(order_rollups.c.bucket, *[order_rollups.c[measure] for measure in ORDER_MEASURES])
+        .where(*bucket_range)
+        .order_by(order_rollups.c.bucket)
+    ).all()
+
+    series = []
+    totals = {measure: 0 for measure in ORDER_MEASURES}
+    for row in rows:
+        values = dict(zip(ORDER_MEASURES, row[1:]))
+        if not values['orders']:
+            continue
+        for measure, value in values.items():
+            totals[measure] += value
+        series.append({'bucket': row.bucket.isoformat(), **_public(values)})
+
+    quantity = func.sum(item_rollups.c.quantity)
+    popular = db.execute(
+        select(item_rollups.c.menu_item_id, func.max(item_rollups.c.name), quantity, func.sum(item_rollups.c.revenue))
+        .where(item_rollups.c.granularity == granularity,
+               item_rollups.c.bucket >= truncate(start), item_rollups.c.bucket < end)
+        .group_by(item_rollups.c.menu_item_id)
+        .having(quantity > 0)
+        .order_by(quantity.desc(), item_rollups.c.menu_item_id)
+        .limit(top_items)
+    ).all()
+
+    return {
+        'granularity': granularity,
+        'start': truncate(start).isoformat(),
+        'end': end.isoformat(),
+        'totals': _public(totals),
+        'series': series,
+        'topItems': [{'menuItemId': menu_item_id, 'name': name, 'quantity': int(sold), 'revenue': revenue}
+                     for menu_item_id, name, sold, revenue in popular],
+    }
+
+
+def _public(values):
+    """Rollup column values in the API's camelCase shape"""
+    return {
+        'orders': values['orders'],
+        'items': values['items'],
+        'revenue': round(values['revenue'], 2),
+        'nutrition': {nutrient: round(values[nutrient], 1) for nutrient in NUTRIENTS},
+        'healthConditions': {condition: values[column] for condition, column in HEALTH_COLUMNS.items()},
+    }
@@ -2,15 +2,42 @@
 Flask Backend for Restaurant Automation System
 REST API + Socket.IO for real-time updates
 """
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
-from datetime import datetime
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
+from sqlalchemy import and_, or_, insert, select
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta, timezone
+import base64
+import time
 import random
 import os
 
-from database import SessionLocal, init_db
-from models import Order, OrderItem
+from changelog import ChangeLog
+from coalescer import EventCoalescer
+import fastjson
+import database
+from database import get_db, remove_db_session, init_db
+from models import Order, OrderItem, ORDER_STATUSES, HEALTH_CONDITIONS
+from menu import catalog as menu_catalog, ITEM_FIELDS as MENU_ITEM_FIELDS
+from health_index import index as health_index, NUTRIENTS
+from serializers import fetch_orders, fetch_orders_by_id, format_timestamp, json_response, archived_orders_table
+from stats import counters as stats_counters
+from kitchen import scheduler as kitchen_scheduler, STATIONS as KITCHEN_STATIONS
+import rooms as order_rooms
+import analytics
+import archive
+import lifecycle
+import nutrition
+import table_sessions
+from active_orders import cache as active_orders, BOARD_STATUSES
+from lifecycle import tracker as latency_tracker
+import socket_manager
+import idempotency
+import intake
+from intake import intake as order_intake
+import metrics
+import wire
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -25,24 +52,311 @@ if FRONTEND_URL:
 # Enable CORS for frontend
 CORS(app, origins=cors_origins)
 
-# Initialize Socket.IO
-socketio = SocketIO(app, cors_allowed_origins=cors_origins)
-
-# Menu items (matching frontend)
-MENU_ITEMS = [
-    {'id': 1, 'name': 'Classic Burger', 'category': 'Main', 'price': 12, 'calories': 650, 'protein': 35, 'carbs': 45, 'fat': 38, 'sugar': 8},
-    {'id': 2, 'name': 'Margherita Pizza', 'category': 'Main', 'price': 15, 'calories': 850, 'protein': 28, 'carbs': 95, 'fat': 32, 'sugar': 6},
-    {'id': 3, 'name': 'Carbonara Pasta', 'category': 'Main', 'price': 13, 'calories': 720, 'protein': 25, 'carbs': 85, 'fat': 28, 'sugar': 4},
-    {'id': 4, 'name': 'Caesar Salad', 'category': 'Starter', 'price': 8, 'calories': 320, 'protein': 12, 'carbs': 18, 'fat': 22, 'sugar': 3},
-    {'id': 5, 'name': 'Tomato Soup', 'category': 'Starter', 'price': 6, 'calories': 180, 'protein': 4, 'carbs': 28, 'fat': 6, 'sugar': 12},
-    {'id': 6, 'name': 'Grilled Steak', 'category': 'Main', 'price': 25, 'calories': 480, 'protein': 52, 'carbs': 2, 'fat': 28, 'sugar': 0},
-    {'id': 7, 'name': 'Truffle Fries', 'category': 'Side', 'price': 5, 'calories': 420, 'protein': 5, 'carbs': 52, 'fat': 22, 'sugar': 1},
-    {'id': 8, 'name': 'Gelato', 'category': 'Dessert', 'price': 6, 'calories': 280, 'protein': 4, 'carbs': 38, 'fat': 12, 'sugar': 28},
-    {'id': 9, 'name': 'Tiramisu', 'category': 'Dessert', 'price': 7, 'calories': 450, 'protein': 6, 'carbs': 48, 'fat': 26, 'sugar': 32},
-    {'id': 10, 'name': 'Craft Soda', 'category': 'Drink', 'price': 3, 'calories': 150, 'protein': 0, 'carbs': 38, 'fat': 0, 'sugar': 38},
-    {'id': 11, 'name': 'Espresso', 'category': 'Drink', 'price': 4, 'calories': 5, 'protein': 0, 'carbs': 1, 'fat': 0, 'sugar': 0},
-    {'id': 12, 'name': 'Wine Glass', 'category': 'Drink', 'price': 9, 'calories': 125, 'protein': 0, 'carbs': 4, 'fat': 0, 'sugar': 1},
-]
+# Session-per-request: routes share one session, closed when the request ends
+app.teardown_appcontext(remove_db_session)
+
+# Request duration and SQL statement histograms, served at /metrics
+metrics.init_app(app)
+
+# Initialize Socket.IO; with SOCKETIO_MESSAGE_QUEUE set, emits go through the
+# queue so they reach clients connected to every worker (see socket_manager.py)
+socketio = SocketIO(app, cors_allowed_origins=cors_origins, json=fastjson, **socket_manager.server_options())
+if socket_manager.worker_count() > 1 and not os.environ.get('SOCKETIO_MESSAGE_QUEUE'):
+    print(f'WARNING: WEB_CONCURRENCY={socket_manager.worker_count()} without SOCKETIO_MESSAGE_QUEUE; '
+          'clients only receive updates made by the worker they are connected to')
+
+# Counters only see this process's writes, so other workers' changes are
+# picked up by reloading them from the DB once they are older than this
+if socket_manager.is_multi_worker():
+    stats_counters.max_age = float(os.environ.get('STATS_MAX_AGE', 2))
+    kitchen_scheduler.max_age = float(os.environ.get('KITCHEN_MAX_AGE', 2))
+    # Replaying the event log is heavier, so refresh less often
+    latency_tracker.max_age = float(os.environ.get('LATENCY_MAX_AGE', 60))
+    active_orders.max_age = float(os.environ.get('ACTIVE_ORDERS_MAX_AGE', 2))
+
+# Recent order events, replayed to clients that reconnect
+change_log = ChangeLog(maxlen=int(os.environ.get('CHANGE_LOG_SIZE', 1000)))
+
+# ORDER_INTAKE=journal acknowledges new orders once journaled and commits them
+# behind the request (see intake.py); ids are assigned in-process, so one worker only
+use_order_journal = intake.MODE == 'journal'
+if use_order_journal and socket_manager.is_multi_worker():
+    print('ORDER_INTAKE=journal needs a single worker; committing orders synchronously')
+    use_order_journal = False
+
+# Buffers events for clients that connect with {batch: true} and sends them
+# one coalesced 'orders_delta' per room every SOCKETIO_BATCH_WINDOW_MS
+event_coalescer = EventCoalescer(socketio, change_log)
+
+# Page size for GET /api/orders
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Largest number of orders accepted by POST /api/orders/batch
+MAX_BATCH_SIZE = 200
+
+# Most buckets one GET /api/analytics response may return
+MAX_ANALYTICS_BUCKETS = 2000
+
+# Orders per nutrition report (default and maximum)
+DEFAULT_NUTRITION_ORDERS = 1000
+MAX_NUTRITION_ORDERS = 10000
+
+# Page size for GET /api/history
+DEFAULT_HISTORY_PAGE_SIZE = 100
+MAX_HISTORY_PAGE_SIZE = 1000
+
+# Tickets returned by GET /api/kitchen/stations/<station>/next
+DEFAULT_TICKET_COUNT = 5
+MAX_TICKET_COUNT = 50
+
+
+# ============ PAGINATION HELPERS ============
+
+def naive_utc(value):
+    """A parsed ISO datetime as naive UTC, the way timestamps are stored"""
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def encode_cursor(timestamp, order_id):
+    """Encode an opaque keyset cursor for the (timestamp, id) of an order"""
+    raw = f'{timestamp.isoformat()}|{order_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor into (timestamp, id)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, order_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(order_id)
+    except (ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+
+def after_cursor(table, cursor):
+    """Filter for rows of an orders-shaped table that come after cursor (newest first)"""
+    cursor_timestamp, cursor_id = decode_cursor(cursor)
+    return or_(
+        table.c.timestamp < cursor_timestamp,
+        and_(table.c.timestamp == cursor_timestamp, table.c.id < cursor_id)
+    )
+
+
+# ============ ORDER WRITE HELPERS ============
+
+def order_row(data):
+    """Column values for a new order from a request payload
+
+    Raises ValueError for anything the columns, rollups or table sessions
+    could not take: a journaled order is acknowledged before it is written,
+    so it has to be valid by then.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('An order must be a JSON object')
+    table = data.get('table', '')
+    # Table numbers are stored as text
+    if isinstance(table, int) and not isinstance(table, bool):
+        table = str(table)
+    if not isinstance(table, str) or len(table) > Order.table.type.length:
+        raise ValueError(f'table must be a string of at most {Order.table.type.length} characters')
+    waiter = data.get('waiter', f'Waiter {random.randint(1, 5)}')
+    if waiter is not None and (not isinstance(waiter, str) or len(waiter) > Order.waiter.type.length):
+        raise ValueError(f'waiter must be a string of at most {Order.waiter.type.length} characters')
+    for field in ('customerInfo', 'healthConditions'):
+        if data.get(field) is not None and not isinstance(data[field], dict):
+            raise ValueError(f'{field} must be an object')
+    return {
+        'table': table,
+        'status': 'pending',
+        'waiter': waiter,
+        'timestamp': datetime.utcnow(),
+        'client_order_id': idempotency.validate_key(data.get('clientOrderId')),
+        'customer_info': data.get('customerInfo'),
+        'health_conditions': data.get('healthConditions')
+    }
+
+
+def item_rows(order_id, items):
+    """Column values for the items of an order
+
+    Name, category, price and nutrition come from the menu catalog; the
+    client only chooses the item (menuItemId), quantity and notes.
+    """
+    if not isinstance(items, list):
+        raise ValueError('items must be a list')
+    rows = []
+    for item_data in items:
+        if not isinstance(item_data, dict):
+            raise ValueError('Every item must be an object')
+        menu_item_id = item_data.get('menuItemId')
+        if menu_item_id is None:
+            raise ValueError('Every item needs a menuItemId')
+        menu_item = menu_catalog.get(menu_item_id)
+        if menu_item is None:
+            raise ValueError(f'Unknown menu item: {menu_item_id}')
+        quantity = item_data.get('quantity', 1)
+        # bool is an int subclass; a true "quantity" is not a count
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            raise ValueError(f'Quantity of menu item {menu_item_id} must be a whole number of at least 1')
+        notes = item_data.get('notes', '')
+        if notes is not None and not isinstance(notes, str):
+            raise ValueError(f'Notes of menu item {menu_item_id} must be a string')
+        rows.append({
+            'order_id': order_id,
+            'menu_item_id': menu_item_id,
+            **{field: menu_item[field] for field in MENU_ITEM_FIELDS},
+            'quantity': quantity,
+            'notes': notes
+        })
+    return rows
+
+
+def insert_orders(db, payloads, reserve_ids=None):
+    """Insert orders and all their items as two bulk INSERTs; returns the new ids
+
+    Nothing is committed, so a batch succeeds or fails as one transaction.
+    The orders go in as one multi-row INSERT ... RETURNING: SQLite has no
+    sentinel for an executemany with sort_by_parameter_order and would run
+    one INSERT per order. One statement assigns ascending ids in VALUES
+    order, so sorting the returned ids lines them up with the payloads.
+
+    reserve_ids(item_counts) -> [(order id, item ids)] supplies the ids
+    instead of the database (ORDER_INTAKE=journal assigns them in-process).
+    """
+    menu_catalog.refresh()
+    orders = [order_row(data) for data in payloads]
+    items = [item_rows(None, data.get('items', [])) for data in payloads]
+    if reserve_ids is None:
+        ids = sorted(db.execute(insert(Order).values(orders).returning(Order.id)).scalars().all())
+    else:
+        reserved = reserve_ids([len(rows) for rows in items])
+        ids = [order_id for order_id, _ in reserved]
+        db.execute(insert(Order).values([dict(order, id=order_id) for order, order_id in zip(orders, ids)]))
+        for rows, (_, item_ids) in zip(items, reserved):
+            for row, item_id in zip(rows, item_ids):
+                row['id'] = item_id
+    rows = [dict(row, order_id=order_id) for order_id, order_items in zip(ids, items) for row in order_items]
+    if rows:
+        db.execute(insert(OrderItem), rows)
+    return ids
+
+
+def flag_unsafe_items(order_dict):
+    """Add unsafeItems: menu item ids unsuitable for the order's health conditions"""
+    order_dict['unsafeItems'] = health_index.unsafe_item_ids(
+        [item['menuItemId'] for item in order_dict['items']], order_dict['healthConditions'])
+    return order_dict
+
+
+# ============ BROADCAST HELPERS ============
+
+def broadcast(event, data, waiter, table):
+    """Record an order event in the change log and emit it to the rooms that care
+
+    The sequence metadata travels as a second argument so existing
+    handlers that only read the payload keep working.
+    """
+    targets = order_rooms.audiences(event, data, waiter, table)
+    seq = change_log.record(event, data, targets)
+    meta = change_log.meta(seq)
+    started = time.perf_counter()
+    for target_rooms, payload in targets:
+        socketio.emit(event, (payload, meta), to=target_rooms)
+        if event_coalescer.enabled:
+            event_coalescer.add([order_rooms.batch_room(room) for room in target_rooms], seq, event, payload)
+    metrics.observe_emit(event, time.perf_counter() - started)
+
+
+def broadcast_created_batch(order_dicts):
+    """Emit many new orders as one 'orders_created' event per room
+
+    Each order still gets its own change-log entry, so a client that misses
+    the batch is resynced order by order.
+    """
+    seq = None
+    for order_dict in order_dicts:
+        targets = order_rooms.audiences('order_created', order_dict, order_dict['waiter'], order_dict['table'])
+        seq = change_log.record('order_created', order_dict, targets)
+        if event_coalescer.enabled:
+            for target_rooms, payload in targets:
+                event_coalescer.add([order_rooms.batch_room(room) for room in target_rooms],
+                                    seq, 'order_created', payload)
+    meta = change_log.meta(seq)
+    started = time.perf_counter()
+    for target_rooms, payload in order_rooms.batch_audiences(order_dicts):
+        socketio.emit('orders_created', (payload, meta), to=target_rooms)
+    metrics.observe_emit('orders_created', time.perf_counter() - started)
+
+
+# ============ BACKGROUND TASKS ============
+
+def reject_order(order_dict):
+    """An acknowledged order the database refused: take it back off every screen"""
+    stats_counters.order_deleted(order_dict['status'], order_dict['healthConditions'])
+    kitchen_scheduler.order_removed(order_dict['id'])
+    active_orders.order_removed(order_dict['id'])
+    broadcast('order_deleted', {'orderId': order_dict['id']}, order_dict['waiter'], order_dict['table'])
+
+
+def forget_archived(health_conditions_list):
+    """Archived orders leave the hot tables, so stop counting them"""
+    for health_conditions in health_conditions_list:
+        stats_counters.order_deleted('completed', health_conditions)
+
+
+def warm_up():
+    """Load the menu and the in-memory caches ahead of the requests that need them
+
+    Runs in the background once the worker is serving, so a cold start answers
+    its first request without waiting for these. Each cache still loads on
+    first use if a request gets there first. The latency tracker replays the
+    whole event log and only serves GET /api/latency, so it stays lazy.
+    """
+    try:
+        # Journaled orders must be in the DB before the active-orders snapshot
+        order_intake.drain()
+        db = get_db()
+        # Most-read first, yielding between steps so waiting requests are served
+        active_orders.ensure_loaded(db)
+        socketio.sleep(0)
+        menu_catalog.refresh()
+        health_index.rebuild()
+        socketio.sleep(0)
+        kitchen_scheduler.ensure_loaded(db)
+        socketio.sleep(0)
+        stats_counters.snapshot(db)
+    except Exception as e:
+        print(f'Cache warm-up failed, caches will load on first use: {e}')
+    finally:
+        remove_db_session()
+
+
+_background_tasks_started = False
+
+
+@app.before_request
+def start_background_tasks():
+    """Start the cache warm-up, archiver and intake writer once per worker, on its first request"""
+    global _background_tasks_started
+    if _background_tasks_started:
+        return
+    _background_tasks_started = True
+    if use_order_journal:
+        # Replays orders journaled before a crash or restart
+        order_intake.start(database.engine, on_rejected=reject_order)
+        socketio.start_background_task(order_intake.run_writer, socketio.sleep)
+    socketio.start_background_task(warm_up)
+    if archive.ARCHIVE_INTERVAL > 0:
+        socketio.start_background_task(archive.run_archiver, database.engine, socketio.sleep,
+                                       on_archived=forget_archived)
+
+
+@app.before_request
+def drain_order_intake():
+    """Commit journaled orders before any request other than a new order reads or writes orders"""
+    if request.endpoint != 'create_order':
+        order_intake.drain()
 
 
 # ============ REST API ENDPOINTS ============
@@ -55,69 +369,285 @@ def health_check():
 
 @app.route('/api/menu', methods=['GET'])
 def get_menu():
-    """Get all menu items"""
-    return jsonify(MENU_ITEMS)
+    """Get all menu items (pre-serialized, 304 when the client's ETag matches)"""
+    menu_catalog.refresh()
+    headers = {'ETag': f'"{menu_catalog.etag}"', 'Cache-Control': 'no-cache'}
+    if menu_catalog.etag in request.if_none_match:
+        return Response(status=304, headers=headers)
+    return Response(menu_catalog.body, mimetype='application/json', headers=headers)
+
+
+@app.route('/api/menu/reload', methods=['POST'])
+def reload_menu():
+    """Re-read the menu file now (it is also picked up automatically when it changes)"""
+    menu_catalog.load()
+    return jsonify({'items': len(menu_catalog.items), 'etag': menu_catalog.etag})
+
+
+@app.route('/api/menu/compatible', methods=['GET'])
+def get_compatible_menu():
+    """Menu items suitable for a set of health conditions and nutrient limits
+
+    Query params: any of diabetes, cholesterol, bloodPressure, sugarFree set
+    to 1/true, and maxCalories, maxProtein, maxCarbs, maxFat, maxSugar.
+    """
+    conditions = [c for c in HEALTH_CONDITIONS if request.args.get(c, '').lower() in ('1', 'true', 'yes')]
+    max_nutrients = {}
+    for nutrient in NUTRIENTS:
+        value = request.args.get('max' + nutrient.capitalize())
+        if value is not None:
+            try:
+                max_nutrients[nutrient] = float(value)
+            except ValueError:
+                return jsonify({'error': f'Invalid max{nutrient.capitalize()}'}), 400
+
+    menu_catalog.refresh()
+    return jsonify(health_index.compatible(conditions, max_nutrients))
 
 
 @app.route('/api/orders', methods=['GET'])
 def get_orders():
-    """Get all orders"""
-    db = SessionLocal()
+    """Get a page of orders, newest first
+
+    Query params:
+        status: one status or a comma-separated list of statuses
+        since: ISO datetime, only orders placed at or after it
+        limit: page size (default 100, max 500)
+        cursor: nextCursor from the previous page
+        schema: 'compact' to send menu-derived item fields by menuItemId only
+
+    Accept: application/msgpack and Accept-Encoding: br / gzip are honoured
+    (see wire.py); JSON is the default. Pages of active statuses only (the
+    live board) are served from the active-orders cache without SQL.
+    """
     try:
-        orders = db.query(Order).order_by(Order.timestamp.desc()).all()
-        return jsonify([order.to_dict() for order in orders])
-    finally:
-        db.close()
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+
+    query_filters = []
+
+    statuses = None
+    status = request.args.get('status')
+    if status:
+        statuses = [s.strip() for s in status.split(',') if s.strip()]
+        if any(s not in ORDER_STATUSES for s in statuses):
+            return jsonify({'error': 'Invalid status'}), 400
+        query_filters.append(Order.status.in_(statuses))
+
+    since_at = None
+    since = request.args.get('since')
+    if since:
+        try:
+            since_at = naive_utc(datetime.fromisoformat(since))
+        except ValueError:
+            return jsonify({'error': 'Invalid since'}), 400
+        query_filters.append(Order.timestamp >= since_at)
+
+    cursor_key = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_key = decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        query_filters.append(after_cursor(Order.__table__, cursor))
+
+    db = get_db()
+    client_wire = wire.negotiate(request)
+    next_cursor = None
+    if statuses and set(statuses) <= set(BOARD_STATUSES):
+        active_orders.ensure_loaded(db)
+        bodies, keys = active_orders.page(statuses, since_at, cursor_key, limit + 1)
+        if len(bodies) > limit:
+            bodies = bodies[:limit]
+            next_cursor = encode_cursor(*keys[limit - 1])
+        if client_wire.format == 'json' and not client_wire.compact:
+            # Splice the cached bodies instead of decoding and re-encoding them
+            return wire.encoded_response(
+                b'{"orders":[' + b','.join(bodies) + b'],"nextCursor":' + fastjson.dumps_bytes(next_cursor) + b'}',
+                client_wire)
+        orders = [fastjson.loads(body) for body in bodies]
+    else:
+        # Fetch one extra row to know whether another page exists;
+        # items are loaded in a single batched SELECT ... IN query
+        orders, keys = fetch_orders(db, *query_filters, limit=limit + 1)
+        if len(orders) > limit:
+            orders = orders[:limit]
+            next_cursor = encode_cursor(*keys[limit - 1])
+
+    if client_wire.compact:
+        return wire.response({
+            'orders': [wire.compact_order(order) for order in orders],
+            'nextCursor': next_cursor,
+            'menu': menu_catalog.etag
+        }, client_wire)
+    return wire.response({
+        'orders': orders,
+        'nextCursor': next_cursor
+    }, client_wire)
+
+
+def replayed_response(status, body):
+    """A stored order response, sent again for a retried request"""
+    response = Response(body, status=status, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def accepted_order_response(order_dict, placed_at, key, request_fingerprint):
+    """Update the in-memory views, broadcast a new order and answer 201"""
+    order_dict = flag_unsafe_items(order_dict)
+    stats_counters.order_created(order_dict['status'], order_dict['healthConditions'])
+    kitchen_scheduler.order_created(order_dict, placed_at)
+    active_orders.order_created(order_dict, placed_at)
+
+    # Emit real-time event to all connected clients
+    broadcast('order_created', order_dict, order_dict['waiter'], order_dict['table'])
+
+    response = json_response(order_dict, 201)
+    if key is not None:
+        idempotency.responses.put(key, request_fingerprint, 201, response.get_data())
+    return response
+
+
+def stored_order_response(db, key, request_fingerprint):
+    """Response for the order already created with key, or None (and cache it)"""
+    orders, _ = fetch_orders(db, Order.__table__.c.client_order_id == key)
+    if not orders:
+        return None
+    body = fastjson.dumps_bytes(flag_unsafe_items(orders[0]))
+    idempotency.responses.put(key, request_fingerprint, 201, body)
+    return replayed_response(201, body)
 
 
 @app.route('/api/orders', methods=['POST'])
 def create_order():
-    """Create a new order"""
+    """Create a new order
+
+    Retries are safe with an Idempotency-Key header (or clientOrderId in the
+    body): a key seen before returns the original response, marked with
+    Idempotent-Replayed: true, and nothing is written or broadcast again.
+
+    With ORDER_INTAKE=journal the order is journaled, broadcast and answered
+    at once; the database commit happens in the background.
+    """
     data = request.json
-    db = SessionLocal()
+    db = get_db()
     try:
-        # Create order
-        order = Order(
-            table=data.get('table', ''),
-            status='pending',
-            waiter=data.get('waiter', f'Waiter {random.randint(1, 5)}'),
-            timestamp=datetime.utcnow(),
-            customer_info=data.get('customerInfo'),
-            health_conditions=data.get('healthConditions')
-        )
-        db.add(order)
-        db.flush()  # Get the order ID
-
-        # Add order items
-        for item_data in data.get('items', []):
-            item = OrderItem(
-                order_id=order.id,
-                menu_item_id=item_data.get('menuItemId', item_data.get('id', 0)),
-                name=item_data.get('name', ''),
-                category=item_data.get('category', ''),
-                price=item_data.get('price', 0),
-                quantity=item_data.get('quantity', 1),
-                notes=item_data.get('notes', ''),
-                calories=item_data.get('calories', 0),
-                protein=item_data.get('protein', 0),
-                carbs=item_data.get('carbs', 0),
-                fat=item_data.get('fat', 0),
-                sugar=item_data.get('sugar', 0)
-            )
-            db.add(item)
+        key = idempotency.validate_key(request.headers.get(idempotency.HEADER) or (data or {}).get('clientOrderId'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    request_fingerprint = None
+    if key is not None:
+        data = dict(data, clientOrderId=key)
+        request_fingerprint = idempotency.fingerprint(request.get_data())
+        cached = idempotency.responses.get(key)
+        if cached is not None:
+            stored_fingerprint, status, body = cached
+            if stored_fingerprint is not None and stored_fingerprint != request_fingerprint:
+                return jsonify({'error': f'{idempotency.HEADER} was already used for a different order'}), 422
+            return replayed_response(status, body)
+        pending = order_intake.pending_order(key)
+        if pending is not None:
+            return replayed_response(201, fastjson.dumps_bytes(flag_unsafe_items(pending)))
+        # Created by another worker, before a restart or evicted from the cache
+        stored = stored_order_response(db, key, request_fingerprint)
+        if stored is not None:
+            return stored
 
+    if order_intake.enabled:
+        try:
+            menu_catalog.refresh()
+            order_dict, placed_at = order_intake.submit(order_row(data), item_rows(None, data.get('items', [])))
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
+        return accepted_order_response(order_dict, placed_at, key, request_fingerprint)
+
+    try:
+        order_ids = insert_orders(db, [data])
+        orders, keys = fetch_orders_by_id(db, order_ids)
+        placed_at = [timestamp for timestamp, _ in keys]
+        analytics.record_orders(db, orders, placed_at)
+        table_sessions.record_orders(db, orders, placed_at)
+        lifecycle.record_created(db, order_ids, placed_at)
         db.commit()
-        order_dict = order.to_dict()
+    except IntegrityError as e:
+        db.rollback()
+        # A concurrent retry with the same key committed first
+        stored = stored_order_response(db, key, request_fingerprint) if key is not None else None
+        return stored if stored is not None else (jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        db.rollback()
+        return jsonify({'error': str(e)}), 400
+    # Committed: cache updates and broadcasts run outside the rollback above
+    return accepted_order_response(orders[0], keys[0][0], key, request_fingerprint)
 
-        # Emit real-time event to all connected clients
-        socketio.emit('order_created', order_dict)
 
-        return jsonify(order_dict), 201
+@app.route('/api/orders/batch', methods=['POST'])
+def create_orders_batch():
+    """Create many orders in one transaction
+
+    Body: {"orders": [<order payload>, ...]}, e.g. a tablet syncing after
+    being offline or a banquet. Either every order is stored or none is.
+    Orders whose clientOrderId already exists are returned as stored instead
+    of being created again, so a resent batch only adds what is missing.
+    """
+    data = request.json or {}
+    payloads = data.get('orders')
+    if not isinstance(payloads, list) or not payloads:
+        return jsonify({'error': 'orders must be a non-empty list'}), 400
+    if len(payloads) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} orders per batch'}), 400
+
+    db = get_db()
+    client_keys = [payload.get('clientOrderId') for payload in payloads
+                   if isinstance(payload, dict) and payload.get('clientOrderId') is not None]
+    existing = {}
+    if client_keys:
+        existing = dict(db.execute(
+            select(Order.client_order_id, Order.id).where(Order.client_order_id.in_(client_keys))
+        ).all())
+
+    def stored_id(payload):
+        return existing.get(payload.get('clientOrderId')) if isinstance(payload, dict) else None
+
+    new_payloads = [payload for payload in payloads if stored_id(payload) is None]
+    try:
+        # Journaled orders get their ids in-process; take the batch's from the same counters
+        reserve_ids = order_intake.reserve_ids if order_intake.enabled else None
+        order_ids = insert_orders(db, new_payloads, reserve_ids) if new_payloads else []
+        orders, keys = fetch_orders_by_id(db, order_ids)
+        placed_at = [timestamp for timestamp, _ in keys]
+        analytics.record_orders(db, orders, placed_at)
+        table_sessions.record_orders(db, orders, placed_at)
+        lifecycle.record_created(db, order_ids, placed_at)
+        if reserve_ids is not None:
+            intake.sync_sequences(db.connection())
+        db.commit()
     except Exception as e:
         db.rollback()
         return jsonify({'error': str(e)}), 400
-    finally:
-        db.close()
+
+    order_dicts = [flag_unsafe_items(order_dict) for order_dict in orders]
+    for order_dict, (placed_at, _) in zip(order_dicts, keys):
+        stats_counters.order_created(order_dict['status'], order_dict['healthConditions'])
+        kitchen_scheduler.order_created(order_dict, placed_at)
+        active_orders.order_created(order_dict, placed_at)
+
+    if order_dicts:
+        broadcast_created_batch(order_dicts)
+
+    if not existing:
+        return json_response({'orders': order_dicts}, 201)
+
+    # Resent batch: answer with every order in request order, stored ones included
+    stored, _ = fetch_orders_by_id(db, list(existing.values()))
+    by_id = {order_dict['id']: order_dict for order_dict in order_dicts}
+    by_id.update((order_dict['id'], flag_unsafe_items(order_dict)) for order_dict in stored)
+    new_ids = iter(order_ids)
+    response_orders = [by_id[stored_id(payload) or next(new_ids)] for payload in payloads]
+    return json_response({'orders': response_orders}, 201 if order_dicts else 200)
 
 
 @app.route('/api/orders/<int:order_id>/status', methods=['PUT'])
@@ -126,108 +656,417 @@ def update_order_status(order_id):
     data = request.json
     new_status = data.get('status')
     
-    if new_status not in ['pending', 'preparing', 'ready', 'completed']:
+    if new_status not in ORDER_STATUSES:
         return jsonify({'error': 'Invalid status'}), 400
 
-    db = SessionLocal()
-    try:
-        order = db.query(Order).filter(Order.id == order_id).first()
-        if not order:
-            return jsonify({'error': 'Order not found'}), 404
+    db = get_db()
+    order = db.query(Order).filter(Order.id == order_id).first()
+    if not order:
+        return jsonify({'error': 'Order not found'}), 404
 
-        old_status = order.status
-        order.status = new_status
-        db.commit()
-        order_dict = order.to_dict()
+    old_status = order.status
+    order.status = new_status
+    now = datetime.utcnow()
+    seconds_in_status = None
+    if old_status != new_status:
+        seconds_in_status = lifecycle.record_transition(db, order_id, old_status, new_status, order.timestamp, now)
+    db.commit()
+    stats_counters.status_changed(old_status, new_status)
+    cached = active_orders.get(order_id)
+    if cached is not None:
+        order_dict, placed_at = cached
+        order_dict['status'] = new_status
+    else:
+        orders, keys = fetch_orders_by_id(db, [order_id])
+        order_dict, placed_at = orders[0], keys[0][0]
+    kitchen_scheduler.status_changed(order_dict, placed_at)
+    active_orders.status_changed(order_dict, placed_at)
+    if old_status != new_status:
+        latency_tracker.status_changed(order_dict, old_status, seconds_in_status, placed_at, now)
 
-        # Emit real-time event for status update
-        socketio.emit('order_updated', {
-            'order': order_dict,
-            'oldStatus': old_status,
-            'newStatus': new_status
-        })
+    # Emit real-time event for status update
+    broadcast('order_updated', {
+        'order': order_dict,
+        'oldStatus': old_status,
+        'newStatus': new_status
+    }, order_dict['waiter'], order_dict['table'])
 
-        return jsonify(order_dict)
-    finally:
-        db.close()
+    return json_response(order_dict)
 
 
 @app.route('/api/orders/<int:order_id>', methods=['DELETE'])
 def delete_order(order_id):
     """Delete an order"""
-    db = SessionLocal()
-    try:
-        order = db.query(Order).filter(Order.id == order_id).first()
-        if not order:
-            return jsonify({'error': 'Order not found'}), 404
+    db = get_db()
+    order = db.query(Order).filter(Order.id == order_id).first()
+    if not order:
+        return jsonify({'error': 'Order not found'}), 404
 
-        db.delete(order)
-        db.commit()
+    status, health_conditions = order.status, order.health_conditions
+    waiter, table = order.waiter, order.table
+    orders, keys = fetch_orders_by_id(db, [order_id])
+    placed_at = [timestamp for timestamp, _ in keys]
+    analytics.record_orders(db, orders, placed_at, sign=-1)
+    table_sessions.record_orders(db, orders, placed_at, sign=-1)
+    db.delete(order)
+    db.commit()
+    stats_counters.order_deleted(status, health_conditions)
+    kitchen_scheduler.order_removed(order_id)
+    active_orders.order_removed(order_id)
 
-        # Emit real-time event for deletion
-        socketio.emit('order_deleted', {'orderId': order_id})
+    # Emit real-time event for deletion
+    broadcast('order_deleted', {'orderId': order_id}, waiter, table)
+
+    return jsonify({'message': 'Order deleted', 'orderId': order_id})
 
-        return jsonify({'message': 'Order deleted', 'orderId': order_id})
-    finally:
-        db.close()
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint (this worker's metrics)"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
-    """Get order statistics"""
-    db = SessionLocal()
-    try:
-        orders = db.query(Order).all()
-        
-        stats = {
-            'total': len(orders),
-            'pending': len([o for o in orders if o.status == 'pending']),
-            'preparing': len([o for o in orders if o.status == 'preparing']),
-            'ready': len([o for o in orders if o.status == 'ready']),
-            'completed': len([o for o in orders if o.status == 'completed']),
-        }
+    """Get order statistics
 
-        # Health stats
-        orders_with_health = [o for o in orders if o.health_conditions]
-        health_stats = {
-            'diabetes': len([o for o in orders_with_health if o.health_conditions.get('diabetes')]),
-            'cholesterol': len([o for o in orders_with_health if o.health_conditions.get('cholesterol')]),
-            'bloodPressure': len([o for o in orders_with_health if o.health_conditions.get('bloodPressure')]),
-            'sugarFree': len([o for o in orders_with_health if o.health_conditions.get('sugarFree')]),
+    Served from in-memory counters; pass ?verify=1 to check them against a
+    full SQL recompute (mismatches are reported and the counters reloaded).
+    """
+    db = get_db()
+    stats = stats_counters.snapshot(db)
+    if request.args.get('verify'):
+        mismatches = stats_counters.verify(db)
+        stats = stats_counters.snapshot(db)
+        stats['consistency'] = {
+            'ok': not mismatches,
+            'mismatches': {key: {'counter': got, 'expected': want} for key, (got, want) in mismatches.items()}
         }
+    return jsonify(stats)
 
-        return jsonify({
-            'orderStats': stats,
-            'healthStats': health_stats
-        })
-    finally:
-        db.close()
+
+@app.route('/api/history', methods=['GET'])
+def get_history():
+    """Archived (completed) orders, newest first
+
+    Query params:
+        start, end: ISO datetimes (UTC), orders placed in [start, end)
+        table, waiter: exact matches
+        limit: page size (default 100, max 1000)
+        cursor: nextCursor from the previous page
+    Orders carry placedAt (ISO date and time) next to the usual fields.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_HISTORY_PAGE_SIZE)), 1), MAX_HISTORY_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+
+    archived = archived_orders_table
+    query_filters = []
+    try:
+        if request.args.get('start'):
+            query_filters.append(archived.c.timestamp >= naive_utc(datetime.fromisoformat(request.args['start'])))
+        if request.args.get('end'):
+            query_filters.append(archived.c.timestamp < naive_utc(datetime.fromisoformat(request.args['end'])))
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO datetimes'}), 400
+    if request.args.get('cursor'):
+        try:
+            query_filters.append(after_cursor(archived, request.args['cursor']))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    for param in ('table', 'waiter'):
+        if request.args.get(param):
+            query_filters.append(archived.c[param] == request.args[param])
+
+    orders, keys = fetch_orders(get_db(), *query_filters, limit=limit + 1, archive=True)
+    next_cursor = None
+    if len(orders) > limit:
+        orders, keys = orders[:limit], keys[:limit]
+        next_cursor = encode_cursor(*keys[-1])
+    for order_dict, (placed_at, _) in zip(orders, keys):
+        order_dict['placedAt'] = placed_at.isoformat()
+
+    return json_response({
+        'orders': orders,
+        'nextCursor': next_cursor
+    })
+
+
+@app.route('/api/history/<int:order_id>', methods=['GET'])
+def get_archived_order(order_id):
+    """One archived order"""
+    orders, keys = fetch_orders(get_db(), archived_orders_table.c.id == order_id, archive=True)
+    if not orders:
+        return jsonify({'error': 'Order not found'}), 404
+    orders[0]['placedAt'] = keys[0][0].isoformat()
+    return json_response(orders[0])
+
+
+@app.route('/api/analytics', methods=['GET'])
+def get_analytics():
+    """Order, revenue, popularity, nutrition and health totals over a time range
+
+    Query params:
+        start, end   ISO datetimes in UTC (default: the last 24 hours)
+        granularity  minute, hour or day (default: the finest one that fits
+                     the range in MAX_ANALYTICS_BUCKETS buckets)
+        top          number of most popular items to return (default 10)
+    Read from the rollup tables only, so the cost depends on the number of
+    buckets, not the number of orders.
+    """
+    try:
+        end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else datetime.utcnow()
+        start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=1)
+        top = min(max(int(request.args.get('top', 10)), 0), 100)
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO datetimes, top an integer'}), 400
+    # Rollups are keyed on naive UTC timestamps
+    start, end = naive_utc(start), naive_utc(end)
+    if end <= start:
+        return jsonify({'error': 'end must be after start'}), 400
+
+    granularity = request.args.get('granularity') or analytics.pick_granularity(start, end, MAX_ANALYTICS_BUCKETS)
+    if granularity not in analytics.GRANULARITIES:
+        return jsonify({'error': f'granularity must be one of {list(analytics.GRANULARITIES)}'}), 400
+    if (end - start) / analytics.BUCKET_LENGTH[granularity] > MAX_ANALYTICS_BUCKETS:
+        return jsonify({'error': f'Range spans more than {MAX_ANALYTICS_BUCKETS} {granularity} buckets'}), 400
+
+    return json_response(analytics.query_range(get_db(), start, end, granularity, top_items=top))
+
+
+@app.route('/api/orders/<int:order_id>/nutrition', methods=['GET'])
+def get_order_nutrition(order_id):
+    """Nutrient totals of an order, overall and per guest, with every item
+    checked against the limits its health conditions imply (archived orders too)"""
+    db = get_db()
+    menu_catalog.refresh()
+    orders, _ = fetch_orders_by_id(db, [order_id])
+    if not orders:
+        orders, _ = fetch_orders(db, archived_orders_table.c.id == order_id, archive=True)
+    if not orders:
+        return jsonify({'error': 'Order not found'}), 404
+    return json_response(nutrition.order_nutrition(orders[0]))
+
+
+@app.route('/api/nutrition', methods=['GET'])
+def get_nutrition_report():
+    """Nutrition summaries of many orders, per order, per table and overall
+
+    Query params:
+        status: one status or a comma-separated list (default: all)
+        table: only this table
+        since: ISO datetime, only orders placed at or after it
+        limit: newest orders to include (default 1000, max 10000)
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_NUTRITION_ORDERS)), 1), MAX_NUTRITION_ORDERS)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+
+    query_filters = []
+    status = request.args.get('status')
+    if status:
+        statuses = [s.strip() for s in status.split(',') if s.strip()]
+        if any(s not in ORDER_STATUSES for s in statuses):
+            return jsonify({'error': 'Invalid status'}), 400
+        query_filters.append(Order.status.in_(statuses))
+    if request.args.get('table'):
+        query_filters.append(Order.table == request.args['table'])
+    since = request.args.get('since')
+    if since:
+        try:
+            query_filters.append(Order.timestamp >= naive_utc(datetime.fromisoformat(since)))
+        except ValueError:
+            return jsonify({'error': 'Invalid since'}), 400
+
+    return json_response(nutrition.report(get_db(), *query_filters, limit=limit))
+
+
+@app.route('/api/tables', methods=['GET'])
+def get_tables():
+    """Open table sessions with their running bill and nutrition totals"""
+    return json_response({'tables': table_sessions.open_sessions(get_db())})
+
+
+@app.route('/api/tables/<table>/bill', methods=['GET'])
+def get_table_bill(table):
+    """Bill of a table's open session: totals plus one line per menu item
+
+    Query params: session (id of one of the table's closed sessions instead)
+    """
+    session_id = request.args.get('session')
+    if session_id is not None:
+        try:
+            session_id = int(session_id)
+        except ValueError:
+            return jsonify({'error': 'session must be an integer'}), 400
+    table_bill = table_sessions.bill(get_db(), table, session_id)
+    if table_bill is None:
+        return jsonify({'error': 'No open session for this table' if session_id is None else 'Session not found'}), 404
+    return json_response(table_bill)
+
+
+@app.route('/api/tables/<table>/open', methods=['POST'])
+def open_table(table):
+    """Seat a party: open a session for the table (orders open one on their own too)"""
+    db = get_db()
+    table_sessions.open_session(db, table, datetime.utcnow())
+    db.commit()
+    return json_response(table_sessions.bill(db, table))
+
+
+@app.route('/api/tables/<table>/close', methods=['POST'])
+def close_table(table):
+    """Close the table's open session and return its final bill; the next order opens a new one"""
+    db = get_db()
+    session_id = table_sessions.close_session(db, table, datetime.utcnow())
+    if session_id is None:
+        return jsonify({'error': 'No open session for this table'}), 404
+    db.commit()
+    return json_response(table_sessions.bill(db, table, session_id))
+
+
+@app.route('/api/latency', methods=['GET'])
+def get_latency():
+    """Percentiles of the time orders spend in each status, in seconds
+
+    Overall, per kitchen station and per menu item; 'total' is creation to
+    completion. Estimated from fixed-size sketches (about 2% relative error).
+    """
+    latency_tracker.ensure_loaded(get_db())
+    return json_response(latency_tracker.snapshot())
+
+
+@app.route('/api/kitchen/stations', methods=['GET'])
+def get_kitchen_stations():
+    """Number of queued tickets per kitchen station"""
+    kitchen_scheduler.ensure_loaded(get_db())
+    return jsonify({'stations': kitchen_scheduler.queue_lengths()})
+
+
+@app.route('/api/kitchen/stations/<station>/next', methods=['GET'])
+def get_next_tickets(station):
+    """Next tickets a station should start, most urgent first
+
+    Query params: n (default 5, max 50). Tickets are built from the active
+    orders' items and ordered by startBy, the latest time cooking must start
+    for all of an order's stations to finish together.
+    """
+    if station not in KITCHEN_STATIONS:
+        return jsonify({'error': 'Unknown station', 'stations': KITCHEN_STATIONS}), 404
+    try:
+        count = min(max(int(request.args.get('n', DEFAULT_TICKET_COUNT)), 1), MAX_TICKET_COUNT)
+    except ValueError:
+        return jsonify({'error': 'n must be an integer'}), 400
+
+    kitchen_scheduler.ensure_loaded(get_db())
+    tickets = [dict(ticket, startBy=format_timestamp(ticket['startBy']))
+               for ticket in kitchen_scheduler.next_tickets(station, count)]
+    return json_response({'station': station, 'tickets': tickets})
 
 
 # ============ SOCKET.IO EVENTS ============
 
+def join_order_rooms(subscription):
+    """Move the current client into the rooms for its subscription
+
+    {batch: true} subscriptions join the batch variant of each room, in the
+    wire format their {format, compression, schema} options ask for.
+    Per-event emits are always plain JSON, so those options only apply to
+    batched clients while the coalescer is on. Returns the rooms joined and
+    the wire options that were not applied, which 'connected' and
+    'subscribed' report as ignoredOptions.
+    """
+    current = set(rooms()) - {request.sid}
+    wanted = order_rooms.rooms_for(subscription)
+    if event_coalescer.enabled and isinstance(subscription, dict) and subscription.get('batch'):
+        client_wire = wire.for_subscription(subscription)
+        event_coalescer.use_wire(client_wire)
+        wanted = [order_rooms.wire_room(order_rooms.batch_room(room), client_wire.name) for room in wanted]
+    else:
+        client_wire = wire.DEFAULT
+    for room in current - set(wanted):
+        leave_room(room)
+    for room in wanted:
+        join_room(room)
+    return wanted, wire.unapplied_options(subscription, client_wire)
+
+
+def client_wire():
+    """Wire format the current client's batch rooms were joined in"""
+    wire_names = [order_rooms.wire_name(room) for room in rooms() if order_rooms.wire_name(room)]
+    return wire.Wire.parse(wire_names[0]) if wire_names else wire.DEFAULT
+
+
 @socketio.on('connect')
-def handle_connect():
-    """Handle client connection"""
+def handle_connect(auth=None):
+    """Handle client connection
+
+    auth may carry {role, name, tables} to join role/waiter/table rooms
+    straight away; clients without it receive every event.
+    """
     print(f'Client connected: {request.sid}')
-    emit('connected', {'message': 'Connected to restaurant server'})
+    metrics.socketio_connected_clients.inc()
+    joined, ignored = join_order_rooms(auth)
+    emit('connected', {'message': 'Connected to restaurant server', 'rooms': joined, 'ignoredOptions': ignored,
+                       **change_log.meta()})
+
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Change the rooms of a connected client, e.g. after login"""
+    joined, ignored = join_order_rooms(data)
+    emit('subscribed', {'rooms': joined, 'ignoredOptions': ignored})
 
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
     print(f'Client disconnected: {request.sid}')
+    metrics.socketio_connected_clients.dec()
 
 
 @socketio.on('request_refresh')
-def handle_refresh_request():
-    """Handle request for full data refresh"""
-    db = SessionLocal()
-    try:
-        orders = db.query(Order).order_by(Order.timestamp.desc()).all()
-        emit('orders_refresh', [order.to_dict() for order in orders])
-    finally:
-        db.close()
+def handle_refresh_request(data=None):
+    """Handle a resync request
+
+    Clients send {'lastSeq': n, 'epoch': e} from the last event they applied
+    and get only the missed events as 'orders_delta'. A full 'orders_refresh'
+    snapshot is sent when no position is given or it has left the change log;
+    with {'active': true} it only holds active orders, read from the cache.
+    Both come in the wire format the client's batch rooms were joined in.
+
+    With several workers every worker numbers its own events, while clients
+    receive events from all of them: no single log knows what a client
+    missed, so multi-worker deployments always answer with a snapshot.
+    """
+    if isinstance(data, dict) and data.get('lastSeq') is not None and not socket_manager.is_multi_worker():
+        try:
+            events = change_log.since(int(data['lastSeq']), data.get('epoch'))
+        except (TypeError, ValueError):
+            events = None
+        if events is not None:
+            client_rooms = rooms()
+            delta = []
+            for event in events:
+                payload = order_rooms.payload_for(event['targets'], client_rooms)
+                if payload is not None:
+                    delta.append({'seq': event['seq'], 'event': event['event'], 'data': payload})
+            emit('orders_delta', (client_wire().delta(delta), change_log.meta()))
+            return
+
+    # Take the position before querying: events that race the snapshot are
+    # re-sent live, and clients apply them idempotently by order id
+    order_intake.drain()
+    meta = change_log.meta()
+    if isinstance(data, dict) and data.get('active'):
+        active_orders.ensure_loaded(get_db())
+        bodies, _ = active_orders.page(BOARD_STATUSES)
+        orders = [fastjson.loads(body) for body in bodies]
+    else:
+        orders, _ = fetch_orders(get_db())
+    emit('orders_refresh', (client_wire().snapshot(orders), meta))
 
 
 # ============ MAIN ============
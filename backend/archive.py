@@ -0,0 +1,88 @@
+"""
+Order archiving: completed orders past a configurable age move to archived_orders
+The hot tables keep only recent and active orders, so every list, refresh and
+stats query stays proportional to the live workload
+"""
+from datetime import datetime, timedelta
+import os
+
+from sqlalchemy import select, insert, delete
+
+from serializers import (orders_table, items_table, archived_orders_table, archived_items_table,
+                         ORDER_COLUMN_NAMES, ITEM_COLUMN_NAMES)
+
+# Completed orders placed longer ago than this are archived
+ARCHIVE_AFTER = timedelta(hours=float(os.environ.get('ARCHIVE_AFTER_HOURS', 24)))
+# Seconds between archiver runs; 0 disables the background task
+ARCHIVE_INTERVAL = float(os.environ.get('ARCHIVE_INTERVAL', 300))
+# Orders moved per transaction; each chunk is short so other requests get the
+# database (and, under eventlet, the hub) in between
+ARCHIVE_CHUNK = int(os.environ.get('ARCHIVE_CHUNK', 500))
+
+# Columns copied to archived_orders: what the read side serializes plus the
+# idempotency key and the table session the order was billed to
+ARCHIVED_COLUMN_NAMES = [*ORDER_COLUMN_NAMES, 'client_order_id', 'table_session_id']
+
+
+def archive_chunk(connection, cutoff, limit=ARCHIVE_CHUNK):
+    """Move up to limit completed orders placed before cutoff; returns their health conditions
+
+    Runs inside the caller's transaction: rows are copied with
+    INSERT ... SELECT and then deleted, so an order is never in both places.
+    """
+    rows = connection.execute(
+        select(orders_table.c.id, orders_table.c.health_conditions)
+        .where(orders_table.c.status == 'completed', orders_table.c.timestamp < cutoff)
+        .order_by(orders_table.c.timestamp, orders_table.c.id)
+        .limit(limit)
+    ).all()
+    if not rows:
+        return []
+    ids = [row.id for row in rows]
+
+    connection.execute(insert(archived_orders_table).from_select(
+        ARCHIVED_COLUMN_NAMES,
+        select(*[orders_table.c[name] for name in ARCHIVED_COLUMN_NAMES]).where(orders_table.c.id.in_(ids))
+    ))
+    connection.execute(insert(archived_items_table).from_select(
+        ITEM_COLUMN_NAMES,
+        select(*[items_table.c[name] for name in ITEM_COLUMN_NAMES]).where(items_table.c.order_id.in_(ids))
+    ))
+    connection.execute(delete(items_table).where(items_table.c.order_id.in_(ids)))
+    connection.execute(delete(orders_table).where(orders_table.c.id.in_(ids)))
+    return [row.health_conditions for row in rows]
+
+
+def archive_completed(engine, older_than=ARCHIVE_AFTER, chunk=ARCHIVE_CHUNK, on_archived=None, pause=None):
+    """Archive every eligible order, one transaction per chunk; returns the count
+
+    on_archived(health_conditions_list) runs after each committed chunk;
+    pause() runs between chunks (socketio.sleep(0) yields to the event loop).
+    """
+    cutoff = datetime.utcnow() - older_than
+    archived = 0
+    while True:
+        with engine.begin() as connection:
+            moved = archive_chunk(connection, cutoff, chunk)
+        if not moved:
+            return archived
+        archived += len(moved)
+        if on_archived is not None:
+            on_archived(moved)
+        if len(moved) < chunk:
+            return archived
+        if pause is not None:
+            pause()
+
+
+def run_archiver(engine, sleep, interval=ARCHIVE_INTERVAL, on_archived=None):
+    """Background loop: archive, then sleep(interval), forever"""
+    while True:
+        try:
+            count = archive_completed(engine, on_archived=on_archived, pause=lambda: sleep(0))
+            if count:
+                print(f"Archived {count} completed orders")
+        except Exception as e:
+            # Another worker may have archived the same orders; retry next run
+            print(f"Archiving failed: {e}")
+        sleep(interval)
@@ -0,0 +1,63 @@
+"""
+Benchmark: memory of the active-orders cache per 10k orders, and reading the live
+board (GET /api/orders?status=pending,preparing,ready) from it vs. from SQL
+
+Usage (from backend/):
+    python benchmarks/bench_active_orders.py [--orders 10000] [--items 2] [--limit 500]
+"""
+import argparse
+import tracemalloc
+
+from common import use_temp_database, seed_orders, time_call
+
+from sqlalchemy import update
+
+from app import app
+from active_orders import ActiveOrders, BOARD_STATUSES, cache
+from database import SessionLocal
+from models import Order
+from serializers import fetch_orders, json_response
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--items', type=int, default=2)
+    parser.add_argument('--limit', type=int, default=500, help='board page size')
+    args = parser.parse_args()
+
+    engine = use_temp_database()
+    seed_orders(engine, args.orders, items_per_order=args.items)
+    with engine.begin() as connection:
+        connection.execute(update(Order).values(status='pending'))
+
+    db = SessionLocal()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    measured = ActiveOrders()
+    measured.load(db)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    used = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    body_bytes = sum(len(record.body) for record in measured._by_id.values())
+    print(f'{len(measured)} active orders, {args.items} items each')
+    print(f'cache memory: {used / 1024 / 1024:.1f} MiB ({used / len(measured) * 10000 / 1024 / 1024:.1f} MiB '
+          f'per 10k orders, of which JSON bodies {body_bytes / len(measured) * 10000 / 1024 / 1024:.1f} MiB)')
+    del measured
+
+    statuses = ','.join(BOARD_STATUSES)
+    with app.test_request_context():
+        sql_ms, _ = time_call(lambda: json_response({'orders': fetch_orders(
+            db, Order.status.in_(BOARD_STATUSES), limit=args.limit)[0]}).get_data(), repeat=20)
+    db.close()
+
+    client = app.test_client()
+    cache.ensure_loaded(SessionLocal())
+    cache_ms, _ = time_call(lambda: client.get(f'/api/orders?status={statuses}&limit={args.limit}').get_data(),
+                            repeat=20)
+    print(f"{'board page':>12} {'sql p50 ms':>11} {'cache p50 ms':>13} {'speedup':>8}")
+    print(f'{args.limit:12d} {sql_ms:11.2f} {cache_ms:13.2f} {sql_ms / cache_ms:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
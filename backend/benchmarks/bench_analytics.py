@@ -0,0 +1,65 @@
+"""
+Benchmark: a daily revenue/nutrition dashboard read from the rollup tables vs.
+the same totals computed by scanning orders and order_items,
+at 10k, 100k and 500k orders (5 seconds apart, so 500k spans about a month)
+
+Usage (from backend/):
+    python benchmarks/bench_analytics.py [--max 500000]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from common import use_temp_database, seed_orders, time_call
+
+from sqlalchemy import func, select
+
+import analytics
+from database import SessionLocal
+from models import Order, OrderItem
+
+SIZES = [10000, 100000, 500000]
+
+
+def scan_path(db, start, end):
+    """Daily totals straight from the order tables"""
+    day = func.date(Order.timestamp)
+    return db.execute(
+        select(day, func.count(func.distinct(Order.id)), func.sum(OrderItem.quantity),
+               func.sum(OrderItem.price * OrderItem.quantity), func.sum(OrderItem.calories * OrderItem.quantity))
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.timestamp >= start, Order.timestamp < end)
+        .group_by(day).order_by(day)
+    ).all()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max', type=int, default=SIZES[-1])
+    args = parser.parse_args()
+
+    start = datetime(2026, 1, 1)
+    end = start + timedelta(days=60)
+    engine = use_temp_database()
+    seeded = 0
+    print(f"{'orders':>8} {'backfill':>10} {'scan p50':>10} {'rollup p50':>11} {'speedup':>8}")
+    for size in [s for s in SIZES if s <= args.max]:
+        seed_orders(engine, size - seeded, start=start + timedelta(seconds=seeded * 5))
+        seeded = size
+
+        started = time.perf_counter()
+        with engine.begin() as connection:
+            analytics.backfill(connection)
+        backfill_s = time.perf_counter() - started
+
+        db = SessionLocal()
+        scan_ms, _ = time_call(lambda: scan_path(db, start, end), repeat=5)
+        rollup_ms, _ = time_call(lambda: analytics.query_range(db, start, end, 'day'), repeat=20)
+        result = analytics.query_range(db, start, end, 'day')
+        db.close()
+        assert result['totals']['orders'] == size, 'rollups disagree with the seeded orders'
+        print(f'{size:>8} {backfill_s:9.1f}s {scan_ms:8.1f}ms {rollup_ms:9.2f}ms {scan_ms / rollup_ms:7.0f}x')
+
+
+if __name__ == '__main__':
+    main()
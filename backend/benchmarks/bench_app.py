@@ -0,0 +1,14 @@
+"""
+WSGI entry point for benchmarks that run the app under gunicorn
+Binds the app to BENCH_DATABASE_PATH instead of restaurant.db
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import use_temp_database
+
+use_temp_database(os.environ['BENCH_DATABASE_PATH'], create=False)
+
+from app import app  # noqa: E402,F401
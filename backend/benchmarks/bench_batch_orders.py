@@ -0,0 +1,61 @@
+"""
+Benchmark: order intake throughput for POST /api/orders vs. POST /api/orders/batch
+at 1, 10 and 100 orders per call
+
+Usage (from backend/):
+    python benchmarks/bench_batch_orders.py [--orders 2000]
+"""
+import argparse
+import time
+
+from common import use_temp_database
+
+from app import app
+from menu import catalog
+
+BATCH_SIZES = [1, 10, 100]
+
+
+def payload(i):
+    return {
+        'table': str(i % 30),
+        'waiter': f'Waiter {i % 5}',
+        'customerInfo': {'adults': 2, 'children': 0, 'avgAge': 35},
+        'healthConditions': {'diabetes': False, 'cholesterol': False, 'bloodPressure': False, 'sugarFree': False},
+        'items': [{'menuItemId': catalog.items[(i + k) % len(catalog.items)]['id'], 'quantity': 1}
+                  for k in range(3)],
+    }
+
+
+def run_single(client, order_count):
+    started = time.perf_counter()
+    for i in range(order_count):
+        assert client.post('/api/orders', json=payload(i)).status_code == 201
+    return order_count / (time.perf_counter() - started)
+
+
+def run_batch(client, order_count, batch_size):
+    started = time.perf_counter()
+    for offset in range(0, order_count, batch_size):
+        batch = [payload(i) for i in range(offset, min(offset + batch_size, order_count))]
+        assert client.post('/api/orders/batch', json={'orders': batch}).status_code == 201
+    return order_count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f'{args.orders} orders, 3 items each')
+    print(f"{'endpoint':>22} {'orders/sec':>12}")
+    use_temp_database()
+    print(f"{'POST /api/orders':>22} {run_single(app.test_client(), args.orders):12.1f}")
+    for batch_size in BATCH_SIZES:
+        use_temp_database()
+        rate = run_batch(app.test_client(), args.orders, batch_size)
+        print(f"{f'batch x{batch_size}':>22} {rate:12.1f}")
+
+
+if __name__ == '__main__':
+    main()
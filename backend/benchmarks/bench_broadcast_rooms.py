@@ -0,0 +1,77 @@
+"""
+Load test: Socket.IO broadcast cost with room routing vs. emit-to-everyone
+
+Connects hundreds of in-process Socket.IO test clients, drives order
+create/status events through the REST API and reports broadcast time and
+messages delivered.
+
+Usage (from backend/):
+    python benchmarks/bench_broadcast_rooms.py [--clients 400] [--events 200]
+"""
+import argparse
+import json
+import time
+
+from common import use_temp_database
+
+from app import app, socketio
+
+
+def connect_clients(client_count, with_roles):
+    """Connect client_count test clients; roles mimic a busy floor"""
+    http = app.test_client()
+    clients = []
+    for i in range(client_count):
+        auth = None
+        if with_roles:
+            bucket = i % 20
+            if bucket == 0:
+                auth = {'role': 'kitchen'}
+            elif bucket == 1:
+                auth = {'role': 'manager'}
+            else:
+                auth = {'role': 'waiter', 'name': f'Waiter {i % 25}'}
+        clients.append(socketio.test_client(app, flask_test_client=http, auth=auth))
+    for client in clients:
+        client.get_received()
+    return http, clients
+
+
+def run(client_count, event_count, with_roles):
+    http, clients = connect_clients(client_count, with_roles)
+    emit_time = 0.0
+    for i in range(event_count // 2):
+        payload = {'table': str(i % 30), 'waiter': f'Waiter {i % 25}',
+                   'items': [{'menuItemId': 1, 'name': 'Classic Burger', 'price': 12}]}
+        started = time.perf_counter()
+        order = http.post('/api/orders', json=payload).get_json()
+        http.put(f"/api/orders/{order['id']}/status", json={'status': 'preparing'})
+        emit_time += time.perf_counter() - started
+
+    messages = 0
+    payload_bytes = 0
+    for client in clients:
+        for packet in client.get_received():
+            messages += 1
+            payload_bytes += len(json.dumps(packet['args']))
+        client.disconnect()
+    return emit_time, messages, payload_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=400)
+    parser.add_argument('--events', type=int, default=200)
+    args = parser.parse_args()
+
+    use_temp_database()
+    print(f'{args.clients} clients, {args.events} order events')
+    print(f"{'mode':>10} {'total ms':>10} {'ms/event':>10} {'messages':>10} {'payload KB':>11}")
+    for label, with_roles in (('everyone', False), ('rooms', True)):
+        emit_time, messages, payload_bytes = run(args.clients, args.events, with_roles)
+        print(f'{label:>10} {emit_time * 1000:10.1f} {emit_time * 1000 / args.events:10.2f} '
+              f'{messages:10d} {payload_bytes / 1024:11.1f}')
+
+
+if __name__ == '__main__':
+    main()
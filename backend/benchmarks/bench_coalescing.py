@@ -0,0 +1,103 @@
+"""
+Load test: per-event Socket.IO broadcasts vs. coalesced 'orders_delta' batches
+
+Connects in-process test clients (kitchen, manager and waiters), drives a
+busy service through the REST API (each order created, then moved through
+preparing, ready and completed) and reports messages delivered, payload
+bytes and CPU time. Batched clients get a flush every --per-window events,
+standing in for SOCKETIO_BATCH_WINDOW_MS at that event rate.
+
+Usage (from backend/):
+    python benchmarks/bench_coalescing.py [--clients 200] [--orders 200] [--per-window 20]
+"""
+import argparse
+import json
+import time
+
+from common import use_temp_database
+
+from app import app, socketio, event_coalescer
+
+STATUSES = ['preparing', 'ready', 'completed']
+
+
+def connect_clients(client_count, batch):
+    """Connect client_count test clients; roles mimic a busy floor"""
+    http = app.test_client()
+    clients = []
+    for i in range(client_count):
+        bucket = i % 20
+        if bucket == 0:
+            auth = {'role': 'kitchen'}
+        elif bucket == 1:
+            auth = {'role': 'manager'}
+        else:
+            auth = {'role': 'waiter', 'name': f'Waiter {i % 10}'}
+        clients.append(socketio.test_client(app, flask_test_client=http, auth=dict(auth, batch=batch)))
+    for client in clients:
+        client.get_received()
+    return http, clients
+
+
+def run(client_count, order_count, per_window, batch):
+    http, clients = connect_clients(client_count, batch)
+    # Orders overlap: a new one every step while earlier ones move along
+    steps = []
+    for i in range(order_count):
+        steps.append(('create', i))
+        if i >= 1:
+            steps.append(('status', i - 1, 0))
+        if i >= 2:
+            steps.append(('status', i - 2, 1))
+        if i >= 4:
+            steps.append(('status', i - 4, 2))
+
+    ids = {}
+    events = 0
+    started_cpu = time.process_time()
+    started = time.perf_counter()
+    for step in steps:
+        if step[0] == 'create':
+            payload = {'table': str(step[1] % 30), 'waiter': f'Waiter {step[1] % 10}',
+                       'items': [{'menuItemId': 1, 'quantity': 1}]}
+            ids[step[1]] = http.post('/api/orders', json=payload).get_json()['id']
+        else:
+            http.put(f'/api/orders/{ids[step[1]]}/status', json={'status': STATUSES[step[2]]})
+        events += 1
+        if batch and events % per_window == 0:
+            event_coalescer.flush()
+    if batch:
+        event_coalescer.flush()
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - started_cpu
+
+    messages = 0
+    payload_bytes = 0
+    for client in clients:
+        for packet in client.get_received():
+            messages += 1
+            payload_bytes += len(json.dumps(packet['args']))
+        client.disconnect()
+    return events, elapsed, cpu, messages, payload_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--per-window', type=int, default=20)
+    args = parser.parse_args()
+
+    use_temp_database()
+    # Flushes are driven by the loop above, never by the timer
+    event_coalescer.window_ms = 3600 * 1000
+    print(f'{args.clients} clients, {args.orders} orders, a flush every {args.per_window} events')
+    print(f"{'mode':>10} {'events':>7} {'wall ms':>9} {'cpu ms':>9} {'messages':>9} {'payload KB':>11}")
+    for label, batch in (('per-event', False), ('batched', True)):
+        events, elapsed, cpu, messages, payload_bytes = run(args.clients, args.orders, args.per_window, batch)
+        print(f'{label:>10} {events:7d} {elapsed * 1000:9.1f} {cpu * 1000:9.1f} '
+              f'{messages:9d} {payload_bytes / 1024:11.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Load test: POST /api/orders latency with synchronous commits vs. the write-behind
+journal (ORDER_INTAKE=journal), under concurrent clients on a gunicorn/eventlet worker
+
+Usage (from backend/):
+    python benchmarks/bench_intake.py [--threads 32] [--orders 100] [--fsync 1]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from common import BACKEND_DIR, percentiles, temp_database_path, use_temp_database
+from bench_workers import free_port, wait_until_up
+
+
+def post_orders(base_url, thread_index, count, latencies, errors):
+    for i in range(count):
+        body = json.dumps({'table': str((thread_index + i) % 30), 'waiter': f'Waiter {thread_index % 5}',
+                           'items': [{'menuItemId': 1, 'quantity': 2}, {'menuItemId': 4}]}).encode()
+        request = urllib.request.Request(f'{base_url}/api/orders', data=body, method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+        except OSError as e:
+            errors.append(repr(e))
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+def run(mode, threads, orders, fsync):
+    db_path = temp_database_path()
+    use_temp_database(db_path)
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, BENCH_DATABASE_PATH=db_path, WEB_CONCURRENCY='1', ORDER_INTAKE=mode,
+               INTAKE_JOURNAL_PATH=os.path.join(tempfile.mkdtemp(prefix='optimeal-intake-'), 'intake.journal'),
+               INTAKE_FSYNC=str(fsync), SQLITE_SYNCHRONOUS='FULL' if fsync else 'NORMAL')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--worker-class', 'eventlet', '-w', '1',
+         '--bind', f'127.0.0.1:{port}', '--chdir', os.path.join(BACKEND_DIR, 'benchmarks'), 'bench_app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(base_url)
+        latencies, errors = [], []
+        pool = [threading.Thread(target=post_orders, args=(base_url, i, orders, latencies, errors))
+                for i in range(threads)]
+        started = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - started
+        # Every acknowledged order must be readable (this drains the journal)
+        with urllib.request.urlopen(f'{base_url}/api/stats', timeout=30) as response:
+            stored = json.loads(response.read())['orderStats']['total']
+    finally:
+        server.terminate()
+        server.wait()
+    return {'ops/sec': len(latencies) / elapsed, **percentiles(latencies), 'errors': len(errors), 'stored': stored}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--orders', type=int, default=100, help='orders per thread')
+    parser.add_argument('--fsync', type=int, default=1,
+                        help='1: fsync the journal and SQLite (synchronous=FULL); 0: neither')
+    args = parser.parse_args()
+
+    print(f'{args.threads} threads x {args.orders} POST /api/orders, fsync={args.fsync}')
+    print(f"{'mode':>8} {'ops/sec':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'stored':>7}")
+    for mode in ('sync', 'journal'):
+        result = run(mode, args.threads, args.orders, args.fsync)
+        print(f"{mode:>8} {result['ops/sec']:9.1f} {result['p50']:8.2f} {result['p95']:8.2f} {result['p99']:8.2f} "
+              f"{result['errors']:7d} {result['stored']:7d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark: per-order nutrient totals from one grouped SQL SUM vs. summing serialized
+orders in Python (what every client did), and the whole nutrition report
+(per-order, per-guest and per-table summaries), at 1k, 10k and 50k orders
+
+Usage (from backend/):
+    python benchmarks/bench_nutrition.py [--max 50000]
+"""
+import argparse
+
+from common import use_temp_database, seed_orders, time_call
+
+import nutrition
+from sqlalchemy import select
+
+from database import SessionLocal
+from health_index import NUTRIENTS
+from models import Order
+from serializers import fetch_orders
+
+SIZES = [1000, 10000, 50000]
+
+
+def python_path(db, limit):
+    """Fetch every order with its items, then loop over the items"""
+    orders, _ = fetch_orders(db, limit=limit)
+    return {order['id']: {nutrient: sum(item[nutrient] * item['quantity'] for item in order['items'])
+                           for nutrient in NUTRIENTS} for order in orders}
+
+
+def sql_path(db, limit):
+    """The report's totals step: one grouped SUM over the newest orders' items"""
+    newest = select(Order.id).order_by(Order.timestamp.desc(), Order.id.desc()).limit(limit).subquery()
+    return nutrition.totals_by_order(db, select(newest.c.id))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max', type=int, default=SIZES[-1])
+    args = parser.parse_args()
+
+    engine = use_temp_database()
+    seeded = 0
+    print(f"{'orders':>8} {'python ms':>10} {'sql sum ms':>11} {'speedup':>8} {'report ms':>10}")
+    for size in [s for s in SIZES if s <= args.max]:
+        seed_orders(engine, size - seeded, items_per_order=3)
+        seeded = size
+
+        db = SessionLocal()
+        python_ms, _ = time_call(lambda: python_path(db, size), repeat=5)
+        sql_ms, _ = time_call(lambda: sql_path(db, size), repeat=5)
+        report_ms, _ = time_call(lambda: nutrition.report(db, limit=size), repeat=5)
+        expected = python_path(db, size)
+        result = nutrition.report(db, limit=size)
+        db.close()
+        assert all(abs(order['totals']['calories'] - expected[order['orderId']]['calories']) < 0.5
+                   for order in result['orders']), 'report disagrees with the item rows'
+        print(f'{size:8d} {python_ms:10.1f} {sql_ms:11.1f} {python_ms / sql_ms:7.1f}x {report_ms:10.1f}')
+
+
+if __name__ == '__main__':
+    main()
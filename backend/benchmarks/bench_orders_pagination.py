@@ -0,0 +1,48 @@
+"""
+Benchmark: GET /api/orders latency as order history grows
+
+Usage (from backend/):
+    python benchmarks/bench_orders_pagination.py [--max 500000]
+"""
+import argparse
+
+from common import use_temp_database, seed_orders, time_call
+
+from app import app
+
+SIZES = [1000, 10000, 100000, 500000]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max', type=int, default=SIZES[-1], help='largest history size')
+    args = parser.parse_args()
+
+    engine = use_temp_database()
+    client = app.test_client()
+    seeded = 0
+
+    print(f"{'orders':>8} {'first page':>16} {'page 5':>16} {'status=pending':>16}")
+    for size in [s for s in SIZES if s <= args.max]:
+        seed_orders(engine, size - seeded)
+        seeded = size
+
+        def first_page():
+            return client.get('/api/orders?limit=50')
+
+        cursor = None
+        for _ in range(4):
+            cursor = client.get('/api/orders', query_string={'limit': 50, 'cursor': cursor} if cursor else {'limit': 50}).get_json()['nextCursor']
+
+        def fifth_page():
+            return client.get('/api/orders', query_string={'limit': 50, 'cursor': cursor})
+
+        def pending_page():
+            return client.get('/api/orders?limit=50&status=pending')
+
+        results = [time_call(fn) for fn in (first_page, fifth_page, pending_page)]
+        print(f'{size:>8} ' + ' '.join(f'{median:7.2f}/{p95:7.2f}ms' for median, p95 in results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Micro-benchmark: ORM Order.to_dict() + jsonify vs. the Core-row serializer + fast JSON
+at 1k, 10k and 100k orders
+
+Usage (from backend/):
+    python benchmarks/bench_serialization.py [--max 100000]
+"""
+import argparse
+import time
+
+from common import use_temp_database, seed_orders
+
+from flask import jsonify
+from sqlalchemy.orm import selectinload
+
+from app import app
+from database import SessionLocal
+from models import Order
+from serializers import fetch_orders, json_response
+
+SIZES = [1000, 10000, 100000]
+
+
+def orm_path(db):
+    orders = db.query(Order).options(selectinload(Order.items)).order_by(Order.timestamp.desc(), Order.id.desc()).all()
+    return jsonify([order.to_dict() for order in orders]).get_data()
+
+
+def core_path(db):
+    orders, _ = fetch_orders(db)
+    return json_response(orders).get_data()
+
+
+def best_of(fn, db, repeat=3):
+    best = None
+    for _ in range(repeat):
+        db.expunge_all()
+        started = time.perf_counter()
+        body = fn(db)
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max', type=int, default=SIZES[-1])
+    args = parser.parse_args()
+
+    engine = use_temp_database()
+    seeded = 0
+    print(f"{'orders':>8} {'to_dict+jsonify':>16} {'core+fastjson':>14} {'speedup':>8}")
+    with app.app_context():
+        for size in [s for s in SIZES if s <= args.max]:
+            seed_orders(engine, size - seeded)
+            seeded = size
+            db = SessionLocal()
+            orm_ms, orm_body = best_of(orm_path, db)
+            core_ms, core_body = best_of(core_path, db)
+            db.close()
+            assert app.json.loads(orm_body) == app.json.loads(core_body), 'serializers disagree'
+            print(f'{size:>8} {orm_ms:14.1f}ms {core_ms:12.1f}ms {orm_ms / core_ms:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
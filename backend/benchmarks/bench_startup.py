@@ -0,0 +1,149 @@
+"""
+Benchmark: cold start of the backend
+
+  import    python -X importtime -c "import app": total import time and the
+            heaviest modules app imports directly
+  schema    init_db() on a database whose schema is already current
+  serve     gunicorn (one eventlet worker) from spawn to the first 200 on
+            /api/health, then to the first 200 on the active-orders board
+
+Each run starts a fresh interpreter against a throwaway SQLite file seeded
+with orders. Medians over --runs are reported; --max-import-ms and
+--max-first-ok-ms exit non-zero when exceeded, so a CI step can catch a
+startup regression. harness.py records the same numbers as its startup phase.
+
+Usage (from backend/):
+    python benchmarks/bench_startup.py [--runs 5] [--orders 2000] [--max-import-ms N] [--max-first-ok-ms N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+from common import BACKEND_DIR, seed_orders, temp_database_path, use_temp_database
+
+BOARD_PATH = '/api/orders?status=pending,preparing,ready&limit=100'
+
+
+def median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+
+def import_times(env):
+    """(total ms, {module: cumulative ms}) for the modules app imports directly"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    children = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if depth == 0:
+            # Interpreter startup imports come first; app's own line closes its subtree
+            if name == 'app':
+                return int(cumulative) / 1000, children
+            children = {}
+        elif depth == 1:
+            children[name] = int(cumulative) / 1000
+    raise RuntimeError('no importtime line for app:\n' + result.stderr[-2000:])
+
+
+def wait_for_ok(url, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.005)
+    raise RuntimeError(f'no 200 from {url}')
+
+
+def serve_times(env):
+    """(ms to the first 200 on /api/health, ms more to the first board page) for one gunicorn start"""
+    from bench_workers import free_port
+
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--worker-class', 'eventlet', '-w', '1',
+         '--bind', f'127.0.0.1:{port}', 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_ok(f'{base_url}/api/health', started + 60)
+        health_ok = time.perf_counter()
+        wait_for_ok(f'{base_url}{BOARD_PATH}', health_ok + 60)
+        board_ok = time.perf_counter()
+    finally:
+        server.terminate()
+        server.wait()
+    return (health_ok - started) * 1000, (board_ok - health_ok) * 1000
+
+
+def schema_check_ms(engine, repeat=20):
+    """Median init_db() time on an up-to-date schema"""
+    import database
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        database.init_db(engine)
+        samples.append((time.perf_counter() - started) * 1000)
+    return median(samples)
+
+
+def measure(runs=5, order_count=2000):
+    """Startup numbers for harness.py and main()"""
+    db_path = temp_database_path()
+    engine = use_temp_database(db_path)
+    seed_orders(engine, order_count)
+    import database
+    database.init_db(engine)
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', WEB_CONCURRENCY='1', ARCHIVE_INTERVAL='0')
+
+    imports = [import_times(env) for _ in range(runs)]
+    serves = [serve_times(env) for _ in range(runs)]
+    heaviest = sorted(imports[-1][1].items(), key=lambda entry: -entry[1])[:8]
+    return {
+        'runs': runs,
+        'orders': order_count,
+        'importMs': round(median([total for total, _ in imports]), 1),
+        'heaviestImportsMs': {name: round(ms, 1) for name, ms in heaviest},
+        'schemaCheckMs': round(schema_check_ms(engine), 2),
+        'firstHealthOkMs': round(median([health for health, _ in serves]), 1),
+        'firstBoardOkMs': round(median([board for _, board in serves]), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--max-import-ms', type=float)
+    parser.add_argument('--max-first-ok-ms', type=float)
+    args = parser.parse_args()
+
+    results = measure(args.runs, args.orders)
+    print(f"import app              {results['importMs']:8.1f} ms (median of {args.runs})")
+    for name, ms in results['heaviestImportsMs'].items():
+        print(f'  {name:<22}{ms:8.1f} ms')
+    print(f"init_db, schema current {results['schemaCheckMs']:8.2f} ms")
+    print(f"spawn -> first 200      {results['firstHealthOkMs']:8.1f} ms (/api/health)")
+    print(f"  -> first board page   {results['firstBoardOkMs']:8.1f} ms ({args.orders} orders in the DB)")
+
+    failed = []
+    if args.max_import_ms is not None and results['importMs'] > args.max_import_ms:
+        failed.append(f"import took {results['importMs']} ms (max {args.max_import_ms})")
+    if args.max_first_ok_ms is not None and results['firstHealthOkMs'] > args.max_first_ok_ms:
+        failed.append(f"first 200 took {results['firstHealthOkMs']} ms (max {args.max_first_ok_ms})")
+    if failed:
+        sys.exit('Startup regression: ' + '; '.join(failed))
+
+
+if __name__ == '__main__':
+    main()
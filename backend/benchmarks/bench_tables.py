@@ -0,0 +1,79 @@
+"""
+Benchmark: table list and one table's bill from table-session totals vs. regrouping
+the active orders (what the frontend did) or one grouped SUM over order_items,
+at 1k, 10k and 50k stored orders
+
+Sessions are built by the migration's backfill, which bills every active
+order to its table's open session.
+
+Usage (from backend/):
+    python benchmarks/bench_tables.py [--max 50000]
+"""
+import argparse
+
+from common import use_temp_database, seed_orders, time_call
+
+from sqlalchemy import func, select
+
+import table_sessions
+from database import SessionLocal
+from models import Order, OrderItem
+from serializers import fetch_orders
+
+SIZES = [1000, 10000, 50000]
+BILL_TABLE = '7'
+
+
+def regroup_path(db):
+    """Fetch every active order with its items and total them per table"""
+    orders, _ = fetch_orders(db, Order.status != 'completed')
+    tables = {}
+    for order in orders:
+        entry = tables.setdefault(order['table'], {'orders': 0, 'items': 0, 'amount': 0})
+        entry['orders'] += 1
+        for item in order['items']:
+            entry['items'] += item['quantity']
+            entry['amount'] += item['price'] * item['quantity']
+    return tables
+
+
+def sum_path(db, table):
+    """One table's bill lines from a grouped SUM over its active orders' items"""
+    return db.execute(
+        select(OrderItem.menu_item_id, func.sum(OrderItem.quantity), func.sum(OrderItem.price * OrderItem.quantity))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.table == table, Order.status != 'completed')
+        .group_by(OrderItem.menu_item_id)
+    ).all()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max', type=int, default=SIZES[-1])
+    args = parser.parse_args()
+
+    engine = use_temp_database()
+    seeded = 0
+    print(f"{'orders':>8} {'regroup ms':>11} {'tables ms':>10} {'speedup':>8} {'sum bill ms':>12} {'bill ms':>8} {'speedup':>8}")
+    for size in [s for s in SIZES if s <= args.max]:
+        seed_orders(engine, size - seeded, items_per_order=3)
+        seeded = size
+        with engine.begin() as connection:
+            table_sessions.backfill(connection)
+
+        db = SessionLocal()
+        regroup_ms, _ = time_call(lambda: regroup_path(db), repeat=5)
+        tables_ms, _ = time_call(lambda: table_sessions.open_sessions(db))
+        sum_ms, _ = time_call(lambda: sum_path(db, BILL_TABLE))
+        bill_ms, _ = time_call(lambda: table_sessions.bill(db, BILL_TABLE))
+        expected = regroup_path(db)
+        sessions = table_sessions.open_sessions(db)
+        db.close()
+        assert all(abs(session['amount'] - expected[session['table']]['amount']) < 0.01 for session in sessions), \
+            'session totals disagree with the item rows'
+        print(f'{size:8d} {regroup_ms:11.2f} {tables_ms:10.2f} {regroup_ms / tables_ms:7.1f}x'
+              f' {sum_ms:12.2f} {bill_ms:8.2f} {sum_ms / bill_ms:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
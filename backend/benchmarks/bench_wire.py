@@ -0,0 +1,70 @@
+"""
+Micro-benchmark: bytes per order and encode time for each wire format (wire.py)
+vs. plain JSON, for a 100-order page of GET /api/orders and for single order events
+
+Usage (from backend/):
+    python benchmarks/bench_wire.py [--orders 100] [--items 3]
+"""
+import argparse
+import time
+
+from common import use_temp_database, seed_orders
+
+import wire
+from database import SessionLocal
+from serializers import fetch_orders
+
+VARIANTS = ['', 'gzip', 'br', 'compact', 'gzip.compact', 'br.compact',
+            'msgpack', 'msgpack.gzip', 'msgpack.br', 'msgpack.compact', 'msgpack.gzip.compact', 'msgpack.br.compact']
+
+
+def encode(client_wire, orders):
+    """Bytes sent for orders as one page, the way GET /api/orders builds them"""
+    if client_wire.compact:
+        orders = [wire.compact_order(order) for order in orders]
+    body = client_wire.serialize({'orders': orders, 'nextCursor': None})
+    return wire.compress(body, client_wire.compression) if client_wire.compression else body
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=100)
+    parser.add_argument('--items', type=int, default=3)
+    args = parser.parse_args()
+
+    engine = use_temp_database()
+    seed_orders(engine, args.orders, items_per_order=args.items)
+    db = SessionLocal()
+    orders, _ = fetch_orders(db)
+    db.close()
+
+    print(f'{len(orders)} orders, {args.items} items each '
+          f"(formats: {', '.join(wire.FORMATS)}; compressions: {', '.join(wire.COMPRESSIONS)})")
+    print(f"{'wire':>22} {'page B/order':>13} {'page us/order':>14} {'event B':>8} {'event us':>9} {'vs json':>8}")
+    json_page = None
+    for name in VARIANTS:
+        client_wire = wire.Wire.parse(name)
+        if client_wire.name != name:
+            print(f'{name:>22} unavailable (optional dependency missing)')
+            continue
+        page_bytes = len(encode(client_wire, orders))
+        page_s = measure(lambda: encode(client_wire, orders), 50)
+        event_bytes = sum(len(encode(client_wire, [order])) for order in orders) / len(orders)
+        event_s = measure(lambda: [encode(client_wire, [order]) for order in orders], 20) / len(orders)
+        json_page = json_page or page_bytes
+        print(f"{name or 'json':>22} {page_bytes / len(orders):13.1f} {page_s * 1e6 / len(orders):14.2f} "
+              f'{event_bytes:8.1f} {event_s * 1e6:9.2f} {page_bytes / json_page:7.0%}')
+
+
+if __name__ == '__main__':
+    main()
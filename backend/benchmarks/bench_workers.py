@@ -0,0 +1,93 @@
+"""
+Benchmark: order creation throughput at 1, 2, 4 and 8 gunicorn workers
+
+Each run starts gunicorn (eventlet workers) on a throwaway SQLite file with the
+file-backed Socket.IO message queue, so every create_order emit goes through
+the queue exactly as it would with Redis, then posts orders from a client
+thread pool.
+
+Usage (from backend/):
+    python benchmarks/bench_workers.py [--orders 2000] [--concurrency 32]
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from common import BACKEND_DIR, use_temp_database, temp_database_path
+
+WORKERS = [1, 2, 4, 8]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'{base_url}/api/health', timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+def post_order(base_url, i):
+    body = json.dumps({'table': str(i % 30), 'waiter': f'Waiter {i % 5}',
+                       'items': [{'menuItemId': 1, 'name': 'Classic Burger', 'price': 12}]}).encode()
+    request = urllib.request.Request(f'{base_url}/api/orders', data=body, method='POST',
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.status
+
+
+def run(workers, order_count, concurrency):
+    db_path = temp_database_path()
+    use_temp_database(db_path)
+    port = free_port()
+    env = dict(os.environ,
+               BENCH_DATABASE_PATH=db_path,
+               WEB_CONCURRENCY=str(workers),
+               SOCKETIO_MESSAGE_QUEUE='filesystem://' + tempfile.mkdtemp(prefix='optimeal-queue-'))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--worker-class', 'eventlet', '-w', str(workers),
+         '--bind', f'127.0.0.1:{port}', '--chdir', os.path.join(BACKEND_DIR, 'benchmarks'), 'bench_app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        wait_until_up(base_url)
+        with ThreadPoolExecutor(concurrency) as pool:
+            started = time.perf_counter()
+            statuses = list(pool.map(lambda i: post_order(base_url, i), range(order_count)))
+            elapsed = time.perf_counter() - started
+        return order_count / elapsed, sum(1 for s in statuses if s == 201)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--workers', type=int, nargs='*', default=WORKERS)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'orders/sec':>12} {'created':>8}")
+    for workers in args.workers:
+        rate, created = run(workers, args.orders, args.concurrency)
+        print(f'{workers:>8} {rate:12.1f} {created:8d}')
+
+
+if __name__ == '__main__':
+    main()
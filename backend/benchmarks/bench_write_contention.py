@@ -0,0 +1,72 @@
+"""
+Benchmark: concurrent create_order / update_order_status traffic on SQLite,
+stock engine vs. the tuned profile (WAL, synchronous=NORMAL, mmap, busy
+timeout, sized pool, indexes)
+
+Usage (from backend/):
+    python benchmarks/bench_write_contention.py [--threads 16] [--ops 200]
+"""
+import argparse
+import random
+import threading
+import time
+
+from common import use_temp_database, seed_orders
+
+from app import app
+
+
+def worker(client, ops, latencies, errors, rng):
+    for _ in range(ops):
+        started = time.perf_counter()
+        try:
+            if rng.random() < 0.5:
+                response = client.post('/api/orders', json={
+                    'table': str(rng.randint(1, 30)),
+                    'items': [{'menuItemId': 1, 'name': 'Classic Burger', 'price': 12}]})
+            else:
+                response = client.put(f'/api/orders/{rng.randint(1, 5000)}/status',
+                                      json={'status': rng.choice(['preparing', 'ready'])})
+            if response.status_code >= 500 or response.status_code == 400:
+                errors.append(response.status_code)
+        except Exception as e:  # "database is locked" surfaces here without the tuning
+            errors.append(repr(e))
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+def run(tuned, threads, ops):
+    engine = use_temp_database(tuned=tuned)
+    seed_orders(engine, 5000)
+    latencies, errors = [], []
+    pool = [threading.Thread(target=worker, args=(app.test_client(), ops, latencies, errors, random.Random(i)))
+            for i in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'ops/sec': len(latencies) / elapsed,
+        'p50 ms': latencies[len(latencies) // 2],
+        'p99 ms': latencies[int(len(latencies) * 0.99)],
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=200, help='operations per thread')
+    args = parser.parse_args()
+
+    print(f'{args.threads} threads x {args.ops} ops (50% create_order, 50% update_order_status)')
+    print(f"{'profile':>8} {'ops/sec':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for label, tuned in (('stock', False), ('tuned', True)):
+        result = run(tuned, args.threads, args.ops)
+        print(f"{label:>8} {result['ops/sec']:10.1f} {result['p50 ms']:8.2f} {result['p99 ms']:8.2f} {result['errors']:7d}")
+
+
+if __name__ == '__main__':
+    main()
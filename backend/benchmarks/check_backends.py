@@ -0,0 +1,119 @@
+"""
+End-to-end API check against every supported database backend
+
+Runs the same order lifecycle (create, paginate, status change, stats
+consistency, socket resync, delete) against a throwaway SQLite file and a
+PostgreSQL database, and exits non-zero on the first failure.
+
+PostgreSQL comes from --postgres-url, or from DATABASE_URL, or, when the
+`pgserver` package is installed, from a local throwaway server.
+
+Usage (from backend/):
+    python benchmarks/check_backends.py [--postgres-url postgresql://...]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from common import use_database, temp_database_path
+
+from app import app, socketio, change_log
+from stats import counters as stats_counters
+
+
+def check(condition, message):
+    if not condition:
+        raise AssertionError(message)
+
+
+def run_scenario():
+    stats_counters._loaded = False
+    client = app.test_client()
+    kitchen = socketio.test_client(app, flask_test_client=client, auth={'role': 'kitchen'})
+    kitchen.get_received()
+
+    created = []
+    for i in range(7):
+        response = client.post('/api/orders', json={
+            'table': str(i % 3), 'waiter': 'Ann',
+            'customerInfo': {'adults': 2, 'children': 1, 'avgAge': 30},
+            'healthConditions': {'diabetes': i % 2 == 0, 'sugarFree': True},
+            'items': [{'menuItemId': 1, 'name': 'Classic Burger', 'price': 12, 'calories': 650},
+                      {'menuItemId': 10, 'name': 'Craft Soda', 'price': 3, 'quantity': 2}]})
+        check(response.status_code == 201, f'create_order returned {response.status_code}')
+        created.append(response.get_json())
+    check(created[0]['healthConditions'] == {'diabetes': True, 'sugarFree': True}, 'JSON round trip')
+
+    seen, cursor = [], None
+    while True:
+        query = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+        page = client.get('/api/orders', query_string=query).get_json()
+        seen += [order['id'] for order in page['orders']]
+        cursor = page['nextCursor']
+        if not cursor:
+            break
+    check(sorted(seen) == sorted(order['id'] for order in created), 'pagination covers every order once')
+
+    order_id = created[0]['id']
+    check(client.put(f'/api/orders/{order_id}/status', json={'status': 'ready'}).status_code == 200, 'status update')
+    ready = client.get('/api/orders?status=ready').get_json()['orders']
+    check([order['id'] for order in ready] == [order_id], 'status filter')
+
+    stats = client.get('/api/stats?verify=1').get_json()
+    check(stats['consistency']['ok'], f"stats consistency {stats['consistency']}")
+    check(stats['healthStats']['diabetes'] == 4, f"diabetes count {stats['healthStats']}")
+
+    check(client.delete(f'/api/orders/{order_id}').status_code == 200, 'delete order')
+    check(client.get('/api/stats?verify=1').get_json()['orderStats']['total'] == 6, 'stats after delete')
+
+    batch = client.post('/api/orders/batch', json={'orders': [
+        {'table': '9', 'items': [{'menuItemId': 8, 'name': 'Gelato'}]} for _ in range(3)]})
+    check(batch.status_code == 201 and len(batch.get_json()['orders']) == 3, 'batch create')
+    check(all(len(order['items']) == 1 for order in batch.get_json()['orders']), 'batch items')
+    check(client.get('/api/stats?verify=1').get_json()['consistency']['ok'], 'stats after batch')
+    batch_events = [packet for packet in kitchen.get_received() if packet['name'] == 'orders_created']
+    check(len(batch_events) == 1 and len(batch_events[0]['args'][0]) == 3, 'one batched socket event')
+
+    kitchen.emit('request_refresh', {'lastSeq': change_log.seq - 2, 'epoch': change_log.epoch})
+    delta = [packet for packet in kitchen.get_received() if packet['name'] == 'orders_delta']
+    check(len(delta[-1]['args'][0]['events']) == 2, 'socket resync sends only missed events')
+    kitchen.disconnect()
+
+
+def postgres_url(explicit):
+    url = explicit or os.environ.get('DATABASE_URL')
+    if url and url.startswith(('postgres://', 'postgresql')):
+        return url, None
+    try:
+        import pgserver
+    except ImportError:
+        return None, None
+    server = pgserver.get_server(tempfile.mkdtemp(prefix='optimeal-pg-'), cleanup_mode='stop')
+    return server.get_uri(), server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--postgres-url')
+    args = parser.parse_args()
+
+    backends = [('sqlite', f'sqlite:///{temp_database_path()}', None)]
+    url, server = postgres_url(args.postgres_url)
+    if url:
+        backends.append(('postgresql', url, server))
+    else:
+        print('postgresql: skipped (pass --postgres-url or install pgserver)')
+
+    for name, url, server in backends:
+        use_database(url)
+        try:
+            run_scenario()
+        except AssertionError as e:
+            print(f'{name}: FAILED - {e}')
+            sys.exit(1)
+        print(f'{name}: ok')
+
+
+if __name__ == '__main__':
+    main()
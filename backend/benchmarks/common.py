@@ -0,0 +1,112 @@
+"""
+Shared helpers for backend benchmarks
+Each benchmark runs against a throwaway SQLite file, never restaurant.db
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import database
+from database import Base, SessionLocal, create_db_engine
+
+
+def temp_database_path():
+    """Path of a new SQLite file in a fresh temporary directory"""
+    return os.path.join(tempfile.mkdtemp(prefix='optimeal-bench-'), 'bench.db')
+
+
+def use_database(url, tuned=True):
+    """Point SessionLocal at url and bring its schema up to date"""
+    engine = create_db_engine(url, tuned=tuned)
+    database.engine = engine
+    SessionLocal.configure(bind=engine)
+    database.db_session.remove()
+    database.init_db(engine)
+    return engine
+
+
+def use_temp_database(path=None, create=True, tuned=True):
+    """Point SessionLocal at a SQLite file (a fresh one by default) and create the schema
+
+    tuned=False uses a stock engine (rollback journal, default pool) for
+    before/after comparisons.
+    """
+    path = path or temp_database_path()
+    engine = create_db_engine(f'sqlite:///{path}', tuned=tuned)
+    database.engine = engine
+    SessionLocal.configure(bind=engine)
+    import models  # noqa: F401 - register tables on Base.metadata
+    if create:
+        Base.metadata.create_all(bind=engine)
+    from menu import catalog
+    catalog.refresh()
+    return engine
+
+
+def seed_orders(engine, count, items_per_order=2, start=None):
+    """Bulk insert synthetic orders (and their items) with Core executemany"""
+    from menu import catalog
+    from models import Order, OrderItem, ORDER_STATUSES
+
+    rng = random.Random(42)
+    start = start or datetime.utcnow() - timedelta(days=60)
+    batch = 10000
+    with engine.begin() as conn:
+        next_id = conn.execute(Order.__table__.select().with_only_columns(Order.id).order_by(Order.id.desc()).limit(1)).scalar() or 0
+        for offset in range(0, count, batch):
+            orders, items = [], []
+            for i in range(offset, min(offset + batch, count)):
+                next_id += 1
+                orders.append({
+                    'id': next_id,
+                    'table': str(rng.randint(1, 30)),
+                    'status': rng.choice(ORDER_STATUSES),
+                    'waiter': f'Waiter {rng.randint(1, 5)}',
+                    'timestamp': start + timedelta(seconds=i * 5),
+                    'customer_info': {'adults': 2, 'children': 0, 'avgAge': 35},
+                    'health_conditions': {'diabetes': rng.random() < 0.1, 'cholesterol': False,
+                                          'bloodPressure': False, 'sugarFree': False},
+                })
+                for menu_item in rng.sample(catalog.items, items_per_order):
+                    items.append({
+                        'order_id': next_id,
+                        'menu_item_id': menu_item['id'],
+                        'name': menu_item['name'],
+                        'category': menu_item['category'],
+                        'price': menu_item['price'],
+                        'quantity': 1,
+                        'notes': '',
+                        'calories': menu_item['calories'],
+                        'protein': menu_item['protein'],
+                        'carbs': menu_item['carbs'],
+                        'fat': menu_item['fat'],
+                        'sugar': menu_item['sugar'],
+                    })
+            conn.execute(Order.__table__.insert(), orders)
+            conn.execute(OrderItem.__table__.insert(), items)
+
+
+def time_call(fn, repeat=20):
+    """Run fn repeat times and return (median, p95) latency in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """{'p50': ..., 'p95': ..., 'p99': ...} of samples (nearest rank), or {} if empty"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    return {f'p{point}': ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))] for point in points}
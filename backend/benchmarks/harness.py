@@ -0,0 +1,373 @@
+"""
+Reproducible end-to-end benchmark of the REST API and Socket.IO fan-out
+
+Generates a synthetic menu, waiters, tables and a seeded stream of lunch-rush
+traffic (create, pending -> preparing -> ready -> completed, GET /api/orders,
+GET /api/stats), then:
+  rest    replays it through the Flask test client and reports throughput and
+          latency percentiles per operation
+  socket  starts a local gunicorn/eventlet server, connects many Socket.IO
+          clients (kitchen, managers, waiters) and reports the time from each
+          write to its delivery on every client that should receive it
+  startup import time of app and time from spawn to the first 200
+          (see bench_startup.py)
+Everything runs on 127.0.0.1 against throwaway SQLite files. Results are
+saved as JSON named after the current commit; --compare prints the change
+between two result files.
+
+The socket phase needs the Socket.IO client extras:
+    pip install "python-socketio[client]"
+
+Usage (from backend/):
+    python benchmarks/harness.py [--seed 7] [--orders 1000] [--clients 50] [--out FILE]
+    python benchmarks/harness.py --compare results/OLD.json results/NEW.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+from common import BACKEND_DIR, percentiles, temp_database_path, use_temp_database
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'results')
+
+CATEGORIES = ['Starter', 'Main', 'Side', 'Dessert', 'Drink']
+HEALTH_CONDITIONS = ['diabetes', 'cholesterol', 'bloodPressure', 'sugarFree']
+NEXT_STATUS = {'pending': 'preparing', 'preparing': 'ready', 'ready': 'completed'}
+
+
+# ============ SYNTHETIC DATA ============
+
+def synthetic_menu(rng, count):
+    """Menu items shaped like menu.json"""
+    items = []
+    for item_id in range(1, count + 1):
+        category = CATEGORIES[item_id % len(CATEGORIES)]
+        items.append({
+            'id': item_id,
+            'name': f'{category} {item_id}',
+            'category': category,
+            'price': round(rng.uniform(3, 30), 2),
+            'calories': rng.randint(50, 1200),
+            'protein': rng.randint(0, 60),
+            'carbs': rng.randint(0, 120),
+            'fat': rng.randint(0, 60),
+            'sugar': rng.randint(0, 70),
+            'health': {condition: rng.random() < 0.5 for condition in HEALTH_CONDITIONS},
+            'warning': '',
+        })
+    return items
+
+
+def write_menu(items):
+    path = os.path.join(tempfile.mkdtemp(prefix='optimeal-menu-'), 'menu.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(items, f)
+    return path
+
+
+class Floor:
+    """Waiters and tables of a synthetic restaurant"""
+
+    def __init__(self, rng, waiters, tables):
+        self.rng = rng
+        self.waiters = [f'Waiter {i}' for i in range(1, waiters + 1)]
+        self.tables = [str(i) for i in range(1, tables + 1)]
+
+    def order_payload(self, menu):
+        rng = self.rng
+        table = rng.choice(self.tables)
+        return {
+            'table': table,
+            'waiter': self.waiters[int(table) % len(self.waiters)],
+            'customerInfo': {'adults': rng.randint(1, 4), 'children': rng.randint(0, 2), 'avgAge': rng.randint(20, 70)},
+            'healthConditions': {condition: rng.random() < 0.15 for condition in HEALTH_CONDITIONS},
+            'items': [{'menuItemId': item['id'], 'quantity': rng.randint(1, 3), 'notes': ''}
+                      for item in rng.sample(menu, rng.randint(1, 5))],
+        }
+
+
+def traffic(seed, menu, order_count, waiters, tables):
+    """Deterministic list of operations for a seed
+
+    ('create', payload), ('status', order_index, status), ('list', query) or
+    ('stats', None). Orders move one status at a time a few operations after
+    they are created, and boards poll the order list and stats meanwhile.
+    """
+    rng = random.Random(seed)
+    floor = Floor(rng, waiters, tables)
+    ops = []
+    in_progress = []  # [order_index, status]
+    for index in range(order_count):
+        ops.append(('create', floor.order_payload(menu)))
+        in_progress.append([index, 'pending'])
+        for _ in range(rng.randint(0, 3)):
+            if in_progress and rng.random() < 0.9:
+                entry = in_progress[rng.randrange(min(len(in_progress), 20))]
+                entry[1] = NEXT_STATUS[entry[1]]
+                ops.append(('status', entry[0], entry[1]))
+                if entry[1] == 'completed':
+                    in_progress.remove(entry)
+        if rng.random() < 0.3:
+            ops.append(('list', rng.choice(['limit=100', 'status=pending,preparing&limit=100', 'limit=500'])))
+        if rng.random() < 0.1:
+            ops.append(('stats', None))
+    for index, status in in_progress:
+        while status != 'completed':
+            status = NEXT_STATUS[status]
+            ops.append(('status', index, status))
+    return ops
+
+
+# ============ REST PHASE ============
+
+def run_rest(ops):
+    """Replay ops through the Flask test client"""
+    from app import app
+
+    use_temp_database()
+    client = app.test_client()
+    order_ids = []
+    samples = {}
+    started = time.perf_counter()
+    for op in ops:
+        kind = op[0]
+        op_started = time.perf_counter()
+        if kind == 'create':
+            response = client.post('/api/orders', json=op[1])
+            order_ids.append(response.get_json()['id'])
+        elif kind == 'status':
+            response = client.put(f'/api/orders/{order_ids[op[1]]}/status', json={'status': op[2]})
+        elif kind == 'list':
+            response = client.get(f'/api/orders?{op[1]}')
+        else:
+            response = client.get('/api/stats')
+        samples.setdefault(kind, []).append((time.perf_counter() - op_started) * 1000)
+        assert response.status_code < 300, (op, response.status_code, response.get_data(as_text=True))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'operations': len(ops),
+        'seconds': round(elapsed, 3),
+        'opsPerSec': round(len(ops) / elapsed, 1),
+        'latencyMs': {kind: {'count': len(values), **{k: round(v, 3) for k, v in percentiles(values).items()}}
+                      for kind, values in samples.items()},
+    }
+
+
+# ============ SOCKET PHASE ============
+
+class Listener:
+    """One Socket.IO client that timestamps every order event it receives"""
+
+    def __init__(self, url, auth, received):
+        import socketio
+        self.client = socketio.Client(reconnection=False)
+        self.received = received
+        for event in ('order_created', 'order_updated'):
+            self.client.on(event, self._handler(event))
+        self.client.connect(url, transports=['websocket'], auth=auth, wait_timeout=10)
+
+    def _handler(self, event):
+        def handler(payload, meta=None):
+            now = time.perf_counter()
+            if event == 'order_created':
+                key = (event, payload['id'], payload['status'])
+            else:
+                order_id = payload['order']['id'] if 'order' in payload else payload['orderId']
+                key = (event, order_id, payload['newStatus'])
+            self.received.append((key, now))
+        return handler
+
+
+def client_auth(index):
+    """Mostly waiters, one kitchen and one manager screen per 10 clients"""
+    if index % 10 == 0:
+        return {'role': 'kitchen'}
+    if index % 10 == 1:
+        return {'role': 'manager'}
+    return {'role': 'waiter', 'name': f'Waiter {index % 10 - 1}'}
+
+
+def http_json(method, url, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def run_socket(ops, client_count, menu_path):
+    """Replay the create/status ops against a local server with client_count listeners"""
+    from bench_workers import free_port, wait_until_up
+
+    db_path = temp_database_path()
+    use_temp_database(db_path)
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    # Clients send Origin: base_url, which the server has to allow
+    env = dict(os.environ, BENCH_DATABASE_PATH=db_path, MENU_PATH=menu_path, WEB_CONCURRENCY='1',
+               FRONTEND_URL=base_url)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--worker-class', 'eventlet', '-w', '1',
+         '--bind', f'127.0.0.1:{port}', '--chdir', os.path.join(BACKEND_DIR, 'benchmarks'), 'bench_app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    received = []
+    listeners = []
+    try:
+        wait_until_up(base_url)
+        connect_started = time.perf_counter()
+        for index in range(client_count):
+            listeners.append(Listener(base_url, client_auth(index), received))
+        connect_seconds = time.perf_counter() - connect_started
+
+        sent = {}
+        order_ids = []
+        write_ops = [op for op in ops if op[0] in ('create', 'status')]
+        started = time.perf_counter()
+        for op in write_ops:
+            if op[0] == 'create':
+                sent_at = time.perf_counter()
+                order = http_json('POST', f'{base_url}/api/orders', op[1])
+                order_ids.append(order['id'])
+                sent[('order_created', order['id'], 'pending')] = sent_at
+            else:
+                order_id = order_ids[op[1]]
+                sent_at = time.perf_counter()
+                http_json('PUT', f'{base_url}/api/orders/{order_id}/status', {'status': op[2]})
+                sent[('order_updated', order_id, op[2])] = sent_at
+        elapsed = time.perf_counter() - started
+
+        # Wait for deliveries to stop arriving
+        count = -1
+        while count != len(received):
+            count = len(received)
+            time.sleep(0.5)
+    finally:
+        for listener in listeners:
+            listener.client.disconnect()
+        server.terminate()
+        server.wait()
+
+    deliveries = []
+    last_delivery = {}
+    for key, arrived in list(received):
+        if key in sent:
+            deliveries.append((arrived - sent[key]) * 1000)
+            last_delivery[key] = max(last_delivery.get(key, 0), arrived)
+    fan_out = [(last_delivery[key] - sent[key]) * 1000 for key in last_delivery]
+
+    return {
+        'clients': client_count,
+        'connectSeconds': round(connect_seconds, 3),
+        'writes': len(write_ops),
+        'writesPerSec': round(len(write_ops) / elapsed, 1),
+        'messagesDelivered': len(deliveries),
+        'deliveryLatencyMs': {k: round(v, 3) for k, v in percentiles(deliveries).items()},
+        'fanOutMs': {k: round(v, 3) for k, v in percentiles(fan_out).items()},
+    }
+
+
+# ============ RESULTS ============
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def flatten(results, prefix=''):
+    """{'rest.latencyMs.create.p95': 1.2, ...} for every number in results"""
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    old_flat, new_flat = flatten(old['results']), flatten(new['results'])
+    print(f"{'metric':<40} {'old':>12} {'new':>12} {'change':>8}")
+    for name in sorted(set(old_flat) | set(new_flat)):
+        before, after = old_flat.get(name), new_flat.get(name)
+        change = f'{(after - before) / before * 100:+.1f}%' if before and after is not None else ''
+        print(f'{name:<40} {before if before is not None else "-":>12} {after if after is not None else "-":>12} {change:>8}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--menu-items', type=int, default=40)
+    parser.add_argument('--waiters', type=int, default=8)
+    parser.add_argument('--tables', type=int, default=30)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--phases', nargs='*', default=['rest', 'socket', 'startup'],
+                        choices=['rest', 'socket', 'startup'])
+    parser.add_argument('--out', help='result file (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    menu = synthetic_menu(random.Random(args.seed), args.menu_items)
+    menu_path = write_menu(menu)
+    # Before app (and menu.py) is imported, so the catalog reads the synthetic menu
+    os.environ['MENU_PATH'] = menu_path
+    ops = traffic(args.seed, menu, args.orders, args.waiters, args.tables)
+
+    results = {}
+    if 'rest' in args.phases:
+        results['rest'] = run_rest(ops)
+        print(json.dumps(results['rest'], indent=2))
+    if 'socket' in args.phases:
+        try:
+            import socketio  # noqa: F401
+            import websocket  # noqa: F401
+        except ImportError:
+            print('Skipping socket phase: pip install "python-socketio[client]"')
+        else:
+            results['socket'] = run_socket(ops, args.clients, menu_path)
+            print(json.dumps(results['socket'], indent=2))
+    if 'startup' in args.phases:
+        from bench_startup import measure
+        results['startup'] = measure(runs=3, order_count=args.orders)
+        print(json.dumps(results['startup'], indent=2))
+
+    commit = git_commit()
+    out = args.out or os.path.join(RESULTS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump({
+            'meta': {
+                'commit': commit,
+                'date': datetime.utcnow().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'params': {key: value for key, value in vars(args).items() if key not in ('out', 'compare')},
+            },
+            'results': results,
+        }, f, indent=2)
+    print(f'Saved {out}')
+
+
+if __name__ == '__main__':
+    main()
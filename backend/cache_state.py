@@ -0,0 +1,40 @@
+"""
+Load-on-first-use bookkeeping shared by the in-memory read models
+(stats counters, kitchen queues, active orders, latency sketches)
+"""
+from threading import Lock
+import time
+
+
+class CacheState:
+    """A lock, whether and when the model was last loaded, and when to reload it
+
+    max_age (seconds) forces a periodic reload; it is set when several worker
+    processes write to the same database and no single process sees every
+    change. Subclasses implement load(db) and call _mark_loaded() at its end,
+    under _lock.
+    """
+
+    def __init__(self, max_age=None):
+        self._lock = Lock()
+        self._loaded = False
+        self._loaded_at = 0.0
+        self.max_age = max_age
+
+    def load(self, db):
+        raise NotImplementedError
+
+    def _mark_loaded(self):
+        self._loaded = True
+        self._loaded_at = time.monotonic()
+
+    @property
+    def stale(self):
+        """True before the first load and once the last one is older than max_age"""
+        expired = self.max_age is not None and time.monotonic() - self._loaded_at > self.max_age
+        return not self._loaded or expired
+
+    def ensure_loaded(self, db):
+        """Load on first use (and again once older than max_age)"""
+        if self.stale:
+            self.load(db)
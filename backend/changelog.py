@@ -0,0 +1,52 @@
+"""
+Bounded in-memory change log for Socket.IO resync
+Every broadcast order event gets a monotonically increasing sequence number
+"""
+from collections import deque
+from threading import Lock
+import uuid
+
+
+class ChangeLog:
+    """Ring buffer of the most recent order events
+
+    Sequence numbers restart with the process, so each log carries an epoch;
+    clients that reconnect with a different epoch need a full snapshot.
+    """
+
+    def __init__(self, maxlen=1000):
+        self._lock = Lock()
+        self._events = deque(maxlen=maxlen)
+        self.epoch = uuid.uuid4().hex
+        self.seq = 0
+
+    def record(self, event, data, targets=None):
+        """Append an event and return its sequence number
+
+        targets optionally keeps the per-audience [(rooms, payload), ...]
+        routing so replays can be filtered the same way as live emits.
+        """
+        with self._lock:
+            self.seq += 1
+            self._events.append({'seq': self.seq, 'event': event, 'data': data, 'targets': targets})
+            return self.seq
+
+    def since(self, seq, epoch=None):
+        """Events after seq, or None when the client is too far behind
+
+        None means the requested range has been evicted (or belongs to another
+        epoch) and the caller should fall back to a full snapshot.
+        """
+        with self._lock:
+            if epoch != self.epoch or seq > self.seq:
+                return None
+            if seq == self.seq:
+                return []
+            oldest = self._events[0]['seq'] if self._events else self.seq + 1
+            if seq + 1 < oldest:
+                return None
+            return [event for event in self._events if event['seq'] > seq]
+
+    def meta(self, seq=None):
+        """Sequence metadata sent alongside each event"""
+        return {'seq': self.seq if seq is None else seq, 'epoch': self.epoch}
@@ -0,0 +1,113 @@
+"""
+Debounced, coalescing Socket.IO broadcast for clients that accept batches
+Order events are buffered per room for a short window; repeated events for the
+same order collapse into its latest state and go out as one 'orders_delta'
+"""
+from threading import Lock
+import os
+import time
+
+import metrics
+import wire
+from rooms import wire_room
+
+# Buffering window in milliseconds; 0 sends every event on its own to everyone
+BATCH_WINDOW_MS = float(os.environ.get('SOCKETIO_BATCH_WINDOW_MS', 75))
+
+
+def order_key(event, data):
+    """Order id an event payload is about"""
+    if event == 'order_created':
+        return data['id']
+    if event == 'order_updated':
+        return data['order']['id'] if 'order' in data else data['orderId']
+    return data['orderId']
+
+
+def merge(previous, event, data):
+    """Collapse a buffered event for an order with a newer one
+
+    Returns the (event, data) to keep, or None when nothing needs sending
+    (an order created and deleted within one window). Payloads are never
+    modified in place: they are shared with other rooms and the change log.
+    """
+    previous_event, previous_data = previous
+    if event == 'order_deleted':
+        return None if previous_event == 'order_created' else (event, data)
+    if previous_event == 'order_created' and event == 'order_updated':
+        # Still new to this room: send the creation with the latest state
+        if 'order' in data:
+            return previous_event, data['order']
+        return previous_event, dict(previous_data, status=data['newStatus'])
+    if previous_event == 'order_updated' and event == 'order_updated':
+        return event, dict(data, oldStatus=previous_data['oldStatus'])
+    return event, data
+
+
+class EventCoalescer:
+    """Per-room buffers of order events, flushed window_ms after the first one
+
+    Events keep their change-log sequence numbers, so batched clients resync
+    exactly like the others. Each buffer is sent once per wire format in use.
+    """
+
+    def __init__(self, socketio, change_log, window_ms=BATCH_WINDOW_MS):
+        self.socketio = socketio
+        self.change_log = change_log
+        self.window_ms = window_ms
+        self._lock = Lock()
+        # room -> {order id: [seq, event, data]}, in order of first appearance
+        self._buffers = {}
+        self._flush_scheduled = False
+        self.wires = {wire.DEFAULT}
+
+    @property
+    def enabled(self):
+        return self.window_ms > 0
+
+    def use_wire(self, client_wire):
+        """Also send every batch in client_wire (to its "<room>@<name>" variants)"""
+        with self._lock:
+            self.wires.add(client_wire)
+
+    def add(self, rooms, seq, event, data):
+        """Buffer one change-log event for rooms"""
+        key = order_key(event, data)
+        with self._lock:
+            for room in rooms:
+                buffer = self._buffers.setdefault(room, {})
+                entry = buffer.get(key)
+                if entry is None:
+                    buffer[key] = [seq, event, data]
+                    continue
+                merged = merge((entry[1], entry[2]), event, data)
+                if merged is None:
+                    del buffer[key]
+                else:
+                    entry[0], entry[1], entry[2] = seq, merged[0], merged[1]
+            schedule = not self._flush_scheduled
+            self._flush_scheduled = True
+        if schedule:
+            self.socketio.start_background_task(self._flush_later)
+
+    def _flush_later(self):
+        self.socketio.sleep(self.window_ms / 1000)
+        with self._lock:
+            self._flush_scheduled = False
+        self.flush()
+
+    def flush(self):
+        """Send every buffered room its events as one 'orders_delta'"""
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+            wires = list(self.wires)
+        for room, buffer in buffers.items():
+            if not buffer:
+                continue
+            events = [{'seq': seq, 'event': event, 'data': data} for seq, event, data in buffer.values()]
+            meta = self.change_log.meta(max(event['seq'] for event in events))
+            started = time.perf_counter()
+            for client_wire in wires:
+                self.socketio.emit('orders_delta', (client_wire.delta(events), meta),
+                                   to=wire_room(room, client_wire.name))
+            metrics.observe_emit('orders_delta', time.perf_counter() - started)
@@ -1,34 +1,213 @@
 """
 Database configuration and initialization for Restaurant System
 """
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event, inspect, text, Table, Column, Integer, select
+from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
+from threading import Lock
 import os
 
-# Database file path
+import fastjson
+
+# Database file path (default backend)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_PATH = os.path.join(BASE_DIR, 'restaurant.db')
-DATABASE_URL = f'sqlite:///{DATABASE_PATH}'
 
-# Create engine
-engine = create_engine(DATABASE_URL, echo=False, connect_args={'check_same_thread': False})
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def normalize_database_url(url):
+    """Accept the postgres:// URLs hosting providers hand out and use psycopg 3"""
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    if url.startswith('postgresql://'):
+        url = 'postgresql+psycopg://' + url[len('postgresql://'):]
+    return url
+
+
+# SQLite file by default; set DATABASE_URL=postgresql://... for PostgreSQL
+DATABASE_URL = normalize_database_url(os.environ.get('DATABASE_URL', f'sqlite:///{DATABASE_PATH}'))
+
+# SQLite tuning profile, applied to every new connection
+SQLITE_PRAGMAS = {
+    # Readers no longer block the writer (and vice versa)
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    # Safe with WAL: only the last commits can be lost on power failure, never corruption
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 64 * 1024 * 1024)),
+    # sqlite3 waits inside C, which blocks the eventlet hub, so keep it short
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 2000)),
+    'foreign_keys': 'ON',
+}
+
+# Pool sizing; green threads share these connections, so this also caps how
+# many requests can hold a connection at once
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 20))
+POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+# Server connections: drop ones the server or a proxy closed while idle
+POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+
+
+def apply_sqlite_pragmas(engine, pragmas=None):
+    """Run the PRAGMA tuning profile on every connection the engine opens"""
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+    return engine
+
+
+def create_db_engine(url=DATABASE_URL, tuned=True):
+    """Create an engine for url with the pool and (for SQLite) PRAGMA profile"""
+    url = normalize_database_url(url)
+    options = {'echo': False, 'json_serializer': fastjson.dumps, 'json_deserializer': fastjson.loads}
+    if url.startswith('sqlite'):
+        options['connect_args'] = {'check_same_thread': False}
+    if tuned:
+        options.update(pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT)
+        if not url.startswith('sqlite'):
+            options.update(pool_pre_ping=True, pool_recycle=POOL_RECYCLE)
+    engine = create_engine(url, **options)
+    if tuned and url.startswith('sqlite'):
+        apply_sqlite_pragmas(engine)
+    return engine
+
+
+# Session factory, bound to the engine when get_engine() first creates it
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+_engine_lock = Lock()
+
+
+def get_engine():
+    """The process-wide engine, created on first use rather than at import
+
+    Importing the app (and binding the port) then never waits on the
+    database driver; benchmarks may assign database.engine beforehand.
+    """
+    global engine
+    if 'engine' not in globals():
+        with _engine_lock:
+            if 'engine' not in globals():
+                engine = create_db_engine()
+                SessionLocal.configure(bind=engine)
+    return engine
+
+
+def __getattr__(name):
+    # database.engine resolves through get_engine() until it exists
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# One session per request (or Socket.IO event); app.py removes it on teardown.
+# Sessions are scoped to the current thread, i.e. greenlet under eventlet.
+db_session = scoped_session(SessionLocal)
 
 # Base class for models
 Base = declarative_base()
 
-def init_db():
-    """Initialize database tables"""
-    from models import Order, OrderItem
-    Base.metadata.create_all(bind=engine)
-    print(f"Database initialized at: {DATABASE_PATH}")
+# Single-row table holding the schema version reached by run_migrations()
+schema_version = Table('schema_version', Base.metadata, Column('version', Integer, nullable=False))
+
+
+# ============ MIGRATIONS ============
+
+def _create_indexes(connection, *names):
+    """Create the named model indexes if they are missing"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in names:
+                index.create(bind=connection, checkfirst=True)
+
+
+def _add_column(connection, table, name, ddl):
+    """ALTER TABLE table ADD COLUMN name ddl, unless the column exists"""
+    if name not in {column['name'] for column in inspect(connection).get_columns(table)}:
+        connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+
+
+def migrate_order_indexes(connection):
+    """Indexes for pagination, status filters and item loading"""
+    _create_indexes(connection, 'ix_orders_timestamp_id', 'ix_orders_status_timestamp', 'ix_order_items_order_id')
+
+
+def migrate_backfill_rollups(connection):
+    """Fill the analytics rollup tables from the orders already stored"""
+    from analytics import backfill
+    backfill(connection)
+
+
+def migrate_client_order_id(connection):
+    """orders.client_order_id and its unique index, for idempotent submission (kept on archiving)"""
+    for table in ('orders', 'archived_orders'):
+        _add_column(connection, table, 'client_order_id', 'VARCHAR(64)')
+    _create_indexes(connection, 'ux_orders_client_order_id')
+
+
+def migrate_table_sessions(connection):
+    """orders.table_session_id (kept on archiving), and open sessions for the tables with active orders"""
+    for table in ('orders', 'archived_orders'):
+        _add_column(connection, table, 'table_session_id', 'INTEGER')
+    from table_sessions import backfill
+    backfill(connection)
+
+
+# Applied in order; each entry brings the schema to the version in its position (1-based)
+MIGRATIONS = [
+    migrate_order_indexes,
+    migrate_backfill_rollups,
+    migrate_client_order_id,
+    migrate_table_sessions,
+]
+
+
+def schema_is_current(connection):
+    """True when every model table exists and every migration has been applied
+
+    Two queries, where create_all() checks each table in turn.
+    """
+    if not set(Base.metadata.tables) <= set(inspect(connection).get_table_names()):
+        return False
+    return connection.execute(select(schema_version.c.version)).scalar() == len(MIGRATIONS)
+
+
+def run_migrations(bind=None):
+    """Apply the migrations the database has not seen yet"""
+    bind = bind or get_engine()
+    with bind.begin() as connection:
+        current = connection.execute(select(schema_version.c.version)).scalar()
+        if current is None:
+            connection.execute(schema_version.insert().values(version=0))
+            current = 0
+        for version, migration in enumerate(MIGRATIONS, start=1):
+            if version > current:
+                migration(connection)
+                connection.execute(schema_version.update().values(version=version))
+                print(f"Applied migration {version}: {migration.__name__}")
+
+
+def init_db(bind=None):
+    """Initialize database tables and bring the schema up to date (skipped when already current)"""
+    import models  # noqa: F401 - registers every table on Base.metadata
+    bind = bind or get_engine()
+    with bind.connect() as connection:
+        if schema_is_current(connection):
+            print(f"Database schema is current at: {bind.url}")
+            return
+    Base.metadata.create_all(bind=bind)
+    run_migrations(bind)
+    print(f"Database initialized at: {bind.url}")
 
 def get_db():
-    """Get database session"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    """Get the session for the current request"""
+    get_engine()
+    return db_session()
+
+
+def remove_db_session(exception=None):
+    """Close the request's session (registered as a Flask teardown)"""
+    db_session.remove()
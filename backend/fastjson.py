@@ -0,0 +1,32 @@
+"""
+JSON encoding for REST responses, Socket.IO packets and JSON columns
+Uses orjson when it is installed and falls back to the stdlib json module
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+if orjson is not None:
+    def dumps_bytes(obj):
+        """Encode obj straight to UTF-8 bytes"""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def dumps(obj, **kwargs):
+        """json.dumps-compatible signature (formatting kwargs are ignored)"""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    loads = orjson.loads
+else:
+    def dumps_bytes(obj):
+        """Encode obj straight to UTF-8 bytes"""
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+    def dumps(obj, **kwargs):
+        """json.dumps-compatible signature"""
+        return json.dumps(obj, **kwargs)
+
+    loads = json.loads
@@ -0,0 +1,98 @@
+"""
+Health-compatibility index over the menu catalog
+Bitsets per health condition and per nutrient threshold, so any combination is a few bitwise ANDs
+"""
+from bisect import bisect_right
+from threading import Lock
+
+from menu import catalog as menu_catalog
+from models import HEALTH_CONDITIONS
+
+NUTRIENTS = ['calories', 'protein', 'carbs', 'fat', 'sugar']
+
+
+class HealthIndex:
+    """Bitset index of menu items, rebuilt whenever the catalog reloads
+
+    Bit i of every bitset stands for catalog.items[i].
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._lock = Lock()
+        self._version = None
+        self._items = []
+        self._all = 0
+        self._condition_bits = {}
+        self._item_masks = {}
+        self._nutrient_values = {}
+        self._nutrient_prefix = {}
+
+    def _ensure_current(self):
+        if self._version != self.catalog.version:
+            self.rebuild()
+
+    def rebuild(self):
+        """Recompute all bitsets from the catalog"""
+        with self._lock:
+            items = list(self.catalog.items)
+            condition_bits = {condition: 0 for condition in HEALTH_CONDITIONS}
+            item_masks = {}
+            for position, item in enumerate(items):
+                mask = 0
+                for bit, condition in enumerate(HEALTH_CONDITIONS):
+                    if item.get('health', {}).get(condition):
+                        condition_bits[condition] |= 1 << position
+                        mask |= 1 << bit
+                item_masks[item['id']] = mask
+
+            # Per nutrient: values sorted ascending, and prefix[k] is the bitset
+            # of the k items with the lowest values, so "value <= x" is one bisect
+            nutrient_values, nutrient_prefix = {}, {}
+            for nutrient in NUTRIENTS:
+                ranked = sorted(range(len(items)), key=lambda p: items[p].get(nutrient, 0))
+                nutrient_values[nutrient] = [items[p].get(nutrient, 0) for p in ranked]
+                prefix = [0]
+                for position in ranked:
+                    prefix.append(prefix[-1] | (1 << position))
+                nutrient_prefix[nutrient] = prefix
+
+            self._items = items
+            self._all = (1 << len(items)) - 1
+            self._condition_bits = condition_bits
+            self._item_masks = item_masks
+            self._nutrient_values = nutrient_values
+            self._nutrient_prefix = nutrient_prefix
+            self._version = self.catalog.version
+
+    def compatible(self, conditions=(), max_nutrients=None):
+        """Items suitable for every condition and within every nutrient maximum"""
+        self._ensure_current()
+        bits = self._all
+        for condition in conditions:
+            bits &= self._condition_bits[condition]
+        for nutrient, limit in (max_nutrients or {}).items():
+            bits &= self._nutrient_prefix[nutrient][bisect_right(self._nutrient_values[nutrient], limit)]
+
+        result = []
+        while bits:
+            low = bits & -bits
+            result.append(self._items[low.bit_length() - 1])
+            bits ^= low
+        return result
+
+    def unsafe_item_ids(self, menu_item_ids, health_conditions):
+        """Menu item ids that are not suitable for the given health conditions dict"""
+        self._ensure_current()
+        required = 0
+        for bit, condition in enumerate(HEALTH_CONDITIONS):
+            if health_conditions and health_conditions.get(condition):
+                required |= 1 << bit
+        if not required:
+            return []
+        return [item_id for item_id in menu_item_ids
+                if self._item_masks.get(item_id, 0) & required != required]
+
+
+# Process-wide index over the menu catalog used by app.py
+index = HealthIndex(menu_catalog)
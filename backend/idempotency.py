@@ -0,0 +1,66 @@
+"""
+Idempotent order submission: responses remembered per client order key
+A bounded TTL cache answers retries without touching the database; the unique
+orders.client_order_id column catches retries the cache has not seen
+(other workers, restarts, evicted keys)
+"""
+from collections import OrderedDict
+from threading import Lock
+import hashlib
+import os
+import time
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 64
+
+CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 10000))
+CACHE_TTL = float(os.environ.get('IDEMPOTENCY_TTL', 24 * 3600))
+
+
+def validate_key(key):
+    """Raise ValueError unless key is a usable idempotency key (None is allowed)"""
+    if key is not None and (not isinstance(key, str) or not 0 < len(key) <= MAX_KEY_LENGTH):
+        raise ValueError(f'{HEADER} / clientOrderId must be a string of 1 to {MAX_KEY_LENGTH} characters')
+    return key
+
+
+def fingerprint(body):
+    """Short hash of a request body, to spot a key reused for a different order"""
+    return hashlib.sha1(body).hexdigest()
+
+
+class ResponseCache:
+    """LRU of key -> (fingerprint, status, body bytes) with a time-to-live"""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """(fingerprint, status, body) for key, or None if unknown or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, stored = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return stored
+
+    def put(self, key, request_fingerprint, status, body):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, (request_fingerprint, status, body))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Process-wide cache used by app.py
+responses = ResponseCache()
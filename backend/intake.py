@@ -0,0 +1,319 @@
+"""
+Write-behind order intake: new orders are journaled, acknowledged and broadcast before
+they reach the database
+A background writer drains the append-only journal into the database in group
+commits; anything journaled but not committed is replayed on startup.
+Opt-in with ORDER_INTAKE=journal, single worker only (order ids are assigned here)
+"""
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+import os
+import time
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.exc import OperationalError
+
+import analytics
+import fastjson
+import lifecycle
+import metrics
+import table_sessions
+from models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+from serializers import format_timestamp
+
+# 'sync' commits inside the request (default); 'journal' writes behind
+MODE = os.environ.get('ORDER_INTAKE', 'sync')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOURNAL_PATH = os.environ.get('INTAKE_JOURNAL_PATH', os.path.join(BASE_DIR, 'intake.journal'))
+
+# Orders per group commit, and how long the writer waits between drains
+GROUP_MAX = int(os.environ.get('INTAKE_GROUP_MAX', 500))
+GROUP_WAIT_MS = float(os.environ.get('INTAKE_GROUP_WAIT_MS', 20))
+
+# fsync every append; 0 survives a process crash but not a power cut
+FSYNC = os.environ.get('INTAKE_FSYNC', '1') != '0'
+
+
+def order_dict(record):
+    """The to_dict()-shaped order of a journal record"""
+    order = record['order']
+    return {
+        'id': order['id'],
+        'table': order['table'],
+        'status': order['status'],
+        'waiter': order['waiter'],
+        'timestamp': format_timestamp(order['timestamp']),
+        'customerInfo': order['customer_info'],
+        'healthConditions': order['health_conditions'],
+        'items': [{
+            'id': item['id'],
+            'menuItemId': item['menu_item_id'],
+            'name': item['name'],
+            'category': item['category'],
+            'price': item['price'],
+            'quantity': item['quantity'],
+            'notes': item['notes'],
+            'calories': item['calories'],
+            'protein': item['protein'],
+            'carbs': item['carbs'],
+            'fat': item['fat'],
+            'sugar': item['sugar'],
+        } for item in record['items']],
+    }
+
+
+def encode_record(record):
+    order = dict(record['order'], timestamp=record['order']['timestamp'].isoformat())
+    return fastjson.dumps_bytes({'order': order, 'items': record['items']}) + b'\n'
+
+
+def decode_record(line):
+    record = fastjson.loads(line)
+    record['order']['timestamp'] = datetime.fromisoformat(record['order']['timestamp'])
+    return record
+
+
+def read_journal(path):
+    """Every complete record in the journal (a torn last line is skipped)"""
+    records = []
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    records.append(decode_record(line))
+                except ValueError:
+                    print(f'Skipping unreadable intake journal line: {line[:80]!r}')
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def write_records(connection, records):
+    """Insert journaled orders with their assigned ids, plus rollups, table sessions and lifecycle events"""
+    orders = [record['order'] for record in records]
+    items = [item for record in records for item in record['items']]
+    connection.execute(insert(Order), orders)
+    if items:
+        connection.execute(insert(OrderItem), items)
+    placed_at = [order['timestamp'] for order in orders]
+    order_dicts = [order_dict(record) for record in records]
+    analytics.record_orders(connection, order_dicts, placed_at)
+    table_sessions.record_orders(connection, order_dicts, placed_at)
+    lifecycle.record_created(connection, [order['id'] for order in orders], placed_at)
+
+
+def sync_sequences(connection):
+    """Move PostgreSQL id sequences past the ids assigned here, so synchronous inserts don't collide"""
+    if connection.dialect.name != 'postgresql':
+        return
+    for table in ('orders', 'order_items'):
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+            f" WHERE EXISTS (SELECT 1 FROM {table})"))
+
+
+class OrderIntake:
+    """Journal of accepted orders and the group-commit writer that drains it
+
+    submit() appends to the journal and returns straight away; drain()
+    commits everything pending. Requests that read or write orders call
+    drain() first, so they never miss an acknowledged order.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, group_max=GROUP_MAX, fsync=FSYNC):
+        self.path = path
+        self.group_max = group_max
+        self.fsync = fsync
+        self.engine = None
+        self.on_rejected = None
+        self._lock = Lock()
+        self._drain_lock = Lock()
+        self._file = None
+        # Order id -> journal record, oldest first
+        self._pending = OrderedDict()
+        # clientOrderId -> order id, for idempotent retries of pending orders
+        self._keys = {}
+        self._next_order_id = None
+        self._next_item_id = None
+
+    @property
+    def enabled(self):
+        return self.engine is not None
+
+    def start(self, engine, on_rejected=None):
+        """Replay the journal into engine and accept orders from now on
+
+        Intake is enabled only once the replay has committed: if it raises,
+        orders keep going through the synchronous path.
+        """
+        self.on_rejected = on_rejected
+        records = read_journal(self.path)
+        if records:
+            ids = [record['order']['id'] for record in records]
+            with engine.connect() as connection:
+                stored = set(connection.execute(select(Order.id).where(Order.id.in_(ids))).scalars())
+                stored.update(connection.execute(select(ArchivedOrder.id).where(ArchivedOrder.id.in_(ids))).scalars())
+            missing = [record for record in records if record['order']['id'] not in stored]
+            self._commit(engine, missing)
+            print(f'Intake journal replayed: {len(missing)} of {len(records)} orders were not committed')
+        self._file = open(self.path, 'ab')
+        self._truncate()
+        self.engine = engine
+
+    def _allocate_ids(self, item_count):
+        """Next order id and item ids (above every id in the live and archived tables)"""
+        if self._next_order_id is None:
+            with self.engine.connect() as connection:
+                self._next_order_id = 1 + max(
+                    connection.execute(select(func.max(Order.id))).scalar() or 0,
+                    connection.execute(select(func.max(ArchivedOrder.id))).scalar() or 0)
+                self._next_item_id = 1 + max(
+                    connection.execute(select(func.max(OrderItem.id))).scalar() or 0,
+                    connection.execute(select(func.max(ArchivedOrderItem.id))).scalar() or 0)
+        order_id = self._next_order_id
+        self._next_order_id += 1
+        item_ids = range(self._next_item_id, self._next_item_id + item_count)
+        self._next_item_id += item_count
+        return order_id, item_ids
+
+    def reserve_ids(self, item_counts):
+        """[(order id, item ids)] for orders inserted synchronously while intake is enabled
+
+        /api/orders/batch takes its ids from the same counters as submit(),
+        so a batch and a journaled order never get the same id.
+        """
+        with self._lock:
+            return [self._allocate_ids(item_count) for item_count in item_counts]
+
+    def pending_order(self, key):
+        """to_dict() of the pending order created with clientOrderId key, or None"""
+        with self._lock:
+            order_id = self._keys.get(key)
+            return order_dict(self._pending[order_id]) if order_id is not None else None
+
+    def submit(self, order_row, item_rows):
+        """Journal a new order and return its to_dict() and placed-at time
+
+        order_row and item_rows are the column values the synchronous path
+        would insert; ids are assigned here. The order is durable on return.
+        """
+        with self._lock:
+            order_id, item_ids = self._allocate_ids(len(item_rows))
+            record = {
+                'order': dict(order_row, id=order_id),
+                'items': [dict(row, id=item_id, order_id=order_id) for row, item_id in zip(item_rows, item_ids)],
+            }
+            self._file.write(encode_record(record))
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._pending[order_id] = record
+            if order_row.get('client_order_id') is not None:
+                self._keys[order_row['client_order_id']] = order_id
+        metrics.intake_pending_orders.inc()
+        return order_dict(record), record['order']['timestamp']
+
+    def drain(self):
+        """Commit every pending order, group_max per transaction"""
+        if not self._pending:
+            return
+        with self._drain_lock:
+            while True:
+                with self._lock:
+                    records = [self._pending[order_id] for order_id in list(self._pending)[:self.group_max]]
+                if not records:
+                    break
+                self._commit(self.engine, records)
+            with self._lock:
+                self._compact()
+
+    def _commit(self, engine, records):
+        """Write records in one transaction, or one by one to isolate the ones that fail
+
+        A record the database refuses is rejected whatever the error; an
+        OperationalError (database down or locked) propagates instead, and
+        the writer retries what is still pending.
+        """
+        if not records:
+            return
+        started = time.perf_counter()
+        try:
+            with engine.begin() as connection:
+                write_records(connection, records)
+                sync_sequences(connection)
+            self._settle(records)
+        except OperationalError:
+            raise
+        except Exception:
+            for record in records:
+                try:
+                    with engine.begin() as connection:
+                        write_records(connection, [record])
+                        sync_sequences(connection)
+                except OperationalError:
+                    raise
+                except Exception as e:
+                    self._reject(record, e)
+                self._settle([record])
+        metrics.intake_group_commit_duration.observe(time.perf_counter() - started)
+
+    def _settle(self, records):
+        """Forget records that were committed or rejected"""
+        with self._lock:
+            settled = [record for record in records if self._pending.pop(record['order']['id'], None) is not None]
+            for record in settled:
+                self._keys.pop(record['order']['client_order_id'], None)
+        if settled:
+            metrics.intake_pending_orders.dec(amount=len(settled))
+
+    def _reject(self, record, error):
+        """Set aside an order the database refused (it was already acknowledged)"""
+        print(f"Intake could not store order {record['order']['id']}: {error}")
+        with open(self.path + '.rejected', 'ab') as f:
+            f.write(encode_record(record))
+        if self.on_rejected is not None:
+            self.on_rejected(order_dict(record))
+
+    def _truncate(self):
+        """Empty the journal (caller holds _lock or is starting)"""
+        self._file.truncate(0)
+        self._file.seek(0)
+
+    def _compact(self):
+        """Rewrite the journal with only the pending records (caller holds _lock)
+
+        Committed records are not kept: replaying one after its order was
+        deleted would bring the order back. The rewrite goes to a new file
+        that replaces the journal, so a crash leaves one or the other whole.
+        """
+        if not self._pending:
+            self._truncate()
+            return
+        with open(self.path + '.tmp', 'wb') as f:
+            for record in self._pending.values():
+                f.write(encode_record(record))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(self.path + '.tmp', self.path)
+        self._file.close()
+        self._file = open(self.path, 'ab')
+
+    def run_writer(self, sleep, interval_ms=GROUP_WAIT_MS):
+        """Background loop: drain every interval_ms (start with socketio.start_background_task)"""
+        while True:
+            sleep(interval_ms / 1000)
+            try:
+                self.drain()
+            except Exception as e:
+                # Database unavailable: keep the orders and try again
+                print(f'Intake writer failed, retrying: {e}')
+                sleep(1)
+
+
+# Process-wide intake used by app.py
+intake = OrderIntake()
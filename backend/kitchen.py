@@ -0,0 +1,168 @@
+"""
+Kitchen scheduler: per-station priority queues of cooking tickets
+Each active order is split by item category into station tickets, ordered by when they must start
+"""
+from datetime import timedelta
+import heapq
+
+from cache_state import CacheState
+from menu import catalog as menu_catalog
+from models import Order
+from serializers import fetch_orders
+
+STATION_BY_CATEGORY = {
+    'Main': 'grill',
+    'Side': 'grill',
+    'Starter': 'cold',
+    'Dessert': 'dessert',
+    'Drink': 'bar',
+}
+STATIONS = ['grill', 'cold', 'bar', 'dessert']
+DEFAULT_STATION = 'grill'
+
+# Used when a menu item has no prepMinutes in menu.json
+PREP_MINUTES_BY_CATEGORY = {'Main': 15, 'Side': 8, 'Starter': 6, 'Dessert': 5, 'Drink': 2}
+DEFAULT_PREP_MINUTES = 10
+
+# Orders the kitchen still has to cook
+ACTIVE_STATUSES = ('pending', 'preparing')
+
+
+def station_for(category):
+    return STATION_BY_CATEGORY.get(category, DEFAULT_STATION)
+
+
+def prep_minutes_for(item):
+    """Prep time of an order item dict, from the menu catalog or its category"""
+    menu_item = menu_catalog.get(item['menuItemId'])
+    if menu_item and menu_item.get('prepMinutes') is not None:
+        return menu_item['prepMinutes']
+    return PREP_MINUTES_BY_CATEGORY.get(item['category'], DEFAULT_PREP_MINUTES)
+
+
+def split_tickets(order_dict, placed_at):
+    """Station tickets for an order dict
+
+    Tickets of one order are scheduled to finish together: each must start by
+    placed_at + (longest prep in the order - its own prep), so the slowest
+    station starts first and quick ones (drinks, cold starters) wait.
+    """
+    by_station = {}
+    for item in order_dict['items']:
+        by_station.setdefault(station_for(item['category']), []).append(item)
+    if not by_station:
+        return []
+
+    prep = {station: max(prep_minutes_for(item) for item in items) for station, items in by_station.items()}
+    longest = max(prep.values())
+    return [{
+        'orderId': order_dict['id'],
+        'table': order_dict['table'],
+        'station': station,
+        'status': order_dict['status'],
+        'prepMinutes': prep[station],
+        'startBy': placed_at + timedelta(minutes=longest - prep[station]),
+        'items': [{'menuItemId': item['menuItemId'], 'name': item['name'],
+                   'quantity': item['quantity'], 'notes': item['notes']} for item in items],
+    } for station, items in by_station.items()]
+
+
+class KitchenScheduler(CacheState):
+    """Min-heaps of tickets per station, keyed on (startBy, orderId)
+
+    Removed or re-queued tickets are left in the heap and skipped lazily, so
+    every update is O(log n) and reading the next N tickets is O(N log n).
+    """
+
+    def __init__(self, max_age=None):
+        super().__init__(max_age)
+        self._heaps = {station: [] for station in STATIONS}
+        # order id -> list of live tickets
+        self._tickets = {}
+        self._live = 0
+
+    def load(self, db):
+        """Rebuild every queue from the active orders in the DB"""
+        orders, keys = fetch_orders(db, Order.status.in_(ACTIVE_STATUSES))
+        with self._lock:
+            self._heaps = {station: [] for station in STATIONS}
+            self._tickets = {}
+            self._live = 0
+            for order_dict, (placed_at, _) in zip(orders, keys):
+                self._add(order_dict, placed_at, push=list.append)
+            for heap in self._heaps.values():
+                heapq.heapify(heap)
+            self._mark_loaded()
+
+    def _add(self, order_dict, placed_at, push=heapq.heappush):
+        tickets = split_tickets(order_dict, placed_at)
+        self._tickets[order_dict['id']] = tickets
+        self._live += len(tickets)
+        for ticket in tickets:
+            # id(ticket) makes entries unique so dicts are never compared
+            push(self._heaps.setdefault(ticket['station'], []),
+                 (ticket['startBy'], ticket['orderId'], id(ticket), ticket))
+
+    def _remove(self, order_id):
+        self._live -= len(self._tickets.pop(order_id, ()))
+        # Rebuild a heap once dead entries clearly outnumber live ones
+        for station, heap in self._heaps.items():
+            if len(heap) > 2 * self._live + 64:
+                self._heaps[station] = [entry for entry in heap if self._is_live(entry[3])]
+                heapq.heapify(self._heaps[station])
+
+    def _is_live(self, ticket):
+        return any(live is ticket for live in self._tickets.get(ticket['orderId'], ()))
+
+    def order_created(self, order_dict, placed_at):
+        """Queue the tickets of a new order"""
+        with self._lock:
+            if self._loaded and order_dict['status'] in ACTIVE_STATUSES:
+                self._add(order_dict, placed_at)
+
+    def status_changed(self, order_dict, placed_at):
+        """Keep, update or drop an order's tickets after a status change"""
+        with self._lock:
+            if not self._loaded:
+                return
+            tickets = self._tickets.get(order_dict['id'])
+            if order_dict['status'] not in ACTIVE_STATUSES:
+                self._remove(order_dict['id'])
+            elif tickets is not None:
+                for ticket in tickets:
+                    ticket['status'] = order_dict['status']
+            else:
+                # Sent back to the kitchen (e.g. ready -> preparing)
+                self._add(order_dict, placed_at)
+
+    def order_removed(self, order_id):
+        """Drop a deleted order's tickets"""
+        with self._lock:
+            if self._loaded:
+                self._remove(order_id)
+
+    def next_tickets(self, station, n):
+        """The next n tickets for a station, most urgent first"""
+        with self._lock:
+            heap = self._heaps.get(station, [])
+            taken = []
+            while heap and len(taken) < n:
+                entry = heapq.heappop(heap)
+                if self._is_live(entry[3]):
+                    taken.append(entry)
+            for entry in taken:
+                heapq.heappush(heap, entry)
+            return [entry[3] for entry in taken]
+
+    def queue_lengths(self):
+        """Number of live tickets per station"""
+        with self._lock:
+            lengths = {station: 0 for station in self._heaps}
+            for tickets in self._tickets.values():
+                for ticket in tickets:
+                    lengths[ticket['station']] += 1
+            return lengths
+
+
+# Process-wide scheduler used by app.py
+scheduler = KitchenScheduler()
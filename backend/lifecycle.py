@@ -0,0 +1,214 @@
+"""
+Order lifecycle latency: status transitions in order_events and streaming percentiles
+Time spent in each status is fed into fixed-size quantile sketches, overall,
+per kitchen station and per menu item
+"""
+from array import array
+from datetime import datetime
+import math
+
+from sqlalchemy import select, insert, union_all
+
+from cache_state import CacheState
+from kitchen import station_for
+from models import OrderEvent, OrderItem, ArchivedOrderItem
+
+events_table = OrderEvent.__table__
+items_table = OrderItem.__table__
+archived_items_table = ArchivedOrderItem.__table__
+
+PERCENTILES = {'p50': 0.5, 'p95': 0.95, 'p99': 0.99}
+# Time from creation to completion, reported next to the per-status times
+TOTAL = 'total'
+
+# Orders whose events are replayed per query when loading
+LOAD_CHUNK = 1000
+
+
+class QuantileSketch:
+    """Log-bucketed histogram (as in DDSketch) with a fixed number of buckets
+
+    Any quantile is estimated within relative error alpha for values in
+    [min_value, max_value]; smaller and larger values fall in the end buckets.
+    Memory does not grow with the number of values added.
+    """
+
+    __slots__ = ('alpha', 'min_value', '_gamma', '_log_gamma', '_counts', 'count', 'total', 'low', 'high')
+
+    def __init__(self, alpha=0.02, min_value=1.0, max_value=2 * 86400.0):
+        self.alpha = alpha
+        self.min_value = min_value
+        self._gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self._gamma)
+        size = math.ceil(math.log(max_value / min_value) / self._log_gamma) + 1
+        self._counts = array('L', bytes(array('L').itemsize * size))
+        self.count = 0
+        self.total = 0.0
+        self.low = math.inf
+        self.high = -math.inf
+
+    def add(self, value):
+        if value <= self.min_value:
+            index = 0
+        else:
+            index = min(len(self._counts) - 1, math.ceil(math.log(value / self.min_value) / self._log_gamma))
+        self._counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.low = min(self.low, value)
+        self.high = max(self.high, value)
+
+    def quantile(self, q):
+        """Estimated q-quantile (0 <= q <= 1), or None when empty"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index, bucket_count in enumerate(self._counts):
+            seen += bucket_count
+            if seen > rank:
+                break
+        # Bucket i holds (min * gamma^(i-1), min * gamma^i]; its midpoint in relative terms
+        estimate = self.min_value * self._gamma ** index * 2 / (self._gamma + 1)
+        return min(max(estimate, self.low), self.high)
+
+    def summary(self):
+        """count, mean and the PERCENTILES, in seconds"""
+        if not self.count:
+            return {'count': 0}
+        result = {'count': self.count, 'mean': round(self.total / self.count, 1)}
+        for name, q in PERCENTILES.items():
+            result[name] = round(self.quantile(q), 1)
+        return result
+
+
+def record_created(db, order_ids, placed_at):
+    """Log the creation of new orders (the caller commits)"""
+    if not order_ids:
+        return
+    db.execute(insert(OrderEvent), [
+        {'order_id': order_id, 'from_status': None, 'to_status': 'pending', 'timestamp': timestamp}
+        for order_id, timestamp in zip(order_ids, placed_at)
+    ])
+
+
+def record_transition(db, order_id, old_status, new_status, placed_at, now=None):
+    """Log a status change and return the seconds spent in old_status
+
+    Returns None when that time is unknown: orders created before events
+    were recorded only have their creation time, which dates 'pending' alone.
+    """
+    now = now or datetime.utcnow()
+    last = db.execute(
+        select(events_table.c.to_status, events_table.c.timestamp)
+        .where(events_table.c.order_id == order_id)
+        .order_by(events_table.c.id.desc())
+        .limit(1)
+    ).first()
+    db.execute(insert(OrderEvent).values(order_id=order_id, from_status=old_status, to_status=new_status, timestamp=now))
+    if last is not None and last.to_status == old_status:
+        return (now - last.timestamp).total_seconds()
+    if last is None and old_status == 'pending' and placed_at is not None:
+        return (now - placed_at).total_seconds()
+    return None
+
+
+class LatencyTracker(CacheState):
+    """Quantile sketches of time in each status: overall, per station and per menu item
+
+    Loaded by replaying order_events on first use and then fed by the status
+    route.
+    """
+
+    def __init__(self, max_age=None, alpha=0.02):
+        super().__init__(max_age)
+        self.alpha = alpha
+        self._reset()
+
+    def _reset(self):
+        self._states = {}
+        self._stations = {}
+        self._items = {}
+        self._item_names = {}
+
+    def _sketch(self, group, key):
+        sketch = group.get(key)
+        if sketch is None:
+            sketch = group[key] = QuantileSketch(self.alpha)
+        return sketch
+
+    def _observe(self, state, seconds, items):
+        """Add one order's time in state, attributed to its stations and menu items"""
+        self._sketch(self._states, state).add(seconds)
+        for station in {station_for(item['category']) for item in items}:
+            self._sketch(self._stations.setdefault(station, {}), state).add(seconds)
+        for item in {item['menuItemId']: item for item in items}.values():
+            self._item_names[item['menuItemId']] = item['name']
+            self._sketch(self._items.setdefault(item['menuItemId'], {}), state).add(seconds)
+
+    def load(self, db):
+        """Rebuild every sketch from the events table (items of live and archived orders)"""
+        with self._lock:
+            self._reset()
+            last_order_id = 0
+            while True:
+                rows = db.execute(
+                    select(events_table.c.order_id, events_table.c.to_status, events_table.c.timestamp)
+                    .where(events_table.c.order_id.in_(
+                        select(events_table.c.order_id).distinct()
+                        .where(events_table.c.order_id > last_order_id)
+                        .order_by(events_table.c.order_id).limit(LOAD_CHUNK).scalar_subquery()
+                    ))
+                    .order_by(events_table.c.order_id, events_table.c.id)
+                ).all()
+                if not rows:
+                    break
+                order_ids = sorted({row.order_id for row in rows})
+                items_by_order = {}
+                # Events outlive archiving, so their orders' items may be in either table
+                for order_id, menu_item_id, name, category in db.execute(union_all(*[
+                    select(table.c.order_id, table.c.menu_item_id, table.c.name, table.c.category)
+                    .where(table.c.order_id.in_(order_ids))
+                    for table in (items_table, archived_items_table)
+                ])):
+                    items_by_order.setdefault(order_id, []).append(
+                        {'menuItemId': menu_item_id, 'name': name, 'category': category})
+
+                previous = None
+                for row in rows:
+                    items = items_by_order.get(row.order_id, [])
+                    if previous is not None and previous.order_id == row.order_id:
+                        self._observe(previous.to_status, (row.timestamp - previous.timestamp).total_seconds(), items)
+                        if row.to_status == 'completed' and created is not None:
+                            self._observe(TOTAL, (row.timestamp - created).total_seconds(), items)
+                    else:
+                        created = row.timestamp if row.to_status == 'pending' else None
+                    previous = row
+                last_order_id = order_ids[-1]
+            self._mark_loaded()
+
+    def status_changed(self, order_dict, old_status, seconds, placed_at, now):
+        """Record the time an order spent in old_status (seconds may be None)"""
+        with self._lock:
+            if not self._loaded:
+                return
+            if seconds is not None:
+                self._observe(old_status, seconds, order_dict['items'])
+            if order_dict['status'] == 'completed' and placed_at is not None:
+                self._observe(TOTAL, (now - placed_at).total_seconds(), order_dict['items'])
+
+    def snapshot(self):
+        """Percentile summaries in seconds, keyed by status (and 'total')"""
+        with self._lock:
+            return {
+                'states': {state: sketch.summary() for state, sketch in self._states.items()},
+                'stations': {station: {state: sketch.summary() for state, sketch in states.items()}
+                             for station, states in self._stations.items()},
+                'items': [{'menuItemId': menu_item_id, 'name': self._item_names.get(menu_item_id),
+                           'states': {state: sketch.summary() for state, sketch in states.items()}}
+                          for menu_item_id, states in sorted(self._items.items())],
+            }
+
+
+# Process-wide tracker used by app.py
+tracker = LatencyTracker()
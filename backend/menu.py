@@ -0,0 +1,65 @@
+"""
+Menu catalog: the server-authoritative source of item names, prices and nutrition
+Loaded from menu.json into an id index; edits to the file are picked up without a restart
+"""
+from threading import Lock
+import hashlib
+import json
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MENU_PATH = os.environ.get('MENU_PATH', os.path.join(BASE_DIR, 'menu.json'))
+
+# Fields an order item copies from the catalog
+ITEM_FIELDS = ['name', 'category', 'price', 'calories', 'protein', 'carbs', 'fat', 'sugar']
+
+
+class MenuCatalog:
+    """In-memory menu indexed by id, with a pre-serialized body and ETag for GET /api/menu"""
+
+    def __init__(self, path=MENU_PATH):
+        self.path = path
+        self._lock = Lock()
+        self._mtime = None
+        self.version = 0
+        self.items = []
+        self.by_id = {}
+        self.body = b'[]'
+        self.etag = ''
+
+    def load(self):
+        """(Re)read the catalog file and rebuild the index and cached body"""
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, encoding='utf-8') as f:
+                items = json.load(f)
+
+            by_id = {}
+            for item in items:
+                if item['id'] in by_id:
+                    raise ValueError(f"Duplicate menu item id: {item['id']}")
+                by_id[item['id']] = item
+
+            body = json.dumps(items, separators=(',', ':')).encode()
+            # Swap everything at once so readers never see a half-built catalog
+            self.items, self.by_id, self.body = items, by_id, body
+            self.etag = hashlib.sha1(body).hexdigest()[:16]
+            self._mtime = mtime
+            self.version += 1
+
+    def refresh(self):
+        """Reload if the file changed since the last load (one stat call)"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.load()
+
+    def get(self, item_id):
+        """Catalog entry for item_id, or None"""
+        return self.by_id.get(item_id)
+
+
+# Process-wide catalog used by app.py
+catalog = MenuCatalog()
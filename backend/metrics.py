@@ -0,0 +1,239 @@
+"""
+Instrumentation: request, SQL and Socket.IO metrics in the Prometheus text format
+Per-process (each worker reports its own; Prometheus sums them), plus an opt-in
+cProfile capture of slow requests
+"""
+from threading import Lock
+import io
+import os
+import time
+
+from flask import g, request, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PREFIX = 'optimeal'
+
+# Latency buckets in seconds, from a cached read to a slow write under load
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Requests running more SQL statements than this are logged (likely N+1)
+SQL_QUERY_WARN = int(os.environ.get('SQL_QUERY_WARN', 25))
+
+# Opt-in profiling: requests slower than this many milliseconds get their
+# cProfile stats saved to PROFILE_DIR (one .prof and a .txt summary each)
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 0))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.profiles'))
+
+
+class Metric:
+    """One metric family: values per label tuple"""
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = f'{PREFIX}_{name}'
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+        self._values = {}
+
+    def _label_text(self, labels, extra=None):
+        pairs = list(zip(self.labelnames, labels)) + ([extra] if extra else [])
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_values(items))
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _render_values(self, items):
+        return [f'{self.name}{self._label_text(labels)} {value}' for labels, value in items]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket counts (not cumulative), then sum and count
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _render_values(self, items):
+        lines = []
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{self._label_text(labels, ("le", _format_bound(bound)))} {cumulative}')
+            lines.append(f'{self.name}_bucket{self._label_text(labels, ("le", "+Inf"))} {count}')
+            lines.append(f'{self.name}_sum{self._label_text(labels)} {total}')
+            lines.append(f'{self.name}_count{self._label_text(labels)} {count}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound):
+    return repr(float(bound))
+
+
+# ============ METRICS ============
+
+http_request_duration = Histogram(
+    'http_request_duration_seconds', 'HTTP request duration by route', ('method', 'route', 'status'))
+sql_queries_per_request = Histogram(
+    'sql_queries_per_request', 'SQL statements executed per HTTP request', ('route',), QUERY_COUNT_BUCKETS)
+sql_time_per_request = Histogram(
+    'sql_time_per_request_seconds', 'Time spent in SQL per HTTP request', ('route',))
+sql_queries = Counter('sql_queries_total', 'SQL statements executed')
+sql_query_duration = Histogram('sql_query_duration_seconds', 'Duration of one SQL statement')
+socketio_connected_clients = Gauge('socketio_connected_clients', 'Socket.IO clients connected to this worker')
+socketio_emits = Counter('socketio_emits_total', 'Socket.IO emits by event', ('event',))
+socketio_emit_duration = Histogram('socketio_emit_duration_seconds', 'Time spent emitting one event', ('event',))
+intake_pending_orders = Gauge('intake_pending_orders', 'Journaled orders not yet committed (ORDER_INTAKE=journal)')
+intake_group_commit_duration = Histogram(
+    'intake_group_commit_duration_seconds', 'Time to commit one group of journaled orders')
+
+ALL_METRICS = [
+    http_request_duration, sql_queries_per_request, sql_time_per_request, sql_queries, sql_query_duration,
+    socketio_connected_clients, socketio_emits, socketio_emit_duration,
+    intake_pending_orders, intake_group_commit_duration,
+]
+
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def observe_emit(event_name, seconds):
+    socketio_emits.inc(event_name)
+    socketio_emit_duration.observe(seconds, event_name)
+
+
+# ============ SQL HOOKS ============
+
+# The start time lives on the statement's execution context: a statement
+# that raises never reaches after_cursor_execute, and its context goes with it
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    sql_queries.inc()
+    sql_query_duration.observe(elapsed)
+    # Attribute to the current HTTP request, if any
+    if has_app_context() and 'sql_count' in g:
+        g.sql_count += 1
+        g.sql_time += elapsed
+
+
+# ============ FLASK HOOKS ============
+
+_profiling = False
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def init_app(app):
+    """Time every request of app (render() serves the results)"""
+
+    @app.before_request
+    def start_request_metrics():
+        global _profiling
+        g.request_started = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+        # One profile at a time: green threads share the OS thread cProfile hooks
+        if PROFILE_SLOW_MS > 0 and not _profiling:
+            import cProfile  # only needed when profiling is on
+            _profiling = True
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def record_request_metrics(response):
+        global _profiling
+        if 'request_started' not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_started
+        route = _route()
+        http_request_duration.observe(elapsed, request.method, route, response.status_code)
+        sql_queries_per_request.observe(g.sql_count, route)
+        sql_time_per_request.observe(g.sql_time, route)
+        if g.sql_count > SQL_QUERY_WARN:
+            print(f'{request.method} {request.path} ran {g.sql_count} SQL statements ({g.sql_time * 1000:.1f}ms)')
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            _profiling = False
+            if elapsed * 1000 >= PROFILE_SLOW_MS:
+                save_profile(profiler, request.method, request.path, elapsed)
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exception=None):
+        """Requests that raised skip after_request; never leave the profiler on"""
+        global _profiling
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            _profiling = False
+
+
+def save_profile(profiler, method, path, elapsed):
+    """Write a slow request's profile as <time>-<method>-<path>.prof plus a text summary"""
+    import pstats
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{method}-{path.strip('/').replace('/', '_') or 'root'}"
+    base = os.path.join(PROFILE_DIR, name)
+    profiler.dump_stats(base + '.prof')
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(30)
+    with open(base + '.txt', 'w') as f:
+        f.write(f'{method} {path} took {elapsed * 1000:.1f}ms\n\n{summary.getvalue()}')
+    print(f'Slow request {method} {path} ({elapsed * 1000:.1f}ms), profile saved to {base}.prof')
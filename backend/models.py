@@ -1,11 +1,18 @@
 """
 SQLAlchemy models for Restaurant System
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Text, Index, func
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
 
+ORDER_STATUSES = ['pending', 'preparing', 'ready', 'completed']
+HEALTH_CONDITIONS = ['diabetes', 'cholesterol', 'bloodPressure', 'sugarFree']
+
+# JSON on SQLite, binary JSONB on PostgreSQL
+JSONType = JSON().with_variant(JSONB(), 'postgresql')
+
 
 class Order(Base):
     """Order model - represents a customer order"""
@@ -13,18 +20,30 @@ class Order(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     table = Column(String(50), nullable=False)
-    status = Column(String(20), default='pending')  # pending, preparing, ready, completed
+    status = Column(String(20), default='pending', server_default='pending')  # pending, preparing, ready, completed
     waiter = Column(String(100), nullable=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, server_default=func.current_timestamp())
+    # Idempotency key chosen by the client (Idempotency-Key header or clientOrderId)
+    client_order_id = Column(String(64), nullable=True)
+    # Table session the order is billed to (see table_sessions.py)
+    table_session_id = Column(Integer, nullable=True)
     
     # Customer info stored as JSON
-    customer_info = Column(JSON, nullable=True)
+    customer_info = Column(JSONType, nullable=True)
     # Health conditions stored as JSON
-    health_conditions = Column(JSON, nullable=True)
+    health_conditions = Column(JSONType, nullable=True)
     
     # Relationship to order items
     items = relationship('OrderItem', back_populates='order', cascade='all, delete-orphan')
 
+    # Keyset pagination walks (timestamp, id) newest first; status filters
+    # (kitchen board, stats) use the status index
+    __table_args__ = (
+        Index('ix_orders_timestamp_id', 'timestamp', 'id'),
+        Index('ix_orders_status_timestamp', 'status', 'timestamp'),
+        Index('ux_orders_client_order_id', 'client_order_id', unique=True),
+    )
+
     def to_dict(self):
         """Convert order to dictionary"""
         return {
@@ -44,22 +63,22 @@ class OrderItem(Base):
     __tablename__ = 'order_items'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    order_id = Column(Integer, ForeignKey('orders.id'), nullable=False)
+    order_id = Column(Integer, ForeignKey('orders.id'), nullable=False, index=True)
     
     # Item details
     menu_item_id = Column(Integer, nullable=False)
     name = Column(String(200), nullable=False)
     category = Column(String(100), nullable=True)
-    price = Column(Float, default=0)
-    quantity = Column(Integer, default=1)
+    price = Column(Float, default=0, server_default='0')
+    quantity = Column(Integer, default=1, server_default='1')
     notes = Column(Text, nullable=True)
     
     # Nutritional info (cached from menu)
-    calories = Column(Integer, default=0)
-    protein = Column(Float, default=0)
-    carbs = Column(Float, default=0)
-    fat = Column(Float, default=0)
-    sugar = Column(Float, default=0)
+    calories = Column(Integer, default=0, server_default='0')
+    protein = Column(Float, default=0, server_default='0')
+    carbs = Column(Float, default=0, server_default='0')
+    fat = Column(Float, default=0, server_default='0')
+    sugar = Column(Float, default=0, server_default='0')
     
     # Relationship back to order
     order = relationship('Order', back_populates='items')
@@ -80,3 +99,144 @@ class OrderItem(Base):
             'fat': self.fat,
             'sugar': self.sugar
         }
+
+
+class OrderRollup(Base):
+    """Order totals for one minute, hour or day, keyed on when orders were placed"""
+    __tablename__ = 'order_rollups'
+
+    granularity = Column(String(10), primary_key=True)  # minute, hour, day
+    bucket = Column(DateTime, primary_key=True)  # start of the period (UTC)
+
+    orders = Column(Integer, nullable=False, default=0, server_default='0')
+    items = Column(Integer, nullable=False, default=0, server_default='0')
+    revenue = Column(Float, nullable=False, default=0, server_default='0')
+
+    # Nutrition totals (per item value x quantity)
+    calories = Column(Float, nullable=False, default=0, server_default='0')
+    protein = Column(Float, nullable=False, default=0, server_default='0')
+    carbs = Column(Float, nullable=False, default=0, server_default='0')
+    fat = Column(Float, nullable=False, default=0, server_default='0')
+    sugar = Column(Float, nullable=False, default=0, server_default='0')
+
+    # Orders flagged with each health condition
+    diabetes = Column(Integer, nullable=False, default=0, server_default='0')
+    cholesterol = Column(Integer, nullable=False, default=0, server_default='0')
+    blood_pressure = Column(Integer, nullable=False, default=0, server_default='0')
+    sugar_free = Column(Integer, nullable=False, default=0, server_default='0')
+
+
+class ItemRollup(Base):
+    """Quantity sold and revenue of one menu item in one minute, hour or day"""
+    __tablename__ = 'item_rollups'
+
+    granularity = Column(String(10), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    menu_item_id = Column(Integer, primary_key=True)
+
+    name = Column(String(200), nullable=False)
+    quantity = Column(Integer, nullable=False, default=0, server_default='0')
+    revenue = Column(Float, nullable=False, default=0, server_default='0')
+
+
+class TableSession(Base):
+    """One party's stay at a table, from its first order (or an explicit open) until closed
+
+    Bill and nutrition totals are kept up to date by every order written to
+    or deleted from the session, so bills never rescan order_items.
+    """
+    __tablename__ = 'table_sessions'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    table = Column(String(50), nullable=False)
+    opened_at = Column(DateTime, nullable=False, default=datetime.utcnow, server_default=func.current_timestamp())
+    closed_at = Column(DateTime, nullable=True)  # None while the table is seated
+
+    orders = Column(Integer, nullable=False, default=0, server_default='0')
+    items = Column(Integer, nullable=False, default=0, server_default='0')
+    amount = Column(Float, nullable=False, default=0, server_default='0')  # price x quantity
+
+    # Nutrition totals (per item value x quantity)
+    calories = Column(Float, nullable=False, default=0, server_default='0')
+    protein = Column(Float, nullable=False, default=0, server_default='0')
+    carbs = Column(Float, nullable=False, default=0, server_default='0')
+    fat = Column(Float, nullable=False, default=0, server_default='0')
+    sugar = Column(Float, nullable=False, default=0, server_default='0')
+
+    # At most one open session per table; closed ones are listed per table by time
+    __table_args__ = (
+        Index('ux_table_sessions_open_table', 'table', unique=True,
+              sqlite_where=closed_at.is_(None), postgresql_where=closed_at.is_(None)),
+        Index('ix_table_sessions_table_opened_at', 'table', 'opened_at'),
+    )
+
+
+class TableSessionLine(Base):
+    """Quantity and amount of one menu item on a table session's bill"""
+    __tablename__ = 'table_session_lines'
+
+    session_id = Column(Integer, ForeignKey('table_sessions.id'), primary_key=True)
+    menu_item_id = Column(Integer, primary_key=True)
+
+    name = Column(String(200), nullable=False)
+    quantity = Column(Integer, nullable=False, default=0, server_default='0')
+    amount = Column(Float, nullable=False, default=0, server_default='0')
+
+
+class OrderEvent(Base):
+    """Append-only log of order status transitions
+
+    Not a foreign key to orders: the history outlives deleted orders.
+    """
+    __tablename__ = 'order_events'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    order_id = Column(Integer, nullable=False)
+    from_status = Column(String(20), nullable=True)  # None when the order was created
+    to_status = Column(String(20), nullable=False)
+    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow, server_default=func.current_timestamp())
+
+    # The latest event of an order is found by walking (order_id, id) backwards
+    __table_args__ = (
+        Index('ix_order_events_order_id_id', 'order_id', 'id'),
+    )
+
+
+class ArchivedOrder(Base):
+    """Completed order moved out of orders by the archiver (same columns)"""
+    __tablename__ = 'archived_orders'
+
+    id = Column(Integer, primary_key=True)
+    table = Column(String(50), nullable=False)
+    status = Column(String(20))
+    waiter = Column(String(100), nullable=True)
+    timestamp = Column(DateTime)
+    client_order_id = Column(String(64), nullable=True)
+    table_session_id = Column(Integer, nullable=True)
+    customer_info = Column(JSONType, nullable=True)
+    health_conditions = Column(JSONType, nullable=True)
+    archived_at = Column(DateTime, server_default=func.current_timestamp())
+
+    # The history API pages by (timestamp, id) like GET /api/orders
+    __table_args__ = (
+        Index('ix_archived_orders_timestamp_id', 'timestamp', 'id'),
+    )
+
+
+class ArchivedOrderItem(Base):
+    """Item of an archived order (same columns as order_items)"""
+    __tablename__ = 'archived_order_items'
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey('archived_orders.id'), nullable=False, index=True)
+    menu_item_id = Column(Integer, nullable=False)
+    name = Column(String(200), nullable=False)
+    category = Column(String(100), nullable=True)
+    price = Column(Float)
+    quantity = Column(Integer)
+    notes = Column(Text, nullable=True)
+    calories = Column(Integer)
+    protein = Column(Float)
+    carbs = Column(Float)
+    fat = Column(Float)
+    sugar = Column(Float)
@@ -0,0 +1,212 @@
+"""
+Nutrition engine: per-order, per-guest and per-table totals checked against health limits
+Totals for many orders come from one grouped SQL SUM over order_items; the
+recommended calories follow the same age rules as the waiter screen
+"""
+from functools import lru_cache
+
+from sqlalchemy import func, select
+
+from health_index import index as health_index, NUTRIENTS
+from models import Order, OrderItem
+
+orders_table = Order.__table__
+items_table = OrderItem.__table__
+
+# Per-guest, per-meal caps implied by a health condition (calories in kcal,
+# the rest in grams). Conditions are recorded per order, not per guest, so
+# the strictest cap of the order's conditions applies to everyone at it.
+CONDITION_LIMITS = {
+    'diabetes': {'sugar': 25, 'carbs': 60},
+    'cholesterol': {'fat': 20},
+    'bloodPressure': {'fat': 25, 'calories': 700},
+    'sugarFree': {'sugar': 5},
+}
+
+# Recommended calories per meal: adults by the party's average age, children flat
+ADULT_CALORIES_BY_AGE = [(12, 400), (18, 550), (30, 750), (50, 700), (65, 600)]
+SENIOR_CALORIES = 500
+CHILD_CALORIES = 400
+DEFAULT_AGE = 30
+
+# Ordered / recommended calories: below LIGHT is light, above EXCESS is excess
+PORTION_LIGHT = 0.6
+PORTION_EXCESS = 1.2
+
+
+def party(customer_info):
+    """(adults, children) from customerInfo, or None when the party size is unknown"""
+    if not isinstance(customer_info, dict):
+        return None
+    adults, children = customer_info.get('adults') or 0, customer_info.get('children') or 0
+    if not isinstance(adults, int) or not isinstance(children, int) or adults + children <= 0:
+        return None
+    return adults, children
+
+
+def adult_calories(average_age):
+    for below_age, calories in ADULT_CALORIES_BY_AGE:
+        if average_age < below_age:
+            return calories
+    return SENIOR_CALORIES
+
+
+def recommended_calories(customer_info, size=None):
+    """Calories recommended for the whole party, or None without a party size"""
+    size = size or party(customer_info)
+    if size is None:
+        return None
+    average_age = customer_info.get('avgAge')
+    if not isinstance(average_age, (int, float)):
+        average_age = DEFAULT_AGE
+    return size[0] * adult_calories(average_age) + size[1] * CHILD_CALORIES
+
+
+def portion(ordered, recommended):
+    """'light', 'good' or 'excess', or None without a recommendation"""
+    if not recommended:
+        return None
+    ratio = ordered / recommended
+    if ratio < PORTION_LIGHT:
+        return 'light'
+    return 'excess' if ratio > PORTION_EXCESS else 'good'
+
+
+def limits_for(health_conditions):
+    """Strictest per-guest cap per nutrient for a healthConditions dict (do not modify)"""
+    if not health_conditions:
+        return {}
+    return _limits(tuple(condition for condition in CONDITION_LIMITS if health_conditions.get(condition)))
+
+
+@lru_cache(maxsize=None)
+def _limits(conditions):
+    limits = {}
+    for condition in conditions:
+        for nutrient, cap in CONDITION_LIMITS[condition].items():
+            limits[nutrient] = min(cap, limits.get(nutrient, cap))
+    return limits
+
+
+def _rounded(values):
+    return {nutrient: round(values[nutrient], 1) for nutrient in NUTRIENTS}
+
+
+def summarize(order_id, table, status, customer_info, health_conditions, totals):
+    """Nutrition summary of one order from its nutrient totals (already rounded)"""
+    size = party(customer_info)
+    guests = sum(size) if size else None
+    per_guest = {nutrient: totals[nutrient] / guests for nutrient in NUTRIENTS} if guests else None
+    limits = limits_for(health_conditions)
+    # Without a party size, the whole order is measured against one guest's caps
+    measured = per_guest or totals
+    recommended = recommended_calories(customer_info, size)
+    return {
+        'orderId': order_id,
+        'table': table,
+        'status': status,
+        'guests': guests,
+        'totals': totals,
+        'perGuest': _rounded(per_guest) if per_guest else None,
+        'limits': limits,
+        'exceeded': [nutrient for nutrient, cap in limits.items() if measured[nutrient] > cap],
+        'recommendedCalories': recommended,
+        'portion': portion(totals['calories'], recommended),
+    }
+
+
+def order_nutrition(order_dict):
+    """Full nutrition of one serialized order, with every item checked against its limits"""
+    totals = dict.fromkeys(NUTRIENTS, 0.0)
+    limits = limits_for(order_dict['healthConditions'])
+    unsafe = set(health_index.unsafe_item_ids(
+        [item['menuItemId'] for item in order_dict['items']], order_dict['healthConditions']))
+    items = []
+    for item in order_dict['items']:
+        item_totals = {nutrient: (item[nutrient] or 0) * item['quantity'] for nutrient in NUTRIENTS}
+        for nutrient in NUTRIENTS:
+            totals[nutrient] += item_totals[nutrient]
+        items.append({
+            'id': item['id'],
+            'menuItemId': item['menuItemId'],
+            'name': item['name'],
+            'quantity': item['quantity'],
+            'totals': _rounded(item_totals),
+            # One serving alone is over a guest's cap
+            'exceeds': [nutrient for nutrient, cap in limits.items() if (item[nutrient] or 0) > cap],
+            'unsafe': item['menuItemId'] in unsafe,
+        })
+    result = summarize(order_dict['id'], order_dict['table'], order_dict['status'],
+                       order_dict['customerInfo'], order_dict['healthConditions'], _rounded(totals))
+    result['items'] = items
+    return result
+
+
+def totals_by_order(db, order_ids):
+    """{order id: {nutrient: rounded total}} for order_ids (a list or a SELECT of ids), in one grouped SUM"""
+    totals = {}
+    for order_id, *values in db.execute(
+        select(items_table.c.order_id,
+               *[func.sum(items_table.c[nutrient] * items_table.c.quantity) for nutrient in NUTRIENTS])
+        .where(items_table.c.order_id.in_(order_ids))
+        .group_by(items_table.c.order_id)
+    ):
+        totals[order_id] = {nutrient: round(float(value or 0), 1) for nutrient, value in zip(NUTRIENTS, values)}
+    return totals
+
+
+def report(db, *filters, limit=None):
+    """Summaries of the orders matching filters (newest first), per table and overall
+
+    One query reads the orders, one grouped SUM totals their items. A
+    table's party is its largest order's party: later rounds are usually
+    the same guests.
+    """
+    order_query = (select(orders_table.c.id, orders_table.c.table, orders_table.c.status,
+                          orders_table.c.customer_info, orders_table.c.health_conditions)
+                   .where(*filters).order_by(orders_table.c.timestamp.desc(), orders_table.c.id.desc()))
+    if limit is not None:
+        order_query = order_query.limit(limit)
+    rows = db.execute(order_query).all()
+
+    sums = {}
+    if rows:
+        selected_ids = select(orders_table.c.id).where(*filters)
+        if limit is not None:
+            selected_ids = select(order_query.with_only_columns(orders_table.c.id).subquery().c.id)
+        sums = totals_by_order(db, selected_ids)
+
+    empty = dict.fromkeys(NUTRIENTS, 0.0)
+    orders = []
+    tables = {}
+    overall = dict(empty)
+    for order_id, table, status, customer_info, health_conditions in rows:
+        totals = sums.get(order_id, empty)
+        summary = summarize(order_id, table, status, customer_info, health_conditions, totals)
+        orders.append(summary)
+
+        entry = tables.setdefault(table, {'table': table, 'orders': 0, 'guests': None,
+                                          'totals': dict(empty), 'limits': {}})
+        entry['orders'] += 1
+        if summary['guests']:
+            entry['guests'] = max(entry['guests'] or 0, summary['guests'])
+        for nutrient in NUTRIENTS:
+            entry['totals'][nutrient] += totals[nutrient]
+            overall[nutrient] += totals[nutrient]
+        for nutrient, cap in summary['limits'].items():
+            entry['limits'][nutrient] = min(cap, entry['limits'].get(nutrient, cap))
+
+    table_summaries = []
+    for entry in tables.values():
+        guests = entry['guests']
+        per_guest = {nutrient: entry['totals'][nutrient] / guests for nutrient in NUTRIENTS} if guests else None
+        measured = per_guest or entry['totals']
+        table_summaries.append({
+            **entry,
+            'totals': _rounded(entry['totals']),
+            'perGuest': _rounded(per_guest) if per_guest else None,
+            'exceeded': [nutrient for nutrient, cap in entry['limits'].items() if measured[nutrient] > cap],
+        })
+    table_summaries.sort(key=lambda entry: entry['table'])
+
+    return {'orders': orders, 'tables': table_summaries, 'totals': _rounded(overall)}
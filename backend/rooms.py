@@ -0,0 +1,108 @@
+"""
+Socket.IO room routing for order events
+Clients join rooms by role, waiter and table; each audience gets its own payload
+"""
+
+KITCHEN = 'kitchen'
+MANAGER = 'manager'
+# Clients that connect without a role get every full payload, as before
+EVERYONE = 'all'
+
+# Clients that accept batches join "<room>+batch" instead of each room and
+# get coalesced 'orders_delta' events (see coalescer.py)
+BATCH_SUFFIX = '+batch'
+# Batched clients that asked for another wire format (see wire.py) join
+# "<room>+batch@<wire name>", e.g. "kitchen+batch@msgpack.br.compact"
+WIRE_SEPARATOR = '@'
+
+
+def waiter_room(name):
+    return f'waiter:{name}'
+
+
+def table_room(table):
+    return f'table:{table}'
+
+
+def batch_room(room):
+    return room + BATCH_SUFFIX
+
+
+def wire_room(room, wire_name):
+    """The variant of a batch room for a wire format ('' is the default)"""
+    return f'{room}{WIRE_SEPARATOR}{wire_name}' if wire_name else room
+
+
+def base_room(room):
+    """The room a batch room stands for (other rooms unchanged)"""
+    index = room.rfind(BATCH_SUFFIX)
+    return room[:index] if index >= 0 else room
+
+
+def wire_name(room):
+    """Wire format name of a batch room variant ('' if none)"""
+    batch, _, name = room.rpartition(BATCH_SUFFIX + WIRE_SEPARATOR)
+    return name if batch else ''
+
+
+def rooms_for(subscription):
+    """Rooms a client joins for a subscription dict {role, name, tables}"""
+    subscription = subscription if isinstance(subscription, dict) else {}
+    role = subscription.get('role')
+    rooms = []
+    if role == 'kitchen':
+        rooms.append(KITCHEN)
+    elif role == 'manager':
+        rooms.append(MANAGER)
+    elif role == 'waiter' and subscription.get('name'):
+        rooms.append(waiter_room(subscription['name']))
+
+    tables = subscription.get('tables') or []
+    if not isinstance(tables, list):
+        tables = [tables]
+    rooms.extend(table_room(table) for table in tables)
+
+    return rooms or [EVERYONE]
+
+
+def audiences(event, data, waiter, table):
+    """Split an order event into [(rooms, payload), ...] per audience
+
+    Kitchen, the order's waiter, its table and role-less clients get the full
+    payload; managers only get the status change for updates.
+    """
+    full_rooms = [EVERYONE, KITCHEN, waiter_room(waiter), table_room(table)]
+    if event == 'order_updated':
+        return [
+            (full_rooms, data),
+            ([MANAGER], {
+                'orderId': data['order']['id'],
+                'oldStatus': data['oldStatus'],
+                'newStatus': data['newStatus']
+            }),
+        ]
+    return [(full_rooms + [MANAGER], data)]
+
+
+def batch_audiences(orders):
+    """[(rooms, orders), ...] for a batch of new orders
+
+    Full-view rooms get the whole batch; each waiter and table room gets
+    only its own orders.
+    """
+    targets = [([EVERYONE, KITCHEN, MANAGER], orders)]
+    by_room = {}
+    for order in orders:
+        for room in (waiter_room(order['waiter']), table_room(order['table'])):
+            by_room.setdefault(room, []).append(order)
+    targets.extend(([room], room_orders) for room, room_orders in by_room.items())
+    return targets
+
+
+def payload_for(targets, client_rooms):
+    """Pick the payload a client in client_rooms should see, or None"""
+    client_rooms = {base_room(room) for room in client_rooms}
+    for rooms, payload in targets:
+        if client_rooms.intersection(rooms):
+            return payload
+    return None
@@ -0,0 +1,103 @@
+"""
+Read-side order serialization
+Selects plain rows with SQLAlchemy Core and builds the order/item tree in one pass,
+producing the same dicts as Order.to_dict() without ORM objects
+"""
+from flask import Response
+from sqlalchemy import select
+
+import fastjson
+from models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+
+orders_table = Order.__table__
+items_table = OrderItem.__table__
+archived_orders_table = ArchivedOrder.__table__
+archived_items_table = ArchivedOrderItem.__table__
+
+ORDER_COLUMN_NAMES = ['id', 'table', 'status', 'waiter', 'timestamp', 'customer_info', 'health_conditions']
+ITEM_COLUMN_NAMES = ['order_id', 'id', 'menu_item_id', 'name', 'category', 'price', 'quantity', 'notes',
+                     'calories', 'protein', 'carbs', 'fat', 'sugar']
+
+# Pages are small enough to fetch items with "order_id IN (...)"; larger
+# reads join on the order filters instead of binding thousands of ids
+MAX_IN_IDS = 1000
+
+
+def format_timestamp(timestamp):
+    """Same output as strftime('%H:%M:%S'), without the strftime call"""
+    if timestamp is None:
+        return None
+    return f'{timestamp.hour:02d}:{timestamp.minute:02d}:{timestamp.second:02d}'
+
+
+def fetch_orders(db, *filters, order_by=None, limit=None, archive=False):
+    """Orders matching filters as to_dict()-shaped dicts, plus their (timestamp, id) keys
+
+    order_by defaults to newest first; the keys feed keyset pagination.
+    archive=True reads archived_orders / archived_order_items instead.
+    """
+    orders_t, items_t = (archived_orders_table, archived_items_table) if archive else (orders_table, items_table)
+    order_by = order_by if order_by is not None else (orders_t.c.timestamp.desc(), orders_t.c.id.desc())
+    query = select(*[orders_t.c[name] for name in ORDER_COLUMN_NAMES]).where(*filters).order_by(*order_by)
+    if limit is not None:
+        query = query.limit(limit)
+    rows = db.execute(query).all()
+    if not rows:
+        return [], []
+
+    orders = []
+    items_by_order = {}
+    for order_id, table, status, waiter, timestamp, customer_info, health_conditions in rows:
+        items = []
+        items_by_order[order_id] = items
+        orders.append({
+            'id': order_id,
+            'table': table,
+            'status': status,
+            'waiter': waiter,
+            'timestamp': format_timestamp(timestamp),
+            'customerInfo': customer_info,
+            'healthConditions': health_conditions,
+            'items': items
+        })
+
+    item_query = select(*[items_t.c[name] for name in ITEM_COLUMN_NAMES])
+    if len(rows) <= MAX_IN_IDS or limit is not None:
+        item_query = item_query.where(items_t.c.order_id.in_(list(items_by_order)))
+    else:
+        item_query = item_query.join(orders_t, orders_t.c.id == items_t.c.order_id).where(*filters)
+    item_query = item_query.order_by(items_t.c.order_id, items_t.c.id)
+
+    for (order_id, item_id, menu_item_id, name, category, price, quantity, notes,
+         calories, protein, carbs, fat, sugar) in db.execute(item_query):
+        items = items_by_order.get(order_id)
+        if items is not None:
+            items.append({
+                'id': item_id,
+                'menuItemId': menu_item_id,
+                'name': name,
+                'category': category,
+                'price': price,
+                'quantity': quantity,
+                'notes': notes,
+                'calories': calories,
+                'protein': protein,
+                'carbs': carbs,
+                'fat': fat,
+                'sugar': sugar
+            })
+
+    return orders, [(row.timestamp, row.id) for row in rows]
+
+
+def fetch_orders_by_id(db, ids):
+    """Orders for ids and their (timestamp, id) keys, in the order given"""
+    orders, keys = fetch_orders(db, orders_table.c.id.in_(list(ids)))
+    by_id = {order['id']: (order, key) for order, key in zip(orders, keys)}
+    found = [by_id[order_id] for order_id in ids if order_id in by_id]
+    return [order for order, _ in found], [key for _, key in found]
+
+
+def json_response(obj, status=200):
+    """Flask response with obj encoded by the fast JSON encoder"""
+    return Response(fastjson.dumps_bytes(obj), status=status, mimetype='application/json')
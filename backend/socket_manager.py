@@ -0,0 +1,74 @@
+"""
+Socket.IO client manager selection for single- and multi-worker deployments
+
+SOCKETIO_MESSAGE_QUEUE picks how emits reach clients on other workers:
+    (unset)                  in-process manager, one worker only
+    redis://host:6379/0      Redis pub/sub (recommended in production)
+    amqp://... and others    Kombu transports (RabbitMQ, SQS, ...)
+    filesystem:///some/dir   Kombu file-backed queue shared through a local
+                             directory; no broker needed, meant for tests,
+                             benchmarks and single-host setups
+
+Sticky sessions: Socket.IO long-polling sends several HTTP requests per
+session, and they must all hit the worker that owns the session. gunicorn
+does not balance with stickiness, so with WEB_CONCURRENCY > 1 the server only
+offers the websocket transport (one long-lived connection per client, pinned
+to one worker). Behind a load balancer with session affinity (nginx ip_hash,
+Render/Heroku session affinity) set SOCKETIO_TRANSPORTS=websocket,polling to
+allow polling again.
+"""
+import os
+
+import socketio
+
+CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'optimeal')
+
+
+def worker_count():
+    """Number of worker processes sharing the Socket.IO clients"""
+    return int(os.environ.get('WEB_CONCURRENCY', 1))
+
+
+def is_multi_worker():
+    """True when more than one process serves sockets (or a queue is configured)"""
+    return worker_count() > 1 or bool(os.environ.get('SOCKETIO_MESSAGE_QUEUE'))
+
+
+def create_client_manager(url=None, write_only=False):
+    """Build the client manager for url, or None for the default in-process one
+
+    write_only managers can emit to clients but do not accept connections;
+    use them from background jobs and scripts that are not web workers.
+    """
+    url = url or os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    if not url:
+        return None
+    if url.startswith(('redis://', 'rediss://')):
+        return socketio.RedisManager(url, channel=CHANNEL, write_only=write_only)
+    if url.startswith('filesystem://'):
+        folder = url[len('filesystem://'):] or os.path.join(os.path.dirname(os.path.abspath(__file__)), '.socketio-queue')
+        os.makedirs(folder, exist_ok=True)
+        return socketio.KombuManager(
+            'filesystem://', channel=CHANNEL, write_only=write_only,
+            connection_options={'transport_options': {
+                'data_folder_in': folder,
+                'data_folder_out': folder,
+                'control_folder': os.path.join(folder, 'control'),
+            }}
+        )
+    return socketio.KombuManager(url, channel=CHANNEL, write_only=write_only)
+
+
+def server_options():
+    """Extra SocketIO(...) keyword arguments for the current deployment mode"""
+    options = {}
+    manager = create_client_manager()
+    if manager is not None:
+        options['client_manager'] = manager
+
+    transports = os.environ.get('SOCKETIO_TRANSPORTS')
+    if transports:
+        options['transports'] = [t.strip() for t in transports.split(',') if t.strip()]
+    elif worker_count() > 1:
+        options['transports'] = ['websocket']
+    return options
@@ -0,0 +1,100 @@
+"""
+Order statistics for the manager dashboard
+SQL-side aggregation plus in-memory counters kept current by the write routes
+"""
+from sqlalchemy import func, case
+
+from cache_state import CacheState
+from models import Order, ORDER_STATUSES, HEALTH_CONDITIONS
+
+
+def compute_stats(db):
+    """Full recompute: status counts with GROUP BY, health counts with JSON extraction"""
+    order_stats = {status: 0 for status in ORDER_STATUSES}
+    total = 0
+    for status, count in db.query(Order.status, func.count(Order.id)).group_by(Order.status):
+        total += count
+        if status in order_stats:
+            order_stats[status] = count
+    order_stats = {'total': total, **order_stats}
+
+    health_row = db.query(*[
+        func.coalesce(func.sum(case((Order.health_conditions[condition].as_boolean() == True, 1), else_=0)), 0)  # noqa: E712
+        for condition in HEALTH_CONDITIONS
+    ]).one()
+    health_stats = dict(zip(HEALTH_CONDITIONS, (int(count) for count in health_row)))
+
+    return {'orderStats': order_stats, 'healthStats': health_stats}
+
+
+class StatsCounters(CacheState):
+    """In-memory order counters, loaded once from the DB and updated incrementally"""
+
+    def __init__(self, max_age=None):
+        super().__init__(max_age)
+        self._order_stats = {}
+        self._health_stats = {}
+
+    def load(self, db):
+        """(Re)load counters from a full SQL recompute"""
+        stats = compute_stats(db)
+        with self._lock:
+            self._order_stats = stats['orderStats']
+            self._health_stats = stats['healthStats']
+            self._mark_loaded()
+
+    def snapshot(self, db):
+        """Current counters; loads them from the DB on first use"""
+        self.ensure_loaded(db)
+        with self._lock:
+            return {'orderStats': dict(self._order_stats), 'healthStats': dict(self._health_stats)}
+
+    def _apply(self, status, health_conditions, delta):
+        if status in self._order_stats:
+            self._order_stats[status] += delta
+        self._order_stats['total'] += delta
+        for condition in HEALTH_CONDITIONS:
+            if health_conditions and health_conditions.get(condition):
+                self._health_stats[condition] += delta
+
+    def order_created(self, status, health_conditions):
+        """Count a newly committed order"""
+        with self._lock:
+            if self._loaded:
+                self._apply(status, health_conditions, 1)
+
+    def order_deleted(self, status, health_conditions):
+        """Uncount a deleted order"""
+        with self._lock:
+            if self._loaded:
+                self._apply(status, health_conditions, -1)
+
+    def status_changed(self, old_status, new_status):
+        """Move an order between status buckets"""
+        with self._lock:
+            if self._loaded and old_status != new_status:
+                if old_status in self._order_stats:
+                    self._order_stats[old_status] -= 1
+                if new_status in self._order_stats:
+                    self._order_stats[new_status] += 1
+
+    def verify(self, db):
+        """Compare counters against a full recompute
+
+        Returns a dict of {key: (counter value, recomputed value)} for every
+        mismatch and reloads the counters if any were found.
+        """
+        expected = compute_stats(db)
+        current = self.snapshot(db)
+        mismatches = {}
+        for section in ('orderStats', 'healthStats'):
+            for key, value in expected[section].items():
+                if current[section].get(key) != value:
+                    mismatches[f'{section}.{key}'] = (current[section].get(key), value)
+        if mismatches:
+            self.load(db)
+        return mismatches
+
+
+# Process-wide counters used by app.py
+counters = StatsCounters()
@@ -0,0 +1,186 @@
+"""
+Table sessions: a party's orders at one table, from first order to close, with a running bill
+Session totals and per-item bill lines are updated in the same transaction as
+each order write, so table lists and bills read a handful of rows instead of
+regrouping orders and rescanning order_items
+"""
+from sqlalchemy import bindparam, select, update
+
+from analytics import insert_for, upsert
+from health_index import NUTRIENTS
+from models import TableSession, TableSessionLine
+from serializers import fetch_orders, orders_table
+
+sessions_table = TableSession.__table__
+lines_table = TableSessionLine.__table__
+
+SESSION_MEASURES = ['orders', 'items', 'amount', *NUTRIENTS]
+
+# Orders read per query when backfilling sessions from existing data
+BACKFILL_CHUNK = 1000
+
+# Adds one session's deltas to its totals (executemany: one parameter set per session)
+ADD_TO_SESSION = update(sessions_table).where(sessions_table.c.id == bindparam('session_id')).values(
+    {measure: sessions_table.c[measure] + bindparam(f'delta_{measure}') for measure in SESSION_MEASURES})
+
+# Bills one order to its session (executemany: one parameter set per order)
+ATTACH_TO_SESSION = update(orders_table).where(orders_table.c.id == bindparam('order_id')).values(
+    table_session_id=bindparam('session_id'))
+
+
+def open_session_ids(db, opened_at):
+    """{table: id of its open session} for opened_at = {table: time}, opening the missing ones
+
+    Concurrent writers for the same table agree on one session: the partial
+    unique index on open sessions turns the second INSERT into a no-op.
+    """
+    def open_ids(tables):
+        return dict(db.execute(
+            select(sessions_table.c.table, sessions_table.c.id)
+            .where(sessions_table.c.table.in_(tables), sessions_table.c.closed_at.is_(None))
+        ).all())
+
+    session_ids = open_ids(list(opened_at)) if opened_at else {}
+    missing = [table for table in opened_at if table not in session_ids]
+    if missing:
+        db.execute(
+            insert_for(db)(sessions_table).on_conflict_do_nothing(
+                index_elements=['table'], index_where=sessions_table.c.closed_at.is_(None)),
+            [{'table': table, 'opened_at': opened_at[table]} for table in missing]
+        )
+        session_ids.update(open_ids(missing))
+    return session_ids
+
+
+def session_deltas(orders, session_ids, sign=1):
+    """({session id: {measure: delta}}, {(session id, menu item id): {name, quantity, amount}})"""
+    totals, lines = {}, {}
+    for order_dict in orders:
+        session_id = session_ids.get(order_dict['id'])
+        if session_id is None:
+            continue
+        deltas = totals.setdefault(session_id, dict.fromkeys(SESSION_MEASURES, 0))
+        deltas['orders'] += sign
+        for item in order_dict['items']:
+            quantity = item['quantity'] or 0
+            amount = (item['price'] or 0) * quantity
+            deltas['items'] += sign * quantity
+            deltas['amount'] += sign * amount
+            for nutrient in NUTRIENTS:
+                deltas[nutrient] += sign * (item[nutrient] or 0) * quantity
+            line = lines.setdefault((session_id, item['menuItemId']),
+                                    {'name': item['name'], 'quantity': 0, 'amount': 0})
+            line['quantity'] += sign * quantity
+            line['amount'] += sign * amount
+    return totals, lines
+
+
+def record_orders(db, orders, placed_at, sign=1):
+    """Add new orders to their table's open session (sign=1), or take deleted orders off theirs (sign=-1)
+
+    A table without an open session gets one, opened when its first order
+    was placed. The caller commits.
+    """
+    if not orders:
+        return
+    order_ids = [order_dict['id'] for order_dict in orders]
+    if sign > 0:
+        # Journaled orders may still carry the table as the client sent it (e.g. a number)
+        tables = [str(order_dict['table']) for order_dict in orders]
+        opened_at = {}
+        for table, timestamp in zip(tables, placed_at):
+            opened_at[table] = min(timestamp, opened_at.get(table, timestamp))
+        by_table = open_session_ids(db, opened_at)
+        session_ids = {order_dict['id']: by_table[table] for order_dict, table in zip(orders, tables)}
+        db.execute(ATTACH_TO_SESSION, [{'order_id': order_id, 'session_id': session_id}
+                                       for order_id, session_id in session_ids.items()])
+    else:
+        session_ids = dict(db.execute(
+            select(orders_table.c.id, orders_table.c.table_session_id)
+            .where(orders_table.c.id.in_(order_ids), orders_table.c.table_session_id.is_not(None))
+        ).all())
+
+    totals, lines = session_deltas(orders, session_ids, sign)
+    if totals:
+        db.execute(
+            ADD_TO_SESSION,
+            [{'session_id': session_id, **{f'delta_{measure}': value for measure, value in deltas.items()}}
+             for session_id, deltas in totals.items()]
+        )
+    if lines:
+        upsert(db, lines_table, ['session_id', 'menu_item_id'], ['quantity', 'amount'], [
+            {'session_id': session_id, 'menu_item_id': menu_item_id, **line}
+            for (session_id, menu_item_id), line in lines.items()
+        ])
+
+
+def backfill(connection):
+    """Open a session for every table with active orders and bill those orders to it (used by the migration)"""
+    last_id = 0
+    while True:
+        orders, keys = fetch_orders(connection, orders_table.c.status != 'completed',
+                                    orders_table.c.table_session_id.is_(None), orders_table.c.id > last_id,
+                                    order_by=(orders_table.c.id,), limit=BACKFILL_CHUNK)
+        if not orders:
+            break
+        record_orders(connection, orders, [timestamp for timestamp, _ in keys])
+        last_id = keys[-1][1]
+
+
+def open_session(db, table, now):
+    """Id of table's open session, opened now if it has none (the caller commits)"""
+    return open_session_ids(db, {table: now})[table]
+
+
+def close_session(db, table, now):
+    """Close table's open session; returns its id, or None if none was open (the caller commits)"""
+    session_id = db.execute(
+        select(sessions_table.c.id).where(sessions_table.c.table == table, sessions_table.c.closed_at.is_(None))
+    ).scalar()
+    if session_id is not None:
+        db.execute(update(sessions_table).where(sessions_table.c.id == session_id).values(closed_at=now))
+    return session_id
+
+
+def _summary(row):
+    """A table_sessions row in the API's camelCase shape"""
+    return {
+        'id': row['id'],
+        'table': row['table'],
+        'openedAt': row['opened_at'].isoformat(),
+        'closedAt': row['closed_at'].isoformat() if row['closed_at'] else None,
+        'orders': row['orders'],
+        'items': row['items'],
+        'amount': round(row['amount'], 2),
+        'nutrition': {nutrient: round(row[nutrient], 1) for nutrient in NUTRIENTS},
+    }
+
+
+def open_sessions(db):
+    """Summaries of every open session, by table"""
+    rows = db.execute(
+        select(sessions_table).where(sessions_table.c.closed_at.is_(None)).order_by(sessions_table.c.table)
+    ).mappings().all()
+    return [_summary(row) for row in rows]
+
+
+def bill(db, table, session_id=None):
+    """Summary and bill lines of table's open session (or of session_id), or None"""
+    query = select(sessions_table).where(sessions_table.c.table == table)
+    if session_id is None:
+        query = query.where(sessions_table.c.closed_at.is_(None))
+    else:
+        query = query.where(sessions_table.c.id == session_id)
+    row = db.execute(query).mappings().first()
+    if row is None:
+        return None
+    lines = db.execute(
+        select(lines_table.c.menu_item_id, lines_table.c.name, lines_table.c.quantity, lines_table.c.amount)
+        .where(lines_table.c.session_id == row['id'], lines_table.c.quantity > 0)
+        .order_by(lines_table.c.name, lines_table.c.menu_item_id)
+    ).all()
+    return {
+        **_summary(row),
+        'lines': [{'menuItemId': menu_item_id, 'name': name, 'quantity': quantity, 'amount': round(amount, 2)}
+                  for menu_item_id, name, quantity, amount in lines],
+    }
@@ -0,0 +1,191 @@
+"""
+Wire formats for order payloads: JSON or MessagePack, optional gzip/brotli, full or compact schema
+REST clients negotiate with Accept, Accept-Encoding and ?schema=compact; Socket.IO
+clients with subscription options. Plain JSON with the full schema stays the default
+"""
+from collections import namedtuple
+import gzip
+import os
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+from flask import Response
+
+import fastjson
+from menu import catalog, ITEM_FIELDS
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, 'application/x-msgpack', 'application/vnd.msgpack')
+
+FORMATS = ('json', 'msgpack') if msgpack is not None else ('json',)
+COMPRESSIONS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# REST bodies smaller than this go out uncompressed (the saving is lost in overhead)
+MIN_COMPRESS_BYTES = int(os.environ.get('WIRE_MIN_COMPRESS_BYTES', 512))
+GZIP_LEVEL = int(os.environ.get('WIRE_GZIP_LEVEL', 6))
+# Brotli's default quality (11) costs milliseconds per message; 5 compresses
+# about as well as gzip -9 at gzip speed
+BROTLI_QUALITY = int(os.environ.get('WIRE_BROTLI_QUALITY', 5))
+
+
+def compress(body, compression):
+    if compression == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+# ============ COMPACT SCHEMA ============
+
+def compact_item(item):
+    """An order item without the fields its menu entry already gives
+
+    Fields that differ from the current catalog (the price changed since the
+    order, or the item left the menu) are kept; empty notes are dropped.
+    """
+    menu_item = catalog.get(item['menuItemId'])
+    compact = {'id': item['id'], 'menuItemId': item['menuItemId'], 'quantity': item['quantity']}
+    if item['notes']:
+        compact['notes'] = item['notes']
+    for field in ITEM_FIELDS:
+        if menu_item is None or menu_item.get(field) != item[field]:
+            compact[field] = item[field]
+    return compact
+
+
+def compact_order(order):
+    """An order with compact items and without null customerInfo/healthConditions"""
+    compact = {key: value for key, value in order.items() if value is not None}
+    compact['items'] = [compact_item(item) for item in order['items']]
+    return compact
+
+
+def compact_event(event, data):
+    """Compact the order inside an order event payload (slim payloads unchanged)"""
+    if event == 'order_created':
+        return compact_order(data)
+    if event == 'order_updated' and 'order' in data:
+        return dict(data, order=compact_order(data['order']))
+    return data
+
+
+# ============ WIRE FORMATS ============
+
+class Wire(namedtuple('Wire', 'format compression compact')):
+    """One combination of encoding, compression and schema"""
+
+    __slots__ = ()
+
+    @property
+    def name(self):
+        """'' for the default, otherwise e.g. 'msgpack.br.compact'"""
+        parts = [self.format] if self.format != 'json' else []
+        if self.compression:
+            parts.append(self.compression)
+        if self.compact:
+            parts.append('compact')
+        return '.'.join(parts)
+
+    @property
+    def binary(self):
+        return self.format != 'json' or self.compression is not None
+
+    @property
+    def mimetype(self):
+        return MSGPACK_MIMETYPE if self.format == 'msgpack' else JSON_MIMETYPE
+
+    def serialize(self, obj):
+        """obj encoded as JSON or MessagePack bytes (uncompressed)"""
+        if self.format == 'msgpack':
+            return msgpack.packb(obj)
+        return fastjson.dumps_bytes(obj)
+
+    def socket_payload(self, obj):
+        """What to emit over Socket.IO: obj itself for JSON, else one binary attachment"""
+        if not self.binary:
+            return obj
+        body = self.serialize(obj)
+        return compress(body, self.compression) if self.compression else body
+
+    def delta(self, events):
+        """'orders_delta' payload for [{seq, event, data}, ...]"""
+        if not self.compact:
+            return self.socket_payload({'events': events})
+        events = [dict(event, data=compact_event(event['event'], event['data'])) for event in events]
+        return self.socket_payload({'events': events, 'menu': catalog.etag})
+
+    def snapshot(self, orders):
+        """'orders_refresh' payload for a list of orders"""
+        if not self.compact:
+            return self.socket_payload(orders)
+        return self.socket_payload({'orders': [compact_order(order) for order in orders], 'menu': catalog.etag})
+
+    @classmethod
+    def parse(cls, name):
+        """Inverse of name; unknown or unavailable parts fall back to the default"""
+        parts = set(name.split('.')) if name else set()
+        return cls(
+            'msgpack' if 'msgpack' in parts and 'msgpack' in FORMATS else 'json',
+            next((c for c in COMPRESSIONS if c in parts), None),
+            'compact' in parts,
+        )
+
+
+DEFAULT = Wire('json', None, False)
+
+
+SUBSCRIPTION_OPTIONS = ('format', 'compression', 'schema')
+
+
+def for_subscription(subscription):
+    """Wire asked for by {format, compression, schema} subscription options"""
+    if not isinstance(subscription, dict):
+        return DEFAULT
+    return Wire(
+        subscription.get('format') if subscription.get('format') in FORMATS else 'json',
+        subscription.get('compression') if subscription.get('compression') in COMPRESSIONS else None,
+        subscription.get('schema') == 'compact',
+    )
+
+
+def unapplied_options(subscription, wire):
+    """Subscription options that wire does not honour (unknown or not installed values)"""
+    if not isinstance(subscription, dict):
+        return []
+    applied = {'format': wire.format, 'compression': wire.compression,
+               'schema': 'compact' if wire.compact else 'full'}
+    return [option for option in SUBSCRIPTION_OPTIONS
+            if subscription.get(option) is not None and subscription[option] != applied[option]]
+
+
+def negotiate(request):
+    """Wire for a REST response, from Accept, Accept-Encoding and ?schema=compact"""
+    offered = [JSON_MIMETYPE] + (list(MSGPACK_MIMETYPES) if 'msgpack' in FORMATS else [])
+    best_type = request.accept_mimetypes.best_match(offered, default=JSON_MIMETYPE)
+    return Wire(
+        'msgpack' if best_type in MSGPACK_MIMETYPES else 'json',
+        request.accept_encodings.best_match(COMPRESSIONS),
+        request.args.get('schema') == 'compact',
+    )
+
+
+def response(obj, wire, status=200):
+    """Flask response with obj in the negotiated wire format"""
+    return encoded_response(wire.serialize(obj), wire, status)
+
+
+def encoded_response(body, wire, status=200):
+    """Flask response for a body already serialized in wire's format (compressed here)"""
+    headers = {'Vary': 'Accept, Accept-Encoding'}
+    if wire.compression and len(body) >= MIN_COMPRESS_BYTES:
+        body = compress(body, wire.compression)
+        headers['Content-Encoding'] = wire.compression
+    return Response(body, status=status, mimetype=wire.mimetype, headers=headers)
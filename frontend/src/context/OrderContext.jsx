@@ -1,11 +1,13 @@
 import { createContext, useContext, useState, useEffect, useCallback, useRef } from 'react';
-import { orderApi } from '../services/api';
-import { initSocket, subscribeToOrders, requestOrdersRefresh } from '../services/socket';
+import { orderApi, menuApi } from '../services/api';
+import { initSocket, subscribeToOrders, requestOrdersRefresh, setSubscription } from '../services/socket';
+import { useAuth } from './AuthContext';
 
 // Create the context
 const OrderContext = createContext();
 
-// Menu items - shared across all pages (kept locally for fast rendering)
+// Bundled copy of the menu, shown until GET /api/menu answers
+// (the server catalog in backend/menu.json is authoritative for prices)
 export const menuItems = [
     {
         id: 1, name: 'Classic Burger', category: 'Main', price: 12, calories: 650, protein: 35, carbs: 45, fat: 38, sugar: 8,
@@ -60,6 +62,7 @@ export const menuItems = [
 // Provider component
 export function OrderProvider({ children }) {
     const [orders, setOrders] = useState([]);
+    const [menu, setMenu] = useState(menuItems);
     const [isLoading, setIsLoading] = useState(true);
     const [isConnected, setIsConnected] = useState(false);
     const [error, setError] = useState(null);
@@ -68,12 +71,18 @@ export function OrderProvider({ children }) {
     const [readyNotifications, setReadyNotifications] = useState([]);
     const previousOrdersRef = useRef([]);
 
+    // Only receive the events for the logged-in role
+    const { user } = useAuth();
+    useEffect(() => {
+        setSubscription(user ? { role: user.role, name: user.name } : null);
+    }, [user]);
+
     // Fetch orders from API
     const fetchOrders = useCallback(async () => {
         try {
             setIsLoading(true);
-            const data = await orderApi.getAll();
-            setOrders(data);
+            // Every page: the board and the manager's stats both need all of today's orders
+            setOrders(await orderApi.getAllPages({ limit: 500 }));
             setError(null);
         } catch (err) {
             console.error('Failed to fetch orders:', err);
@@ -92,24 +101,51 @@ export function OrderProvider({ children }) {
         );
 
         // Subscribe to real-time events
+        const applyCreated = (prev, order) =>
+            prev.some(o => o.id === order.id) ? prev : [order, ...prev];
+        // Managers get status-only updates: { orderId, oldStatus, newStatus }
+        const applyUpdated = (prev, { order, orderId, newStatus }) => order
+            ? prev.map(o => o.id === order.id ? order : o)
+            : prev.map(o => o.id === orderId ? { ...o, status: newStatus } : o);
+        const applyDeleted = (prev, { orderId }) => prev.filter(o => o.id !== orderId);
+        const reducers = {
+            order_created: applyCreated,
+            order_updated: applyUpdated,
+            order_deleted: applyDeleted,
+        };
+
         const unsubscribe = subscribeToOrders({
             onOrderCreated: (order) => {
-                setOrders(prev => [order, ...prev]);
+                setOrders(prev => applyCreated(prev, order));
             },
-            onOrderUpdated: ({ order }) => {
-                setOrders(prev => prev.map(o => o.id === order.id ? order : o));
+            onOrdersCreated: (newOrders) => {
+                setOrders(prev => newOrders.reduce(applyCreated, prev));
             },
-            onOrderDeleted: ({ orderId }) => {
-                setOrders(prev => prev.filter(o => o.id !== orderId));
+            onOrderUpdated: (data) => {
+                setOrders(prev => applyUpdated(prev, data));
+            },
+            onOrderDeleted: (data) => {
+                setOrders(prev => applyDeleted(prev, data));
             },
             onOrdersRefresh: (allOrders) => {
                 setOrders(allOrders);
+            },
+            onOrdersDelta: ({ events }) => {
+                setOrders(prev => events.reduce(
+                    (acc, { event, data }) => reducers[event] ? reducers[event](acc, data) : acc,
+                    prev
+                ));
             }
         });
 
         // Fetch initial orders
         fetchOrders();
 
+        // Load the server menu (revalidated with its ETag by the browser cache)
+        menuApi.getAll()
+            .then(setMenu)
+            .catch(err => console.error('Failed to fetch menu:', err));
+
         return () => {
             unsubscribe();
         };
@@ -293,6 +329,7 @@ export function OrderProvider({ children }) {
 
     const value = {
         orders,
+        menu,
         isLoading,
         isConnected,
         error,
@@ -12,7 +12,7 @@ import {
     Bell,
     XCircle
 } from 'lucide-react';
-import { useOrders, menuItems } from '../context/OrderContext';
+import { useOrders } from '../context/OrderContext';
 import { useAuth } from '../context/AuthContext';
 
 // Health condition options
@@ -25,7 +25,7 @@ const HEALTH_OPTIONS = [
 ];
 
 function WaiterPage() {
-    const { addOrder, refreshOrders, readyNotifications, dismissNotification, dismissAllNotifications } = useOrders();
+    const { menu: menuItems, addOrder, refreshOrders, readyNotifications, dismissNotification, dismissAllNotifications } = useOrders();
     const { user, logout } = useAuth();
     const [currentOrder, setCurrentOrder] = useState({ table: '', items: [] });
     const [submitSuccess, setSubmitSuccess] = useState(false);
@@ -160,11 +160,11 @@ function WaiterPage() {
         return { status: 'excess', message: '🚫 Too much food - may lead to waste!', color: 'red' };
     };
 
-    // Add item to current order
+    // Add item to current order (id is only a local key; the server reads menuItemId)
     const addItemToOrder = (item) => {
         setCurrentOrder(prev => ({
             ...prev,
-            items: [...prev.items, { ...item, quantity: 1, notes: '', id: Date.now() }]
+            items: [...prev.items, { ...item, menuItemId: item.id, quantity: 1, notes: '', id: Date.now() }]
         }));
     };
 
@@ -214,6 +214,7 @@ function WaiterPage() {
 
         const success = addOrder({
             table: currentOrder.table,
+            waiter: user?.name,
             items: currentOrder.items,
             customers: customers, // New: individual customer data
             customerInfo: {
@@ -563,7 +564,7 @@ function WaiterPage() {
                                                 type="number"
                                                 min="1"
                                                 value={item.quantity}
-                                                onChange={(e) => updateOrderItem(item.id, 'quantity', parseInt(e.target.value) || 1)}
+                                                onChange={(e) => updateOrderItem(item.id, 'quantity', Math.max(1, parseInt(e.target.value) || 1))}
                                                 className="input"
                                             />
                                         </div>
@@ -27,21 +27,82 @@ async function fetchApi(endpoint, options = {}) {
     return response.json();
 }
 
+// Attempts per order submission on network failures
+const CREATE_RETRIES = 4;
+
+/**
+ * Random key identifying one order submission across retries
+ */
+function newClientOrderId() {
+    if (globalThis.crypto?.randomUUID) {
+        return globalThis.crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+}
+
 /**
  * Order API functions
  */
 export const orderApi = {
     /**
-     * Get all orders
+     * Get a page of orders (newest first)
+     * params: { status, since, limit, cursor }
+     */
+    getAll: (params = {}) => {
+        const query = new URLSearchParams(
+            Object.entries(params).filter(([, value]) => value !== undefined && value !== null)
+        ).toString();
+        return fetchApi(query ? `/orders?${query}` : '/orders');
+    },
+
+    /**
+     * Get every order (newest first), following nextCursor until the last page
+     * params: { status, since, limit }
      */
-    getAll: () => fetchApi('/orders'),
+    getAllPages: async (params = {}) => {
+        const orders = [];
+        let cursor = null;
+        do {
+            const page = await orderApi.getAll({ ...params, cursor });
+            orders.push(...page.orders);
+            cursor = page.nextCursor;
+        } while (cursor);
+        return orders;
+    },
 
     /**
      * Create a new order
+     * One Idempotency-Key per order, reused by every retry, so a request that
+     * timed out but reached the server never creates the order twice
      */
-    create: (orderData) => fetchApi('/orders', {
+    create: async (orderData) => {
+        const key = orderData.clientOrderId || newClientOrderId();
+        for (let attempt = 1; ; attempt++) {
+            try {
+                return await fetchApi('/orders', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'Idempotency-Key': key,
+                    },
+                    body: JSON.stringify({ ...orderData, clientOrderId: key }),
+                });
+            } catch (error) {
+                // fetch rejects with a TypeError on network failures; HTTP errors are final
+                if (!(error instanceof TypeError) || attempt >= CREATE_RETRIES) {
+                    throw error;
+                }
+                await new Promise((resolve) => setTimeout(resolve, 250 * 2 ** attempt));
+            }
+        }
+    },
+
+    /**
+     * Create many orders in one request (e.g. after being offline)
+     */
+    createBatch: (orders) => fetchApi('/orders/batch', {
         method: 'POST',
-        body: JSON.stringify(orderData),
+        body: JSON.stringify({ orders }),
     }),
 
     /**
@@ -68,6 +129,12 @@ export const menuApi = {
      * Get all menu items
      */
     getAll: () => fetchApi('/menu'),
+
+    /**
+     * Get items suitable for health conditions and nutrient limits
+     * params: { diabetes, cholesterol, bloodPressure, sugarFree, maxSugar, maxFat, ... }
+     */
+    getCompatible: (params = {}) => fetchApi(`/menu/compatible?${new URLSearchParams(params)}`),
 };
 
 /**
@@ -80,6 +147,37 @@ export const statsApi = {
     getStats: () => fetchApi('/stats'),
 };
 
+/**
+ * Table session API functions (running bill and nutrition totals per table)
+ */
+export const tableApi = {
+    /**
+     * Get every open table session with its totals
+     */
+    getAll: () => fetchApi('/tables'),
+
+    /**
+     * Get a table's bill (its open session, or a closed sessionId)
+     */
+    getBill: (table, sessionId) => fetchApi(
+        `/tables/${encodeURIComponent(table)}/bill${sessionId != null ? `?session=${sessionId}` : ''}`
+    ),
+
+    /**
+     * Seat a party at a table (placing an order also does this)
+     */
+    open: (table) => fetchApi(`/tables/${encodeURIComponent(table)}/open`, {
+        method: 'POST',
+    }),
+
+    /**
+     * Close a table's session and get its final bill
+     */
+    close: (table) => fetchApi(`/tables/${encodeURIComponent(table)}/close`, {
+        method: 'POST',
+    }),
+};
+
 /**
  * Health check
  */
@@ -89,5 +187,6 @@ export default {
     orders: orderApi,
     menu: menuApi,
     stats: statsApi,
+    tables: tableApi,
     healthCheck,
 };
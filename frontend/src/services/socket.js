@@ -9,6 +9,26 @@ let socket = null;
 // Get socket URL from environment or use root path for proxy
 const SOCKET_URL = import.meta.env.VITE_SOCKET_URL || '/';
 
+// Multi-worker backends without sticky sessions only accept websockets
+const SOCKET_TRANSPORTS = (import.meta.env.VITE_SOCKET_TRANSPORTS || 'websocket,polling').split(',');
+
+// Position of the last order event applied (see backend/changelog.py)
+let syncState = { lastSeq: null, epoch: null };
+
+// Rooms to join: { role, name, tables } (see backend/rooms.py)
+let subscription = null;
+
+// Order events arrive as coalesced 'orders_delta' batches (see backend/coalescer.py)
+function roomsRequest() {
+    return { ...(subscription || {}), batch: true };
+}
+
+function trackSeq(meta) {
+    if (meta && typeof meta.seq === 'number') {
+        syncState = { lastSeq: meta.seq, epoch: meta.epoch };
+    }
+}
+
 /**
  * Initialize socket connection
  */
@@ -19,7 +39,9 @@ export function initSocket(onConnect, onDisconnect) {
 
     // Connect to backend server
     socket = io(SOCKET_URL, {
-        transports: ['websocket', 'polling'],
+        // Re-sent on every reconnect so the client lands back in its rooms
+        auth: (cb) => cb(roomsRequest()),
+        transports: SOCKET_TRANSPORTS,
         reconnection: true,
         reconnectionAttempts: 5,
         reconnectionDelay: 1000,
@@ -27,6 +49,10 @@ export function initSocket(onConnect, onDisconnect) {
 
     socket.on('connect', () => {
         console.log('Socket.IO connected');
+        // After a reconnect, ask only for the events we missed
+        if (syncState.lastSeq !== null) {
+            resyncOrders();
+        }
         onConnect?.();
     });
 
@@ -51,6 +77,7 @@ export function getSocket() {
 
 /**
  * Subscribe to order events
+ * Every event carries { seq, epoch } metadata as its last argument
  */
 export function subscribeToOrders(callbacks) {
     if (!socket) {
@@ -58,30 +85,42 @@ export function subscribeToOrders(callbacks) {
         return () => { };
     }
 
-    const { onOrderCreated, onOrderUpdated, onOrderDeleted, onOrdersRefresh } = callbacks;
+    const { onOrderCreated, onOrdersCreated, onOrderUpdated, onOrderDeleted, onOrdersRefresh, onOrdersDelta } = callbacks;
 
-    if (onOrderCreated) {
-        socket.on('order_created', onOrderCreated);
-    }
-    if (onOrderUpdated) {
-        socket.on('order_updated', onOrderUpdated);
-    }
-    if (onOrderDeleted) {
-        socket.on('order_deleted', onOrderDeleted);
-    }
-    if (onOrdersRefresh) {
-        socket.on('orders_refresh', onOrdersRefresh);
-    }
+    const handlers = {
+        order_created: onOrderCreated,
+        orders_created: onOrdersCreated,
+        order_updated: onOrderUpdated,
+        order_deleted: onOrderDeleted,
+        orders_refresh: onOrdersRefresh,
+        orders_delta: onOrdersDelta,
+    };
+
+    const listeners = Object.entries(handlers)
+        .filter(([, handler]) => handler)
+        .map(([event, handler]) => {
+            const listener = (data, meta) => {
+                handler(data);
+                trackSeq(meta);
+            };
+            socket.on(event, listener);
+            return [event, listener];
+        });
 
     // Return unsubscribe function
     return () => {
-        if (onOrderCreated) socket.off('order_created', onOrderCreated);
-        if (onOrderUpdated) socket.off('order_updated', onOrderUpdated);
-        if (onOrderDeleted) socket.off('order_deleted', onOrderDeleted);
-        if (onOrdersRefresh) socket.off('orders_refresh', onOrdersRefresh);
+        listeners.forEach(([event, listener]) => socket.off(event, listener));
     };
 }
 
+/**
+ * Join the rooms for a role ({ role, name, tables }); null receives everything
+ */
+export function setSubscription(nextSubscription) {
+    subscription = nextSubscription;
+    socket?.emit('subscribe', roomsRequest());
+}
+
 /**
  * Request full orders refresh
  */
@@ -89,6 +128,14 @@ export function requestOrdersRefresh() {
     socket?.emit('request_refresh');
 }
 
+/**
+ * Request the events missed since the last applied sequence number
+ * (the server falls back to a full refresh if they are no longer available)
+ */
+export function resyncOrders() {
+    socket?.emit('request_refresh', syncState);
+}
+
 /**
  * Disconnect socket
  */
@@ -104,5 +151,7 @@ export default {
     getSocket,
     subscribeToOrders,
     requestOrdersRefresh,
+    resyncOrders,
+    setSubscription,
     disconnectSocket,
 };